@@ -248,7 +248,7 @@ document.addEventListener('DOMContentLoaded', async () => {
         try {
             let items = [];
             if (searchType === 'city') {
-                items = await api(`/cities/search?query=${encodeURIComponent(query)}`, 'GET');
+                items = await api(`/cities/typeahead?prefix=${encodeURIComponent(query)}`, 'GET');
                 renderCityResults(items);
             } else {
                 // Activity Search
@@ -0,0 +1,55 @@
+"""
+Keyword classifier for itinerary activities.
+All keywords are compiled into one regex; a single scan of the description
+finds every keyword occurrence and the highest-priority category wins,
+matching the original "first category whose keyword list matches" rules.
+The result is stored in Activity.category whenever an activity is written
+through the ORM; bulk writers call classify() themselves, and
+backfill_activity_categories.py fills rows written before the column existed.
+"""
+
+import re
+from sqlalchemy import event
+import models
+
+# Checked in priority order; descriptions match keywords as substrings
+ACTIVITY_KEYWORDS = {
+    "transport": ["flight", "train", "bus", "taxi", "transport"],
+    "accommodation": ["hotel", "check-in", "accommodation", "stay"],
+    "food": ["lunch", "dinner", "breakfast", "restaurant", "food"],
+    "sightseeing": ["museum", "tour", "visit", "sightseeing"],
+}
+DEFAULT_CATEGORY = "other"
+
+_PRIORITY = list(ACTIVITY_KEYWORDS)
+
+def _compile(keywords):
+    """One regex over every keyword, and for each keyword the best priority it implies.
+    At a given position the regex reports only the longest keyword starting there, so a
+    keyword also stands for any shorter keywords that are prefixes of it."""
+    priorities = {}
+    for category, words in keywords.items():
+        for word in words:
+            priorities.setdefault(word, _PRIORITY.index(category))
+    best = {word: min(rank for other, rank in priorities.items() if word.startswith(other)) for word in priorities}
+    # Zero-width lookahead so overlapping keywords are all seen in one pass; longest first
+    pattern = re.compile("(?=(" + "|".join(
+        re.escape(word) for word in sorted(priorities, key=len, reverse=True)
+    ) + "))")
+    return pattern, best
+
+_KEYWORD_RE, _KEYWORD_PRIORITY = _compile(ACTIVITY_KEYWORDS)
+
+def classify(description: str):
+    """Category of an activity from keywords in its description"""
+    best = len(_PRIORITY)
+    for match in _KEYWORD_RE.finditer((description or "").lower()):
+        best = min(best, _KEYWORD_PRIORITY[match.group(1)])
+        if best == 0:
+            break
+    return _PRIORITY[best] if best < len(_PRIORITY) else DEFAULT_CATEGORY
+
+@event.listens_for(models.Activity, "before_insert")
+@event.listens_for(models.Activity, "before_update")
+def _classify_activity(mapper, connection, target):
+    target.category = classify(target.description)
@@ -0,0 +1,111 @@
+"""
+Admin analytics.
+The overview counters come from one aggregate query over trips (with the
+user count as a scalar subquery) and are cached as a snapshot per time
+bucket of ADMIN_STATS_MAX_AGE_SECONDS, so repeated admin page loads do not
+rescan the tables. POST /admin/stats/refresh recomputes on demand.
+Growth series are read from the daily_counters table (one row per UTC day,
+bumped by record_daily() in the write routes) and bucketed into weeks or
+months in Python, so they work the same on every database.
+"""
+
+import datetime
+import os
+import threading
+import time
+from sqlalchemy import Date, case, delete, func, insert, select
+from sqlalchemy.orm import Session
+import database, models
+
+ADMIN_STATS_MAX_AGE_SECONDS = int(os.getenv("ADMIN_STATS_MAX_AGE_SECONDS", "300"))
+# Estimated revenue heuristic: 1% of total budgets tracked
+REVENUE_SHARE_OF_BUDGETS = 0.01
+
+GROWTH_METRICS = {
+    "trips": "trips_created",
+    "users": "users_signed_up",
+    "expenses": "expenses_logged",
+}
+GROWTH_PERIODS = ("daily", "weekly", "monthly")
+
+_snapshot = None  # (bucket, stats)
+_snapshot_lock = threading.Lock()
+
+def compute_stats(db: Session):
+    """All overview counters in a single round trip"""
+    row = db.execute(select(
+        select(func.count(models.User.id)).scalar_subquery().label("total_users"),
+        func.count(models.Trip.id).label("total_trips"),
+        func.count(case((models.Trip.status == "active", models.Trip.id))).label("active_trips"),
+        func.coalesce(func.sum(models.Trip.budget_limit), 0.0).label("total_budget")
+    )).one()
+    return {
+        "total_users": row.total_users,
+        "total_trips": row.total_trips,
+        "active_trips": row.active_trips,
+        "total_revenue_estimated": row.total_budget * REVENUE_SHARE_OF_BUDGETS,
+        "computed_at": datetime.datetime.utcnow()
+    }
+
+def _bucket():
+    return int(time.time() // max(ADMIN_STATS_MAX_AGE_SECONDS, 1))
+
+def get_stats(db: Session):
+    """Snapshot for the current time bucket, computing it at most once per bucket"""
+    global _snapshot
+    bucket = _bucket()
+    snapshot = _snapshot
+    if snapshot is not None and snapshot[0] == bucket:
+        return snapshot[1]
+    with _snapshot_lock:
+        if _snapshot is None or _snapshot[0] != bucket:
+            _snapshot = (bucket, compute_stats(db))
+        return _snapshot[1]
+
+def refresh_stats(db: Session):
+    """Recompute now and replace the current snapshot"""
+    global _snapshot
+    with _snapshot_lock:
+        _snapshot = (_bucket(), compute_stats(db))
+        return _snapshot[1]
+
+# --- DAILY COUNTERS ---
+def record_daily(db: Session, day: datetime.date = None, **increments):
+    """Add increments (e.g. trips_created=1) to the counters of day (default: today, UTC); the caller commits"""
+    day = day or datetime.datetime.utcnow().date()
+    # One INSERT ... ON CONFLICT (date) DO UPDATE, so concurrent first writes of a day need no retry
+    counters = models.DailyCounter.__table__.c
+    db.execute(
+        database.upsert_insert(db, models.DailyCounter)
+        .values(date=day, **increments)
+        .on_conflict_do_update(index_elements=[counters.date], set_={name: counters[name] + amount for name, amount in increments.items()})
+    )
+
+def rebuild_daily_counters(db: Session):
+    """Recompute every day's counters from the created_at columns; the caller commits"""
+    counters = {}
+    for model, name in ((models.Trip, "trips_created"), (models.User, "users_signed_up"), (models.Expense, "expenses_logged")):
+        day = func.date(model.created_at, type_=Date)
+        for date, count in db.execute(select(day, func.count()).where(model.created_at.isnot(None)).group_by(day)):
+            counters.setdefault(date, {"date": date, "trips_created": 0, "users_signed_up": 0, "expenses_logged": 0})[name] = count
+    db.execute(delete(models.DailyCounter))
+    if counters:
+        db.execute(insert(models.DailyCounter), list(counters.values()))
+    return len(counters)
+
+def period_label(day: datetime.date, period: str):
+    if period == "monthly":
+        return day.strftime("%Y-%m")
+    if period == "weekly":
+        year, week, _ = day.isocalendar()
+        return f"{year}-W{week:02d}"
+    return day.isoformat()
+
+def growth_series(db: Session, metric: str = "trips", period: str = "monthly"):
+    """[{period, count}] for metric, oldest first, from the daily counters"""
+    column = getattr(models.DailyCounter, GROWTH_METRICS[metric])
+    totals = {}
+    for day, count in db.execute(select(models.DailyCounter.date, column).order_by(models.DailyCounter.date)):
+        label = period_label(day, period)
+        totals[label] = totals.get(label, 0) + count
+    return [{"period": label, "count": count} for label, count in totals.items() if count]
@@ -5,13 +5,19 @@ from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
-import database, models
+import database, models, schemas, cache
 
 # Secret key to sign JWT tokens. In a real app, use an environment variable!
 SECRET_KEY = "your-secret-key-change-this-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Authenticated principals keyed by token subject, so most requests skip the users lookup.
+# Entries are dropped on role changes and deletes; the TTL bounds staleness across workers.
+PRINCIPAL_CACHE_SIZE = 10000
+PRINCIPAL_CACHE_TTL_SECONDS = 60
+principal_cache = cache.TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL_SECONDS)
+
 pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
@@ -31,20 +37,52 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
-    credentials_exception = HTTPException(
+def invalidate_principal(email: str):
+    principal_cache.pop(email)
+
+def principal_from_user(user: models.User):
+    return schemas.Principal(id=user.id, email=user.email, full_name=user.full_name, is_admin=user.is_admin or 0)
+
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def _decode_token(token: str):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
     except JWTError:
-        raise credentials_exception
-    user = db.query(models.User).filter(models.User.email == email).first()
+        raise _credentials_exception()
+    if payload.get("sub") is None:
+        raise _credentials_exception()
+    return payload
+
+def _load_user(db: Session, payload: dict):
+    # Tokens issued since the uid claim was added resolve by primary key
+    user_id = payload.get("uid")
+    if user_id is not None:
+        user = db.get(models.User, user_id)
+        if user is not None and user.email != payload["sub"]:
+            user = None
+    else:
+        user = db.query(models.User).filter(models.User.email == payload["sub"]).first()
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
     return user
+
+async def get_current_principal(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
+    """Lightweight current user for routes that only need id / role; no query on cache hits"""
+    payload = _decode_token(token)
+    email = payload["sub"]
+    principal = principal_cache.get(email)
+    if principal is not None and payload.get("uid", principal.id) == principal.id:
+        return principal
+    principal = principal_from_user(_load_user(db, payload))
+    principal_cache.set(email, principal)
+    return principal
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
+    """Full User row attached to the request session, for routes that modify or return it"""
+    return _load_user(db, _decode_token(token))
@@ -0,0 +1,50 @@
+"""
+Activity Category Backfill Script
+Classifies activities whose category is not set yet, CHUNK_SIZE rows per
+read/update/commit (override with --chunk-size). Use --all to reclassify
+every activity, e.g. after changing the keyword lists.
+"""
+
+import sys
+import os
+import argparse
+sys.path.append(os.path.dirname(__file__))
+
+from sqlalchemy import select, update
+from database import ScriptSessionLocal as SessionLocal
+import models, activity_categories
+
+CHUNK_SIZE = 1000
+
+def backfill_categories(chunk_size: int = CHUNK_SIZE, reclassify: bool = False):
+    """Classify activities in id order, one chunk per transaction"""
+    db = SessionLocal()
+    last_id = 0
+    updated = 0
+    try:
+        while True:
+            query = select(models.Activity.id, models.Activity.description).where(models.Activity.id > last_id)
+            if not reclassify:
+                query = query.where(models.Activity.category.is_(None))
+            rows = db.execute(query.order_by(models.Activity.id).limit(chunk_size)).all()
+            if not rows:
+                break
+
+            db.execute(update(models.Activity), [
+                {"id": row.id, "category": activity_categories.classify(row.description)} for row in rows
+            ])
+            db.commit()
+            last_id = rows[-1].id
+            updated += len(rows)
+            print(f"  {updated} activities classified")
+    finally:
+        db.close()
+
+    print("✓ Activity categories backfilled successfully!")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill Activity.category")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--all", action="store_true", help="reclassify activities that already have a category")
+    args = parser.parse_args()
+    backfill_categories(args.chunk_size, args.all)
@@ -0,0 +1,293 @@
+"""
+Budget aggregation helpers.
+Category totals are computed in the database instead of walking ORM objects,
+and materialized into the trip_budget_rollup / trip_budget_daily_rollup tables.
+"""
+
+import datetime
+from sqlalchemy import Date, cast, func, literal, literal_column, select, union_all
+from sqlalchemy.orm import Session
+import database, models
+
+BUDGET_CATEGORIES = ["transport", "stay", "food", "activities", "other"]
+TREND_GRANULARITIES = ["day", "week", "month"]
+
+def empty_breakdown():
+    return {category: 0.0 for category in BUDGET_CATEGORIES}
+
+def normalize_category(category):
+    """Map an expense category onto a breakdown key, folding unknown ones into 'other'"""
+    category = (category or "").lower()
+    return category if category in BUDGET_CATEGORIES else "other"
+
+def add_to_breakdown(breakdown, category, amount):
+    breakdown[normalize_category(category)] += amount or 0.0
+
+def get_trip_category_totals(db: Session, trip_id: int):
+    """Sum stop, activity and expense costs by category in a single query"""
+    stay = select(
+        literal("stay").label("category"),
+        func.sum(models.Stop.accommodation_cost).label("total")
+    ).where(models.Stop.trip_id == trip_id)
+
+    transport = select(
+        literal("transport").label("category"),
+        func.sum(models.Stop.transport_cost).label("total")
+    ).where(models.Stop.trip_id == trip_id)
+
+    activities = select(
+        literal("activities").label("category"),
+        func.sum(models.Activity.cost).label("total")
+    ).join(models.Stop, models.Activity.stop_id == models.Stop.id).where(models.Stop.trip_id == trip_id)
+
+    expense_category = func.lower(models.Expense.category)
+    expenses = select(
+        expense_category.label("category"),
+        func.sum(models.Expense.amount).label("total")
+    ).where(models.Expense.trip_id == trip_id).group_by(expense_category)
+
+    breakdown = empty_breakdown()
+    for row in db.execute(union_all(stay, transport, activities, expenses)):
+        add_to_breakdown(breakdown, row.category, row.total)
+    return breakdown
+
+def get_trip_daily_totals(db: Session, trip_id: int):
+    """Sum expenses by calendar day and category; returns {date: breakdown}"""
+    day = func.date(models.Expense.date, type_=Date)
+    expense_category = func.lower(models.Expense.category)
+    rows = db.query(
+        day.label("day"),
+        expense_category.label("category"),
+        func.sum(models.Expense.amount).label("total")
+    ).filter(models.Expense.trip_id == trip_id, models.Expense.date.isnot(None)).group_by(day, expense_category).all()
+
+    daily = {}
+    for row in rows:
+        add_to_breakdown(daily.setdefault(row.day, empty_breakdown()), row.category, row.total)
+    return daily
+
+# --- SPENDING TREND ---
+def truncate_date(day: datetime.date, granularity: str):
+    """Start of the day/week (Monday)/month period containing day"""
+    if granularity == "week":
+        return day - datetime.timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+def next_period(period_start: datetime.date, granularity: str):
+    if granularity == "week":
+        return period_start + datetime.timedelta(days=7)
+    if granularity == "month":
+        if period_start.month == 12:
+            return datetime.date(period_start.year + 1, 1, 1)
+        return datetime.date(period_start.year, period_start.month + 1, 1)
+    return period_start + datetime.timedelta(days=1)
+
+def period_bucket(column, granularity: str, dialect: str):
+    """SQL expression truncating a DATE column to the start of its period"""
+    if granularity == "day":
+        return column
+    if dialect == "postgresql":
+        # Inline the unit so the SELECT and GROUP BY expressions compare equal
+        return cast(func.date_trunc(literal_column(f"'{granularity}'"), column), Date)
+    # SQLite date modifiers
+    if granularity == "week":
+        return func.date(column, "-6 days", "weekday 1", type_=Date)
+    return func.date(column, "start of month", type_=Date)
+
+def get_trip_period_totals(db: Session, trip_id: int, start: datetime.date, end: datetime.date, granularity: str = "day"):
+    """Sum the daily rollup into periods in SQL; returns {period_start: breakdown}.
+    Trips without a rollup row (created before it existed) are bucketed from their expenses."""
+    if db.get(models.TripBudgetRollup, trip_id) is None:
+        return _live_period_totals(db, trip_id, start, end, granularity)
+
+    daily = models.TripBudgetDailyRollup
+    bucket = period_bucket(daily.date, granularity, db.get_bind().dialect.name).label("period")
+    rows = db.query(
+        bucket,
+        *[func.sum(getattr(daily, category)).label(category) for category in BUDGET_CATEGORIES]
+    ).filter(daily.trip_id == trip_id, daily.date >= start, daily.date <= end).group_by(bucket).all()
+    return {row.period: {category: getattr(row, category) or 0.0 for category in BUDGET_CATEGORIES} for row in rows}
+
+def _live_period_totals(db: Session, trip_id: int, start: datetime.date, end: datetime.date, granularity: str):
+    day = func.date(models.Expense.date, type_=Date)
+    bucket = period_bucket(day, granularity, db.get_bind().dialect.name).label("period")
+    expense_category = func.lower(models.Expense.category)
+    rows = db.query(
+        bucket,
+        expense_category.label("category"),
+        func.sum(models.Expense.amount).label("total")
+    ).filter(
+        models.Expense.trip_id == trip_id, models.Expense.date.isnot(None), day >= start, day <= end
+    ).group_by(bucket, expense_category).all()
+
+    totals = {}
+    for row in rows:
+        add_to_breakdown(totals.setdefault(row.period, empty_breakdown()), row.category, row.total)
+    return totals
+
+def build_spending_trend(start: datetime.date, end: datetime.date, totals: dict, budget_limit_per_day: float, granularity: str = "day"):
+    """Fill every period between start and end in one pass, labelled by its first trip day"""
+    periods = []
+    period_start = truncate_date(start, granularity)
+    while period_start <= end:
+        period_end = next_period(period_start, granularity)
+        first_day = max(period_start, start)
+        trip_days = (min(period_end - datetime.timedelta(days=1), end) - first_day).days + 1
+        breakdown = totals.get(period_start) or empty_breakdown()
+        total = sum(breakdown.values())
+        periods.append({
+            "date": first_day.strftime("%Y-%m-%d"),
+            "total": total,
+            "breakdown": breakdown,
+            "over_budget": total > budget_limit_per_day * trip_days if budget_limit_per_day > 0 else False
+        })
+        period_start = period_end
+    return periods
+
+# --- ROLLUP MAINTENANCE ---
+def rollup_breakdown(rollup):
+    return {category: getattr(rollup, category) or 0.0 for category in BUDGET_CATEGORIES}
+
+def rebuild_trip_rollup(db: Session, trip_id: int):
+    """Recompute the rollup rows of one trip from scratch (caller commits)"""
+    db.query(models.TripBudgetRollup).filter(models.TripBudgetRollup.trip_id == trip_id).delete(synchronize_session=False)
+    db.query(models.TripBudgetDailyRollup).filter(models.TripBudgetDailyRollup.trip_id == trip_id).delete(synchronize_session=False)
+
+    rollup = models.TripBudgetRollup(trip_id=trip_id, **get_trip_category_totals(db, trip_id))
+    db.add(rollup)
+    db.add_all([
+        models.TripBudgetDailyRollup(trip_id=trip_id, date=day, **breakdown)
+        for day, breakdown in get_trip_daily_totals(db, trip_id).items()
+    ])
+    db.flush()
+    return rollup
+
+def create_trip_rollup(db: Session, trip_id: int):
+    """Add the zeroed rollup row of a new trip (caller commits).
+    Trips get their row when they are created, so the increments in record_* always
+    find one; reads never write rollups."""
+    rollup = models.TripBudgetRollup(trip_id=trip_id, **empty_breakdown())
+    db.add(rollup)
+    return rollup
+
+def _increment_trip_rollup(db: Session, trip_id: int, delta: dict):
+    """Apply category deltas in place; returns False if the trip has no rollup yet"""
+    values = {
+        getattr(models.TripBudgetRollup, category): getattr(models.TripBudgetRollup, category) + amount
+        for category, amount in delta.items() if amount
+    }
+    if not values:
+        return False
+    # Only trips created before the rollup existed have no row; rebuild_budget_rollup.py fills them in
+    updated = db.query(models.TripBudgetRollup).filter(
+        models.TripBudgetRollup.trip_id == trip_id
+    ).update(values, synchronize_session=False)
+    return updated > 0
+
+def record_expense(db: Session, expense: models.Expense, sign: int = 1):
+    """Add (sign=1) or remove (sign=-1) an expense from its trip's rollups"""
+    amount = sign * (expense.amount or 0.0)
+    category = normalize_category(expense.category)
+    if not _increment_trip_rollup(db, expense.trip_id, {category: amount}) or not expense.date:
+        return
+
+    # One upsert for the day's row, so concurrent first expenses of a day both count
+    daily = models.TripBudgetDailyRollup.__table__.c
+    db.execute(
+        database.upsert_insert(db, models.TripBudgetDailyRollup)
+        .values(trip_id=expense.trip_id, date=expense.date.date(), **{**empty_breakdown(), category: amount})
+        .on_conflict_do_update(index_elements=[daily.trip_id, daily.date], set_={category: daily[category] + amount})
+    )
+
+def record_stop(db: Session, stop: models.Stop, sign: int = 1):
+    _increment_trip_rollup(db, stop.trip_id, {
+        "stay": sign * (stop.accommodation_cost or 0.0),
+        "transport": sign * (stop.transport_cost or 0.0)
+    })
+
+def record_activity(db: Session, activity: models.Activity, trip_id: int, sign: int = 1):
+    _increment_trip_rollup(db, trip_id, {"activities": sign * (activity.cost or 0.0)})
+
+def record_activity_removal(db: Session, activity: models.Activity, trip_id: int):
+    """Remove an activity and the expenses its delete cascades to"""
+    record_activity(db, activity, trip_id, sign=-1)
+    for expense in activity.expenses:
+        record_expense(db, expense, sign=-1)
+
+def record_stop_removal(db: Session, stop: models.Stop):
+    """Remove a stop, its activities and every expense its delete cascades to"""
+    record_stop(db, stop, sign=-1)
+    expenses = {expense.id: expense for expense in stop.expenses}
+    for activity in stop.activities:
+        record_activity(db, activity, stop.trip_id, sign=-1)
+        expenses.update({expense.id: expense for expense in activity.expenses})
+    for expense in expenses.values():
+        record_expense(db, expense, sign=-1)
+
+def get_budget_summary(db: Session, trip_id: int, owner_id: int):
+    """BudgetSummary payload for an owner's trip from its rollup, or None if not found"""
+    row = db.query(models.Trip, models.TripBudgetRollup).outerjoin(
+        models.TripBudgetRollup, models.TripBudgetRollup.trip_id == models.Trip.id
+    ).filter(models.Trip.id == trip_id, models.Trip.owner_id == owner_id).first()
+    if not row:
+        return None
+
+    trip, rollup = row
+    # Trips created before the rollup existed are summed live until rebuild_budget_rollup.py runs
+    breakdown = rollup_breakdown(rollup) if rollup is not None else get_trip_category_totals(db, trip_id)
+    return build_budget_summary(trip, breakdown)
+
+def build_budget_summary(trip: models.Trip, breakdown: dict):
+    """Build the BudgetSummary payload for a trip from its category totals"""
+    total_cost = sum(breakdown.values())
+    budget_limit = trip.budget_limit or 0.0
+    remaining = budget_limit - total_cost
+    utilization_percentage = (total_cost / budget_limit * 100) if budget_limit > 0 else 0
+
+    # Calculate daily average
+    daily_avg = 0.0
+    daily_target = 0.0
+    if trip.start_date and trip.end_date:
+        days = (trip.end_date - trip.start_date).days + 1
+        if days > 0:
+            daily_avg = total_cost / days
+            daily_target = budget_limit / days if budget_limit > 0 else 0
+
+    # Generate alerts
+    alerts = []
+    for category, amount in breakdown.items():
+        if category != "other" and budget_limit > 0:
+            # Assume each category should be roughly 25% of budget (simplified)
+            category_limit = budget_limit * 0.25
+            category_percentage = (amount / category_limit * 100) if category_limit > 0 else 0
+
+            if category_percentage >= 85:
+                alerts.append({
+                    "type": "warning" if category_percentage < 100 else "danger",
+                    "category": category,
+                    "message": f"{category.capitalize()} category is {int(category_percentage)}% full",
+                    "percentage": category_percentage
+                })
+
+    # Overall budget alert
+    if utilization_percentage >= 90:
+        alerts.append({
+            "type": "danger",
+            "category": "overall",
+            "message": f"You've used {int(utilization_percentage)}% of your total budget",
+            "percentage": utilization_percentage
+        })
+
+    return {
+        "budget_limit": budget_limit,
+        "total_cost": total_cost,
+        "remaining": remaining,
+        "utilization_percentage": utilization_percentage,
+        "breakdown": breakdown,
+        "daily_average": daily_avg,
+        "daily_target": daily_target,
+        "currency": "USD",
+        "alerts": alerts
+    }
@@ -0,0 +1,28 @@
+"""
+Recommendation Build Script
+Creates the user_recommendations table if needed and recomputes every
+user's top destinations (see recommendations.py). Run periodically,
+e.g. nightly; the dashboard only reads the stored results.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(__file__))
+
+from database import Base, script_engine as engine, ScriptSessionLocal as SessionLocal
+import models, recommendations
+
+def build_recommendations():
+    """Rebuild recommendations for all users"""
+    Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        user_count = recommendations.rebuild(db)
+    finally:
+        db.close()
+
+    print(f"✓ Recommendations rebuilt for {user_count} users!")
+
+if __name__ == "__main__":
+    build_recommendations()
@@ -0,0 +1,103 @@
+"""
+In-process typeahead index over the cities table.
+Keeps a sorted array of lowercased name keys (one per word start, so
+"york" finds "New York") and answers prefix lookups with bisect, returning
+the most popular matches. The index is marked stale when a session that
+wrote City rows in this process commits, and is reloaded at most every
+MAX_AGE_SECONDS to pick up changes made elsewhere.
+"""
+
+import heapq
+import threading
+import time
+from bisect import bisect_left
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+import models
+
+MAX_AGE_SECONDS = 300
+DEFAULT_TYPEAHEAD_LIMIT = 10
+
+def _name_keys(name: str):
+    """Lowercased name and every suffix of it that starts a word"""
+    name = (name or "").lower()
+    keys = [name]
+    for index, char in enumerate(name):
+        if char == " " and index + 1 < len(name) and name[index + 1] != " ":
+            keys.append(name[index + 1:])
+    return keys
+
+def _city_payload(city: models.City):
+    return {
+        "id": city.id,
+        "name": city.name,
+        "country": city.country,
+        "description": city.description,
+        "image_url": city.image_url,
+        "cost_index": city.cost_index,
+        "popularity": city.popularity,
+    }
+
+class CityIndex:
+    def __init__(self, max_age: float = MAX_AGE_SECONDS):
+        self.max_age = max_age
+        self._keys = []     # sorted (key, city_id)
+        self._cities = {}   # city_id -> payload without catalog_activities
+        self._loaded_at = None
+        self._stale = True
+        self._lock = threading.Lock()
+
+    def load(self, db: Session):
+        cities = {city.id: _city_payload(city) for city in db.query(models.City)}
+        keys = sorted((key, city_id) for city_id, city in cities.items() for key in _name_keys(city["name"]))
+        with self._lock:
+            self._cities = cities
+            self._keys = keys
+            self._loaded_at = time.monotonic()
+            self._stale = False
+
+    def mark_stale(self):
+        self._stale = True
+
+    def ensure_fresh(self, db: Session):
+        if self._stale or self._loaded_at is None or time.monotonic() - self._loaded_at > self.max_age:
+            self.load(db)
+
+    def search(self, prefix: str, country: str = "", limit: int = DEFAULT_TYPEAHEAD_LIMIT):
+        """Top `limit` cities by popularity whose name (or a word in it) starts with prefix"""
+        prefix = prefix.lower().strip()
+        country = country.lower()
+        with self._lock:
+            keys, cities = self._keys, self._cities
+
+        if prefix:
+            start = bisect_left(keys, (prefix,))
+            end = bisect_left(keys, (prefix + "\uffff",))
+            candidates = {city_id for _, city_id in keys[start:end]}
+        else:
+            candidates = cities.keys()
+
+        matches = (cities[city_id] for city_id in candidates)
+        if country:
+            matches = (city for city in matches if country in (city["country"] or "").lower())
+        return heapq.nlargest(limit, matches, key=lambda city: (city["popularity"] or 0, -city["id"]))
+
+city_index = CityIndex()
+
+@event.listens_for(models.City, "after_insert")
+@event.listens_for(models.City, "after_update")
+@event.listens_for(models.City, "after_delete")
+def _city_changed(mapper, connection, target):
+    # Only remembered here; a reload before the commit would miss the change or pick up a rolled-back one
+    session = object_session(target)
+    if session is not None:
+        session.info["cities_changed"] = True
+
+@event.listens_for(Session, "after_commit")
+def _session_committed(session):
+    if session.info.pop("cities_changed", False):
+        city_index.mark_stale()
+
+@event.listens_for(Session, "after_rollback")
+def _session_rolled_back(session):
+    session.info.pop("cities_changed", None)
@@ -0,0 +1,70 @@
+"""
+Links between itinerary stops and the cities catalog.
+Stop.city_name stays free text; Stop.city_id points at the catalog city with
+the same name (case-insensitive, most popular on ties) or is NULL when there
+is none. It is resolved when a stop is inserted or renamed through the ORM,
+in bulk by the itinerary batch writes, and for existing rows by
+migrate_stop_city.py. Adding or renaming a catalog city through the ORM links
+the unlinked stops that carry its name; stops already linked are not moved.
+"""
+
+from sqlalchemy import event, func, select, update
+from sqlalchemy.orm import attributes
+import models
+
+def name_key(name: str):
+    return (name or "").strip().lower()
+
+def resolve(db, names):
+    """{name_key: city_id} for the names that match a catalog city, in one query.
+    db may be a Session or a Connection."""
+    keys = {name_key(name) for name in names} - {""}
+    if not keys:
+        return {}
+    city_ids = {}
+    rows = db.execute(
+        select(models.City.id, models.City.name)
+        .where(func.lower(models.City.name).in_(keys))
+        .order_by(func.coalesce(models.City.popularity, 0).desc(), models.City.id)
+    )
+    for city_id, name in rows:
+        city_ids.setdefault(name_key(name), city_id)
+    return city_ids
+
+def link_rows(db, rows):
+    """Set city_id on stop row dicts (insert or executemany update params) from their city_name"""
+    city_ids = resolve(db, [row["city_name"] for row in rows])
+    for row in rows:
+        row["city_id"] = city_ids.get(name_key(row["city_name"]))
+    return rows
+
+@event.listens_for(models.Stop, "before_insert")
+def _link_new_stop(mapper, connection, target):
+    if target.city_id is None:
+        target.city_id = resolve(connection, [target.city_name]).get(name_key(target.city_name))
+
+@event.listens_for(models.Stop, "before_update")
+def _link_renamed_stop(mapper, connection, target):
+    renamed = attributes.get_history(target, "city_name").has_changes()
+    if renamed and not attributes.get_history(target, "city_id").has_changes():
+        target.city_id = resolve(connection, [target.city_name]).get(name_key(target.city_name))
+
+def link_unlinked_stops(db, city_id, city_name):
+    """Point stops without a city whose name matches city_name at city_id, in one UPDATE"""
+    key = name_key(city_name)
+    if not key:
+        return
+    db.execute(
+        update(models.Stop)
+        .where(models.Stop.city_id.is_(None), func.lower(func.trim(models.Stop.city_name)) == key)
+        .values(city_id=city_id)
+    )
+
+@event.listens_for(models.City, "after_insert")
+def _link_new_city(mapper, connection, target):
+    link_unlinked_stops(connection, target.id, target.name)
+
+@event.listens_for(models.City, "after_update")
+def _link_renamed_city(mapper, connection, target):
+    if attributes.get_history(target, "name").has_changes():
+        link_unlinked_stops(connection, target.id, target.name)
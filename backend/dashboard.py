@@ -0,0 +1,78 @@
+"""
+Per-user dashboard snapshots.
+The serialized DashboardData payload is cached per user. Within
+DASHBOARD_FRESH_SECONDS it is served as is; after that (up to
+DASHBOARD_CACHE_TTL_SECONDS) the stale snapshot is still served while a
+background task rebuilds it. Trip writes drop the user's snapshot so the
+next request rebuilds it synchronously; a synchronous build holds the slot
+with a load marker (as public_trips does) so an invalidation during the build
+is not overwritten. A rebuild claim expires after
+DASHBOARD_REFRESH_TIMEOUT_SECONDS, so a background task that never ran
+(e.g. the client disconnected first) does not block later refreshes.
+"""
+
+import time
+from fastapi import BackgroundTasks
+from sqlalchemy.orm import Session
+import database, models, schemas, recommendations, itinerary
+from cache import TTLCache
+
+DASHBOARD_CACHE_SIZE = 10000
+DASHBOARD_FRESH_SECONDS = 60
+DASHBOARD_CACHE_TTL_SECONDS = 900
+DASHBOARD_REFRESH_TIMEOUT_SECONDS = 60
+
+# Shown when the city catalog is empty
+FEATURED_DESTINATIONS = [
+    {"city": "Reykjavik", "country": "Iceland", "price_from": 450, "image_url": "https://lh3.googleusercontent.com/aida-public/AB6AXuC6GJgLZY4kyXAYASsKn277Ps-oRz1gH1edcnoSsSHRqVL8P2vKbFO1GfRiAHhhcYn2FS5UPtBlxjiDsszJKS4yxrsH7mr8rIzv18Jx-Bei0x-NoCn3g6qAb6yZexcvJx-YY-Jbd7MM2Wx3F485723CE_hO7Xp--tAKcLh_lHoX6K9n-h7nqWrgqShdJ28_6KOeMhU4Qz15u6QsvYE3bv4o6_4lrILnWlGyV1gK419XuaNOYuznIuqGcFYqcAdmWkYz5cEMLN6zzUap"},
+    {"city": "Kyoto", "country": "Japan", "price_from": 820, "image_url": "https://lh3.googleusercontent.com/aida-public/AB6AXuDxz9BBVOv6etnYJDXVwiRxtvgjfVRRz12N2KAHy6FCcNkULmmoncg7oCuPmMpZgkERSTtu8bk-c8bDAIwIwDKDepxm1Z8UFHADT0fWz6EFbNhBKXynVXWQbFMOzHf5ZqrfcsbmNIDSzOQYtDHcS50-OLNCLFxbyQK87HO4L5oLWrZtsD1YRDu0CKxKtxYDpDH-XCCV0WNqZ8bWQhmKYZf-9us7WIjKfaUwwyYhBHSslu3YiFDy2FVolHRL74BX0W4M6xOdJIdX7XB6"},
+    {"city": "Paris", "country": "France", "price_from": 620, "image_url": "https://lh3.googleusercontent.com/aida-public/AB6AXuAFJH8PAUCCRJ2nvhZYuiutdLeK_ukmLK5rF6mwRYlRVqOxQNMi7P8YMRHt-b8b5v6sbWH50udWNnasbLgL84oxURJnOtp-1gAtaX1_GXESra6Q4FGfKTW9EzTG1Ojeu4vwgKh2WMiFodC6ZCBNPwb0xPEicv_Lai60oWPa1eoF7eCfkfQ_vuVfkIKHWIt6QpHZz0hGYnKftfEB2GMgk49jlIdK1jT2U_Q_RCsn-Nfwy8SUU9WYbNzj3wbA2aSEJjEUkR2gGwTHGR-W"},
+    {"city": "Bali", "country": "Indonesia", "price_from": 380, "image_url": "https://lh3.googleusercontent.com/aida-public/AB6AXuCBSDIOqyW7ATjFUseJt5QifrMdpgvzq3D_80diDbfVH9Zlao8DJO3yLogI8o-yr8lp6aY4sMkYUW014lCWR5y2eZfONFLdrjv6NqEnSsZs3mPdsp_-MpZfZOFEgb3iLzX91u9EauIU492pHhdOTg3LpCUwnhC8ZcHNvWO7g8btuwB4EOeCdmkaFbVcu7tPgZaA_jtHwjyXRLqmdeiNRpsUCupr4ZVRl_OLstPjvcHj2LRDLICQ-cADXpBUmoivc5gbmBpuonIE8WTM"}
+]
+
+dashboard_cache = TTLCache(maxsize=DASHBOARD_CACHE_SIZE, ttl=DASHBOARD_CACHE_TTL_SECONDS)
+_refresh_claims = TTLCache(maxsize=DASHBOARD_CACHE_SIZE, ttl=DASHBOARD_REFRESH_TIMEOUT_SECONDS)
+
+def build_snapshot(db: Session, user):
+    """Serialized DashboardData for user (anything with id and full_name)"""
+    trips = itinerary.query_trip_graph(db)
+    upcoming_trip = trips.filter(models.Trip.owner_id == user.id, models.Trip.status == "upcoming").first()
+    recent_trips = trips.filter(models.Trip.owner_id == user.id).limit(5).all()
+    return schemas.DashboardData.model_validate({
+        "full_name": user.full_name,
+        "upcoming_trip": upcoming_trip,
+        "recent_trips": recent_trips,
+        "recommendations": recommendations.for_user(db, user.id) or FEATURED_DESTINATIONS
+    }).model_dump_json().encode()
+
+def _store(db: Session, user):
+    """Build and cache user's snapshot; a load marker holds the slot meanwhile, so if a
+    trip write invalidates it while building, the (possibly stale) snapshot is not kept"""
+    marker = object()
+    dashboard_cache.set(user.id, marker)
+    entry = (time.monotonic(), build_snapshot(db, user))
+    dashboard_cache.replace(user.id, marker, entry)
+    return entry
+
+def _refresh(user, stale_entry):
+    db = database.SessionLocal()
+    try:
+        # Skip storing if the snapshot was invalidated while rebuilding
+        dashboard_cache.replace(user.id, stale_entry, (time.monotonic(), build_snapshot(db, user)))
+    finally:
+        db.close()
+        _refresh_claims.pop(user.id)
+
+def get_snapshot(db: Session, user, background_tasks: BackgroundTasks):
+    """Cached dashboard body for user, scheduling a rebuild if it is stale"""
+    entry = dashboard_cache.get(user.id)
+    if not isinstance(entry, tuple):  # missing, or another request is building it
+        return _store(db, user)[1]
+
+    built_at, body = entry
+    if time.monotonic() - built_at > DASHBOARD_FRESH_SECONDS and _refresh_claims.add(user.id, entry):
+        background_tasks.add_task(_refresh, user, entry)
+    return body
+
+def invalidate(user_id: int):
+    dashboard_cache.pop(user_id)
@@ -0,0 +1,165 @@
+"""
+Expense export and import.
+Exports stream from their own session with yield_per (a server-side cursor on
+PostgreSQL), writing one CSV/NDJSON chunk per fetched batch, so memory use
+does not grow with the number of expenses. Imports read the upload line by
+line, validate rows against ExpenseCreate and insert each chunk of valid rows
+with one executemany INSERT.
+"""
+
+import csv
+import io
+import json
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Query, Session
+import database, models, schemas, budget
+
+EXPORT_CHUNK_SIZE = 1000
+IMPORT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+IMPORT_EXTENSIONS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+EXPORT_FIELDS = ["id", "trip_id", "stop_id", "activity_id", "name", "category", "amount", "currency", "date", "notes"]
+
+def filter_expenses(query: Query, category=None, start_date=None, end_date=None):
+    """The category/date filters shared by the expense list and export"""
+    if category:
+        query = query.filter(models.Expense.category == category)
+    if start_date:
+        query = query.filter(models.Expense.date >= start_date)
+    if end_date:
+        query = query.filter(models.Expense.date <= end_date)
+    return query
+
+def _export_row(expense: models.Expense):
+    row = {field: getattr(expense, field) for field in EXPORT_FIELDS}
+    row["date"] = expense.date.isoformat() if expense.date else None
+    return row
+
+def _chunks(rows, chunk_size: int):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def stream_expenses(trip_id: int, export_format: str, category=None, start_date=None, end_date=None, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """Yield the trip's (filtered) expenses as CSV or NDJSON text chunks"""
+    db = database.SessionLocal()
+    try:
+        query = filter_expenses(db.query(models.Expense).filter(models.Expense.trip_id == trip_id), category, start_date, end_date)
+        rows = (_export_row(expense) for expense in query.order_by(models.Expense.id).yield_per(chunk_size))
+
+        if export_format == "csv":
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+            writer.writeheader()
+            for chunk in _chunks(rows, chunk_size):
+                writer.writerows(chunk)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            yield buffer.getvalue()
+        else:
+            for chunk in _chunks(rows, chunk_size):
+                yield "".join(json.dumps(row) + "\n" for row in chunk)
+    finally:
+        db.close()
+
+def import_format_for(filename: str):
+    """csv/ndjson from an upload's file extension, or None"""
+    for extension, import_format in IMPORT_EXTENSIONS.items():
+        if (filename or "").lower().endswith(extension):
+            return import_format
+    return None
+
+def _read_rows(binary_file, import_format: str):
+    """Yield (row_number, raw dict or error message) without reading the whole upload"""
+    text = io.TextIOWrapper(binary_file, encoding="utf-8-sig", newline="")
+    if import_format == "csv":
+        reader = csv.DictReader(text)
+        try:
+            reader.fieldnames
+        except csv.Error as e:
+            yield 0, f"Invalid CSV header: {e}"
+            return
+        row_number = 0
+        while True:
+            row_number += 1
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                # e.g. an oversized field; the reader resumes at the next line
+                yield row_number, f"Invalid CSV: {e}"
+                continue
+            # Empty CSV cells mean "not set"
+            yield row_number, {key: value for key, value in row.items() if key and value != ""}
+
+    row_number = 0
+    for line in text:
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield row_number, f"Invalid JSON: {e}"
+            continue
+        yield row_number, row if isinstance(row, dict) else "Expected a JSON object"
+
+def _validation_message(error: ValidationError):
+    return "; ".join(f"{'.'.join(str(part) for part in item['loc']) or 'row'}: {item['msg']}" for item in error.errors())
+
+def import_expenses(db: Session, trip_id: int, binary_file, import_format: str, chunk_size: int = IMPORT_CHUNK_SIZE):
+    """Insert the valid rows of an uploaded file into trip_id; the caller commits.
+    Returns the import report (counts plus the first MAX_REPORTED_ERRORS row errors)."""
+    stop_ids = set(db.scalars(select(models.Stop.id).where(models.Stop.trip_id == trip_id)))
+    activity_ids = set(db.scalars(
+        select(models.Activity.id).join(models.Stop).where(models.Stop.trip_id == trip_id)
+    ))
+    imported = 0
+    failed = 0
+    errors = []
+    chunk = []
+
+    def flush():
+        if chunk:
+            db.execute(insert(models.Expense).execution_options(render_nulls=True), chunk)
+            chunk.clear()
+
+    for row_number, row in _read_rows(binary_file, import_format):
+        error = None
+        if isinstance(row, str):
+            error = row
+        else:
+            try:
+                expense = schemas.ExpenseCreate.model_validate(row)
+            except ValidationError as e:
+                error = _validation_message(e)
+            else:
+                if expense.stop_id is not None and expense.stop_id not in stop_ids:
+                    error = f"stop_id: Stop {expense.stop_id} is not part of this trip"
+                elif expense.activity_id is not None and expense.activity_id not in activity_ids:
+                    error = f"activity_id: Activity {expense.activity_id} is not part of this trip"
+
+        if error:
+            failed += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({"row": row_number, "error": error})
+            continue
+
+        chunk.append({**expense.model_dump(), "trip_id": trip_id})
+        imported += 1
+        if len(chunk) >= chunk_size:
+            flush()
+    flush()
+
+    if imported:
+        budget.rebuild_trip_rollup(db, trip_id)
+    return {"imported": imported, "failed": failed, "errors": errors}
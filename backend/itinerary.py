@@ -0,0 +1,190 @@
+"""
+Trip graph loading and bulk itinerary writes.
+query_trip_graph() is the shared query for everything that serializes a
+trip with its stops and activities. Applies a diff of stop/activity creates, updates and deletes to one trip
+in a single transaction using set-based statements (executemany /
+multi-row INSERT ... RETURNING) instead of one request and commit per item.
+Trip copies are deep-copied the same way.
+"""
+
+import datetime
+from fastapi import HTTPException
+from sqlalchemy import delete, insert, or_, select, update
+from sqlalchemy.orm import Session, selectinload
+import models, schemas, budget, ordering, activity_categories, city_links
+
+STOP_FIELDS = set(schemas.StopBase.model_fields)
+ACTIVITY_FIELDS = set(schemas.ActivityBase.model_fields)
+
+def query_trip_graph(db: Session):
+    """Trip query that bulk-loads stops and their activities for routes serializing the full trip graph"""
+    return db.query(models.Trip).options(selectinload(models.Trip.stops).selectinload(models.Stop.activities))
+
+def _insert_returning_ids(db: Session, model, rows):
+    if not rows:
+        return []
+    statement = insert(model).returning(model.id, sort_by_parameter_order=True).execution_options(render_nulls=True)
+    return list(db.scalars(statement, rows))
+
+def _delete_stop_graph(db: Session, stop_ids, activity_ids):
+    """Bulk delete stops/activities plus what the ORM cascades would have removed"""
+    if stop_ids:
+        activity_ids = set(activity_ids) | set(db.scalars(
+            select(models.Activity.id).where(models.Activity.stop_id.in_(stop_ids))
+        ))
+    if not stop_ids and not activity_ids:
+        return
+
+    expense_filters = []
+    if stop_ids:
+        expense_filters.append(models.Expense.stop_id.in_(stop_ids))
+    if activity_ids:
+        expense_filters.append(models.Expense.activity_id.in_(activity_ids))
+    db.execute(delete(models.Expense).where(or_(*expense_filters)))
+    if activity_ids:
+        db.execute(delete(models.Activity).where(models.Activity.id.in_(activity_ids)))
+    if stop_ids:
+        db.execute(delete(models.Stop).where(models.Stop.id.in_(stop_ids)))
+
+def apply_itinerary_batch(db: Session, trip_id: int, batch: schemas.ItineraryBatch):
+    """Apply batch to an (already ownership-checked) trip; the caller commits"""
+    # Validate every referenced id against the trip in two queries
+    stop_ids = set(batch.delete_stops) | {stop.id for stop in batch.update_stops} | {
+        activity.stop_id for activity in batch.create_activities if activity.stop_id is not None
+    }
+    trip_stop_ids = set(db.scalars(
+        select(models.Stop.id).where(models.Stop.trip_id == trip_id, models.Stop.id.in_(stop_ids))
+    )) if stop_ids else set()
+    if stop_ids - trip_stop_ids:
+        raise HTTPException(status_code=404, detail=f"Stop not found: {min(stop_ids - trip_stop_ids)}")
+
+    activity_ids = set(batch.delete_activities) | {activity.id for activity in batch.update_activities}
+    trip_activity_ids = set(db.scalars(
+        select(models.Activity.id).join(models.Stop).where(models.Stop.trip_id == trip_id, models.Activity.id.in_(activity_ids))
+    )) if activity_ids else set()
+    if activity_ids - trip_activity_ids:
+        raise HTTPException(status_code=404, detail=f"Activity not found: {min(activity_ids - trip_activity_ids)}")
+
+    refs = [stop.ref for stop in batch.create_stops if stop.ref is not None]
+    if len(refs) != len(set(refs)):
+        raise HTTPException(status_code=400, detail="Duplicate stop ref in batch")
+    deleted_stops = set(batch.delete_stops)
+    for activity in batch.create_activities:
+        if (activity.stop_id is None) == (activity.stop_ref is None):
+            raise HTTPException(status_code=400, detail="Each new activity needs exactly one of stop_id or stop_ref")
+        if activity.stop_ref is not None and activity.stop_ref not in refs:
+            raise HTTPException(status_code=400, detail=f"Unknown stop_ref: {activity.stop_ref}")
+        if activity.stop_id in deleted_stops:
+            raise HTTPException(status_code=400, detail=f"Stop {activity.stop_id} is deleted in this batch")
+
+    # Deletes, then updates (executemany by primary key), then inserts
+    _delete_stop_graph(db, batch.delete_stops, batch.delete_activities)
+
+    # Catalog city ids of created and renamed stops, resolved in one query
+    stop_updates = [stop.model_dump(include=STOP_FIELDS | {"id"}) for stop in batch.update_stops if stop.id not in deleted_stops]
+    # New stops are appended after the trip's remaining stops (as updated by this batch), in create_stops order
+    last_rank = max(
+        [ordering.last_ranks(db, models.Stop, models.Stop.trip_id, [trip_id]).get(trip_id, 0.0)]
+        + [stop["sort_order"] for stop in stop_updates]
+    )
+    stop_rows = [
+        {**stop.model_dump(include=STOP_FIELDS), "trip_id": trip_id, "sort_order": last_rank + (index + 1) * ordering.RANK_STEP}
+        for index, stop in enumerate(batch.create_stops)
+    ]
+    city_links.link_rows(db, stop_updates + stop_rows)
+    if stop_updates:
+        db.execute(update(models.Stop), stop_updates)
+    deleted_activities = set(batch.delete_activities)
+    activity_updates = [
+        {**activity.model_dump(include=ACTIVITY_FIELDS | {"id"}), "category": activity_categories.classify(activity.description)}
+        for activity in batch.update_activities if activity.id not in deleted_activities
+    ]
+    if activity_updates:
+        db.execute(update(models.Activity), activity_updates)
+
+    new_stop_ids = _insert_returning_ids(db, models.Stop, stop_rows)
+    ref_ids = {stop.ref: stop_id for stop, stop_id in zip(batch.create_stops, new_stop_ids) if stop.ref is not None}
+
+    # Nested activities first, then create_activities, in one multi-row insert
+    activity_rows = [
+        {**activity.model_dump(include=ACTIVITY_FIELDS), "stop_id": stop_id}
+        for stop, stop_id in zip(batch.create_stops, new_stop_ids) for activity in stop.activities
+    ] + [
+        {**activity.model_dump(include=ACTIVITY_FIELDS), "stop_id": activity.stop_id if activity.stop_id is not None else ref_ids[activity.stop_ref]}
+        for activity in batch.create_activities
+    ]
+    # New activities are appended after each stop's existing ones
+    last_ranks = ordering.last_ranks(db, models.Activity, models.Activity.stop_id, {
+        activity.stop_id for activity in batch.create_activities if activity.stop_id is not None
+    })
+    for row in activity_rows:
+        row["sort_order"] = last_ranks[row["stop_id"]] = last_ranks.get(row["stop_id"], 0.0) + ordering.RANK_STEP
+        row["category"] = activity_categories.classify(row["description"])
+    new_activity_ids = _insert_returning_ids(db, models.Activity, activity_rows)
+
+    created_stops = []
+    position = 0
+    for stop, stop_id in zip(batch.create_stops, new_stop_ids):
+        created_stops.append({"id": stop_id, "ref": stop.ref, "activity_ids": new_activity_ids[position:position + len(stop.activities)]})
+        position += len(stop.activities)
+
+    budget.rebuild_trip_rollup(db, trip_id)
+    return {"stops": created_stops, "activity_ids": new_activity_ids[position:]}
+
+def _column_values(model, row, exclude=("id",)):
+    return {column.key: getattr(row, column.key) for column in model.__table__.columns if column.key not in exclude}
+
+def copy_trip_graph(db: Session, source: models.Trip, owner_id: int, start_date: datetime.datetime, include_expenses: bool = False):
+    """Clone source with its stops, activities (and expenses) for owner_id, starting on start_date.
+    Each table is copied with one multi-row INSERT ... RETURNING; the caller commits."""
+    shift = start_date - source.start_date
+    new_trip = models.Trip(
+        destination=source.destination,
+        title=f"Copy of {source.title}",
+        description=source.description,
+        start_date=start_date,
+        end_date=source.end_date + shift,
+        budget_limit=source.budget_limit,
+        cover_image_url=source.cover_image_url,
+        status="planning",
+        owner_id=owner_id
+    )
+    db.add(new_trip)
+    db.flush()
+
+    # Stops keep their day offset and length in days from the trip start
+    stops = db.execute(select(models.Stop).where(models.Stop.trip_id == source.id).order_by(models.Stop.id)).scalars().all()
+    stop_rows = []
+    for stop in stops:
+        arrival = start_date + datetime.timedelta(days=(stop.arrival_date - source.start_date).days)
+        stop_rows.append({
+            **_column_values(models.Stop, stop),
+            "trip_id": new_trip.id,
+            "arrival_date": arrival,
+            "departure_date": arrival + datetime.timedelta(days=(stop.departure_date - stop.arrival_date).days),
+        })
+    stop_ids = dict(zip((stop.id for stop in stops), _insert_returning_ids(db, models.Stop, stop_rows)))
+
+    activities = db.execute(
+        select(models.Activity).where(models.Activity.stop_id.in_(stop_ids)).order_by(models.Activity.id)
+    ).scalars().all() if stop_ids else []
+    activity_ids = dict(zip((activity.id for activity in activities), _insert_returning_ids(db, models.Activity, [
+        {**_column_values(models.Activity, activity), "stop_id": stop_ids[activity.stop_id]} for activity in activities
+    ])))
+
+    if include_expenses:
+        expense_rows = [
+            {
+                **_column_values(models.Expense, expense, exclude=("id", "created_at")),
+                "trip_id": new_trip.id,
+                "stop_id": stop_ids.get(expense.stop_id),
+                "activity_id": activity_ids.get(expense.activity_id),
+                "date": expense.date + shift if expense.date else None,
+            }
+            for expense in db.execute(select(models.Expense).where(models.Expense.trip_id == source.id)).scalars()
+        ]
+        if expense_rows:
+            db.execute(insert(models.Expense).execution_options(render_nulls=True), expense_rows)
+
+    budget.rebuild_trip_rollup(db, new_trip.id)
+    return new_trip
@@ -1,19 +1,36 @@
+import base64
 import datetime
+from contextlib import asynccontextmanager
 import os
 import sys
 
 # Ensure backend directory is in path for imports
 sys.path.append(os.path.dirname(__file__))
 
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, BackgroundTasks, Depends, File, Header, HTTPException, Query, Response, UploadFile, status
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from typing import List
-import models, schemas, auth, database
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import Session, joinedload, load_only, raiseload, selectinload
+from typing import List, Optional, Union
+import models, schemas, auth, database, budget, search, itinerary, ordering, public_trips, timeline, expense_io, dashboard, admin_stats
+from city_index import city_index, DEFAULT_TYPEAHEAD_LIMIT
+from itinerary import query_trip_graph
 from database import engine, get_db
 
-<<<<<<< HEAD
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm in-process indexes; if the database is unreachable they load on first use instead
+    db = database.SessionLocal()
+    try:
+        city_index.load(db)
+    except Exception as e:
+        print(f"City index not loaded at startup: {e}")
+    finally:
+        db.close()
+    yield
+
+app = FastAPI(lifespan=lifespan)
 print("DEBUG: LOADING MAIN.PY WITH BUDGET ENDPOINT")
 
 app.add_middleware(
@@ -22,29 +39,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-=======
-app = FastAPI(title="GlobeTrotter")
-print("DEBUG: LOADING MAIN.PY WITH BUDGET ENDPOINT")
-
-# Create database tables at import time (important for uvicorn)
-models.Base.metadata.create_all(bind=engine)
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=[
-        "http://localhost:3000", 
-        "http://127.0.0.1:3000", 
-        "http://localhost:8000", 
-        "http://127.0.0.1:8000",
-        "http://localhost:5500",  # Common Live Server port
-        "http://127.0.0.1:5500",
-        "*"  # Allow all origins for development
-    ],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-    expose_headers=["*"],
->>>>>>> b1b02e3c0d2006fd00e882c768604aa877c20d20
+    expose_headers=["X-Next-Cursor"],
 )
 
 # --- AUTH ROUTES ---
@@ -57,6 +52,7 @@ def signup(user: schemas.UserCreate, db: Session = Depends(get_db)):
     hashed_password = auth.get_password_hash(user.password)
     new_user = models.User(email=user.email, hashed_password=hashed_password, full_name=user.full_name)
     db.add(new_user)
+    admin_stats.record_daily(db, users_signed_up=1)
     db.commit()
     db.refresh(new_user)
     return new_user
@@ -66,98 +62,21 @@ def login(form_data: schemas.UserCreate, db: Session = Depends(get_db)):
     user = db.query(models.User).filter(models.User.email == form_data.email).first()
     if not user or not auth.verify_password(form_data.password, user.hashed_password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect email or password")
-    access_token = auth.create_access_token(data={"sub": user.email})
+    access_token = auth.create_access_token(data={"sub": user.email, "uid": user.id})
     return {"access_token": access_token, "token_type": "bearer"}
 
 
 
 # --- ENHANCED BUDGET ROUTES ---
 @app.get("/budget/{trip_id}", response_model=schemas.BudgetSummary)
-def get_trip_budget(trip_id: int, current_user: models.User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
-    trip = db.query(models.Trip).filter(models.Trip.id == trip_id, models.Trip.owner_id == current_user.id).first()
-    if not trip:
+def get_trip_budget(trip_id: int, current_user: schemas.Principal = Depends(auth.get_current_principal), db: Session = Depends(get_db)):
+    summary = budget.get_budget_summary(db, trip_id, current_user.id)
+    if summary is None:
         raise HTTPException(status_code=404, detail="Trip not found")
-
-    stops = db.query(models.Stop).filter(models.Stop.trip_id == trip_id).all()
-    expenses = db.query(models.Expense).filter(models.Expense.trip_id == trip_id).all()
-    
-    # Calculate breakdown by category
-    breakdown = {
-        "transport": 0.0,
-        "stay": 0.0,
-        "food": 0.0,
-        "activities": 0.0,
-        "other": 0.0
-    }
-    
-    # Add costs from stops
-    for stop in stops:
-        breakdown["stay"] += stop.accommodation_cost
-        breakdown["transport"] += stop.transport_cost
-        for activity in stop.activities:
-            breakdown["activities"] += activity.cost
-    
-    # Add costs from expenses
-    for expense in expenses:
-        category = expense.category.lower()
-        if category in breakdown:
-            breakdown[category] += expense.amount
-        else:
-            breakdown["other"] += expense.amount
-    
-    total_cost = sum(breakdown.values())
-    budget_limit = trip.budget_limit or 0.0
-    remaining = budget_limit - total_cost
-    utilization_percentage = (total_cost / budget_limit * 100) if budget_limit > 0 else 0
-    
-    # Calculate daily average
-    daily_avg = 0.0
-    daily_target = 0.0
-    if trip.start_date and trip.end_date:
-        days = (trip.end_date - trip.start_date).days + 1
-        if days > 0:
-            daily_avg = total_cost / days
-            daily_target = budget_limit / days if budget_limit > 0 else 0
-    
-    # Generate alerts
-    alerts = []
-    for category, amount in breakdown.items():
-        if category != "other" and budget_limit > 0:
-            # Assume each category should be roughly 25% of budget (simplified)
-            category_limit = budget_limit * 0.25
-            category_percentage = (amount / category_limit * 100) if category_limit > 0 else 0
-            
-            if category_percentage >= 85:
-                alerts.append({
-                    "type": "warning" if category_percentage < 100 else "danger",
-                    "category": category,
-                    "message": f"{category.capitalize()} category is {int(category_percentage)}% full",
-                    "percentage": category_percentage
-                })
-    
-    # Overall budget alert
-    if utilization_percentage >= 90:
-        alerts.append({
-            "type": "danger",
-            "category": "overall",
-            "message": f"You've used {int(utilization_percentage)}% of your total budget",
-            "percentage": utilization_percentage
-        })
-    
-    return {
-        "budget_limit": budget_limit,
-        "total_cost": total_cost,
-        "remaining": remaining,
-        "utilization_percentage": utilization_percentage,
-        "breakdown": breakdown,
-        "daily_average": daily_avg,
-        "daily_target": daily_target,
-        "currency": "USD",
-        "alerts": alerts
-    }
+    return summary
 
 @app.get("/budget/{trip_id}/daily-trend", response_model=schemas.DailyTrendResponse)
-def get_daily_trend(trip_id: int, current_user: models.User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
+def get_daily_trend(trip_id: int, granularity: str = "day", current_user: schemas.Principal = Depends(auth.get_current_principal), db: Session = Depends(get_db)):
     trip = db.query(models.Trip).filter(models.Trip.id == trip_id, models.Trip.owner_id == current_user.id).first()
     if not trip:
         raise HTTPException(status_code=404, detail="Trip not found")
@@ -165,52 +84,22 @@ def get_daily_trend(trip_id: int, current_user: models.User = Depends(auth.get_c
     if not trip.start_date or not trip.end_date:
         raise HTTPException(status_code=400, detail="Trip must have start and end dates")
     
-    # Get all expenses
-    expenses = db.query(models.Expense).filter(models.Expense.trip_id == trip_id).all()
+    if granularity not in budget.TREND_GRANULARITIES:
+        raise HTTPException(status_code=400, detail="Invalid granularity. Use day, week or month")
     
     # Calculate daily budget limit
     days = (trip.end_date - trip.start_date).days + 1
     budget_limit_per_day = (trip.budget_limit / days) if trip.budget_limit and days > 0 else 0
     
-    # Group expenses by date
-    daily_data = {}
-    current_date = trip.start_date.date()
+    # Bucket the per-day rollup in SQL, then fill the date range
+    start_date = trip.start_date.date()
     end_date = trip.end_date.date()
-    
-    while current_date <= end_date:
-        date_str = current_date.strftime("%Y-%m-%d")
-        daily_data[date_str] = {
-            "date": date_str,
-            "total": 0.0,
-            "breakdown": {
-                "transport": 0.0,
-                "stay": 0.0,
-                "food": 0.0,
-                "activities": 0.0,
-                "other": 0.0
-            },
-            "over_budget": False
-        }
-        current_date += datetime.timedelta(days=1)
-    
-    # Add expense data
-    for expense in expenses:
-        expense_date = expense.date.strftime("%Y-%m-%d")
-        if expense_date in daily_data:
-            category = expense.category.lower()
-            if category in daily_data[expense_date]["breakdown"]:
-                daily_data[expense_date]["breakdown"][category] += expense.amount
-            else:
-                daily_data[expense_date]["breakdown"]["other"] += expense.amount
-            daily_data[expense_date]["total"] += expense.amount
-    
-    # Check if over budget
-    for date_str, data in daily_data.items():
-        data["over_budget"] = data["total"] > budget_limit_per_day if budget_limit_per_day > 0 else False
+    totals = budget.get_trip_period_totals(db, trip_id, start_date, end_date, granularity)
     
     return {
-        "days": list(daily_data.values()),
-        "budget_limit_per_day": budget_limit_per_day
+        "days": budget.build_spending_trend(start_date, end_date, totals, budget_limit_per_day, granularity),
+        "budget_limit_per_day": budget_limit_per_day,
+        "granularity": granularity
     }
 
 # --- EXPENSE ROUTES ---
@@ -220,7 +109,7 @@ def get_trip_expenses(
     category: str = None,
     start_date: datetime.datetime = None,
     end_date: datetime.datetime = None,
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: schemas.Principal = Depends(auth.get_current_principal),
     db: Session = Depends(get_db)
 ):
     trip = db.query(models.Trip).filter(models.Trip.id == trip_id, models.Trip.owner_id == current_user.id).first()
@@ -228,21 +117,62 @@ def get_trip_expenses(
         raise HTTPException(status_code=404, detail="Trip not found")
     
     query = db.query(models.Expense).filter(models.Expense.trip_id == trip_id)
+    return expense_io.filter_expenses(query, category, start_date, end_date).all()
+
+@app.get("/trips/{trip_id}/expenses/export")
+def export_trip_expenses(
+    trip_id: int,
+    export_format: str = Query("csv", alias="format"),  # csv or ndjson
+    category: str = None,
+    start_date: datetime.datetime = None,
+    end_date: datetime.datetime = None,
+    current_user: schemas.Principal = Depends(auth.get_current_principal),
+    db: Session = Depends(get_db)
+):
+    if export_format not in expense_io.EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(expense_io.EXPORT_FORMATS)}")
+    
+    trip = db.query(models.Trip).filter(models.Trip.id == trip_id, models.Trip.owner_id == current_user.id).first()
+    if not trip:
+        raise HTTPException(status_code=404, detail="Trip not found")
+    
+    # Rows are read by the generator with its own session while the response streams
+    return StreamingResponse(
+        expense_io.stream_expenses(trip_id, export_format, category, start_date, end_date),
+        media_type=expense_io.EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="trip-{trip_id}-expenses.{export_format}"'}
+    )
+
+@app.post("/trips/{trip_id}/expenses/import", response_model=schemas.ExpenseImportResult)
+def import_trip_expenses(
+    trip_id: int,
+    file: UploadFile = File(...),
+    import_format: str = Query(None, alias="format"),  # csv or ndjson; defaults from the file extension
+    current_user: schemas.Principal = Depends(auth.get_current_principal),
+    db: Session = Depends(get_db)
+):
+    import_format = import_format or expense_io.import_format_for(file.filename)
+    if import_format not in expense_io.EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
     
-    if category:
-        query = query.filter(models.Expense.category == category)
-    if start_date:
-        query = query.filter(models.Expense.date >= start_date)
-    if end_date:
-        query = query.filter(models.Expense.date <= end_date)
+    trip = db.query(models.Trip).filter(models.Trip.id == trip_id, models.Trip.owner_id == current_user.id).first()
+    if not trip:
+        raise HTTPException(status_code=404, detail="Trip not found")
     
-    return query.all()
+    try:
+        result = expense_io.import_expenses(db, trip_id, file.file, import_format)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="File must be UTF-8 encoded")
+    if result["imported"]:
+        admin_stats.record_daily(db, expenses_logged=result["imported"])
+    db.commit()
+    return result
 
 @app.post("/trips/{trip_id}/expenses", response_model=schemas.Expense)
 def create_expense(
     trip_id: int,
     expense: schemas.ExpenseCreate,
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: schemas.Principal = Depends(auth.get_current_principal),
     db: Session = Depends(get_db)
 ):
     trip = db.query(models.Trip).filter(models.Trip.id == trip_id, models.Trip.owner_id == current_user.id).first()
@@ -251,6 +181,8 @@ def create_expense(
     
     db_expense = models.Expense(**expense.model_dump(), trip_id=trip_id)
     db.add(db_expense)
+    budget.record_expense(db, db_expense)
+    admin_stats.record_daily(db, expenses_logged=1)
     db.commit()
     db.refresh(db_expense)
     return db_expense
@@ -259,7 +191,7 @@ def create_expense(
 def update_expense(
     expense_id: int,
     expense_update: schemas.ExpenseUpdate,
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: schemas.Principal = Depends(auth.get_current_principal),
     db: Session = Depends(get_db)
 ):
     expense = db.query(models.Expense).join(models.Trip).filter(
@@ -271,8 +203,10 @@ def update_expense(
         raise HTTPException(status_code=404, detail="Expense not found")
     
     update_data = expense_update.model_dump(exclude_unset=True)
+    budget.record_expense(db, expense, sign=-1)
     for key, value in update_data.items():
         setattr(expense, key, value)
+    budget.record_expense(db, expense)
     
     db.commit()
     db.refresh(expense)
@@ -281,7 +215,7 @@ def update_expense(
 @app.delete("/expenses/{expense_id}")
 def delete_expense(
     expense_id: int,
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: schemas.Principal = Depends(auth.get_current_principal),
     db: Session = Depends(get_db)
 ):
     expense = db.query(models.Expense).join(models.Trip).filter(
@@ -292,6 +226,7 @@ def delete_expense(
     if not expense:
         raise HTTPException(status_code=404, detail="Expense not found")
     
+    budget.record_expense(db, expense, sign=-1)
     db.delete(expense)
     db.commit()
     return {"detail": "Expense deleted"}
@@ -300,7 +235,7 @@ def delete_expense(
 @app.get("/trips/{trip_id}/timeline", response_model=schemas.TripTimeline)
 def get_trip_timeline(
     trip_id: int,
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: schemas.Principal = Depends(auth.get_current_principal),
     db: Session = Depends(get_db)
 ):
     trip = db.query(models.Trip).filter(models.Trip.id == trip_id, models.Trip.owner_id == current_user.id).first()
@@ -310,65 +245,10 @@ def get_trip_timeline(
     if not trip.start_date or not trip.end_date:
         raise HTTPException(status_code=400, detail="Trip must have start and end dates")
     
-    stops = db.query(models.Stop).filter(models.Stop.trip_id == trip_id).order_by(models.Stop.sort_order).all()
-    
-    # Organize activities by day
-    days_data = []
-    current_date = trip.start_date.date()
-    end_date = trip.end_date.date()
-    day_number = 1
-    
-    while current_date <= end_date:
-        day_activities = []
-        day_stops = []
-        
-        # Find stops for this day
-        for stop in stops:
-            stop_arrival = stop.arrival_date.date()
-            stop_departure = stop.departure_date.date()
-            
-            if stop_arrival <= current_date <= stop_departure:
-                day_stops.append(stop)
-                
-                # Get activities for this stop on this day
-                for activity in sorted(stop.activities, key=lambda a: a.id):
-                    # Simple categorization based on description keywords
-                    category = "other"
-                    desc_lower = activity.description.lower()
-                    if any(word in desc_lower for word in ["flight", "train", "bus", "taxi", "transport"]):
-                        category = "transport"
-                    elif any(word in desc_lower for word in ["hotel", "check-in", "accommodation", "stay"]):
-                        category = "accommodation"
-                    elif any(word in desc_lower for word in ["lunch", "dinner", "breakfast", "restaurant", "food"]):
-                        category = "food"
-                    elif any(word in desc_lower for word in ["museum", "tour", "visit", "sightseeing"]):
-                        category = "sightseeing"
-                    
-                    day_activities.append({
-                        "id": activity.id,
-                        "description": activity.description,
-                        "time": activity.time,
-                        "duration": None,  # Could be extracted from description
-                        "cost": activity.cost,
-                        "category": category,
-                        "sort_order": activity.id
-                    })
-        
-        # Generate day title
-        day_title = f"Day {day_number}"
-        if day_stops:
-            day_title += f": {day_stops[0].city_name}"
-        
-        days_data.append({
-            "day_number": day_number,
-            "date": current_date.strftime("%Y-%m-%d"),
-            "title": day_title,
-            "stops": day_stops,
-            "activities": day_activities
-        })
-        
-        current_date += datetime.timedelta(days=1)
-        day_number += 1
+    stops = db.query(models.Stop).options(selectinload(models.Stop.activities)).filter(
+        models.Stop.trip_id == trip_id
+    ).order_by(models.Stop.sort_order, models.Stop.id).all()
+    days_data = timeline.build_days(trip.start_date.date(), trip.end_date.date(), stops)
     
     return {
         "trip_id": trip.id,
@@ -378,11 +258,20 @@ def get_trip_timeline(
         "days": days_data
     }
 
+def parse_month(value: str):
+    try:
+        year, month_num = map(int, value.split("-"))
+        return datetime.date(year, month_num, 1)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid month format. Use YYYY-MM")
+
 @app.get("/trips/{trip_id}/calendar", response_model=schemas.CalendarResponse)
 def get_trip_calendar(
     trip_id: int,
     month: str = None,  # Format: YYYY-MM
-    current_user: models.User = Depends(auth.get_current_user),
+    from_month: str = Query(None, alias="from"),  # YYYY-MM, with `to` for several months at once
+    to_month: str = Query(None, alias="to"),
+    current_user: schemas.Principal = Depends(auth.get_current_principal),
     db: Session = Depends(get_db)
 ):
     trip = db.query(models.Trip).filter(models.Trip.id == trip_id, models.Trip.owner_id == current_user.id).first()
@@ -392,63 +281,37 @@ def get_trip_calendar(
     if not trip.start_date or not trip.end_date:
         raise HTTPException(status_code=400, detail="Trip must have start and end dates")
     
-    # Determine which month to show
-    if month:
-        try:
-            year, month_num = map(int, month.split("-"))
-            start_of_month = datetime.date(year, month_num, 1)
-        except:
-            raise HTTPException(status_code=400, detail="Invalid month format. Use YYYY-MM")
+    # Determine which months to show
+    if from_month or to_month:
+        if month or not (from_month and to_month):
+            raise HTTPException(status_code=400, detail="Use either month or both from and to")
+        first_month, last_month = parse_month(from_month), parse_month(to_month)
+    elif month:
+        first_month = last_month = parse_month(month)
     else:
-        start_of_month = trip.start_date.date().replace(day=1)
+        first_month = last_month = trip.start_date.date().replace(day=1)
     
-    # Get last day of month
-    if start_of_month.month == 12:
-        end_of_month = datetime.date(start_of_month.year + 1, 1, 1) - datetime.timedelta(days=1)
-    else:
-        end_of_month = datetime.date(start_of_month.year, start_of_month.month + 1, 1) - datetime.timedelta(days=1)
-    
-    # Get all activities for the trip
-    stops = db.query(models.Stop).filter(models.Stop.trip_id == trip_id).all()
-    activity_counts = {}
-    
-    for stop in stops:
-        for activity in stop.activities:
-            # Assume activities happen on the stop's arrival date if no specific time
-            activity_date = stop.arrival_date.date()
-            date_str = activity_date.strftime("%Y-%m-%d")
-            activity_counts[date_str] = activity_counts.get(date_str, 0) + 1
-    
-    # Build calendar days
-    calendar_days = []
-    current_date = start_of_month
-    trip_start = trip.start_date.date()
-    trip_end = trip.end_date.date()
-    
-    while current_date <= end_of_month:
-        date_str = current_date.strftime("%Y-%m-%d")
-        is_trip_day = trip_start <= current_date <= trip_end
-        activity_count = activity_counts.get(date_str, 0)
-        
-        calendar_days.append({
-            "date": date_str,
-            "activity_count": activity_count,
-            "has_activities": activity_count > 0,
-            "is_trip_day": is_trip_day
-        })
-        
-        current_date += datetime.timedelta(days=1)
+    month_count = (last_month.year - first_month.year) * 12 + last_month.month - first_month.month + 1
+    if month_count < 1:
+        raise HTTPException(status_code=400, detail="to must not be before from")
+    if month_count > timeline.MAX_CALENDAR_MONTHS:
+        raise HTTPException(status_code=400, detail=f"At most {timeline.MAX_CALENDAR_MONTHS} months per request")
+    
+    end_date = timeline.month_end(last_month)
+    activity_counts = timeline.get_activity_counts(db, trip_id, first_month, end_date)
+    days = timeline.build_calendar_days(first_month, end_date, trip.start_date.date(), trip.end_date.date(), activity_counts)
     
     return {
-        "month": start_of_month.strftime("%Y-%m"),
-        "days": calendar_days
+        "month": first_month.strftime("%Y-%m"),
+        "months": sorted({day["date"][:7] for day in days}),
+        "days": days
     }
 
 @app.post("/stops/{stop_id}/reorder_activities")
 def reorder_activities(
     stop_id: int,
     reorder: schemas.ActivityReorder,
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: schemas.Principal = Depends(auth.get_current_principal),
     db: Session = Depends(get_db)
 ):
     stop = db.query(models.Stop).join(models.Trip).filter(
@@ -459,15 +322,41 @@ def reorder_activities(
     if not stop:
         raise HTTPException(status_code=404, detail="Stop not found")
     
-    # Update sort order (using id as proxy for sort_order since Activity doesn't have sort_order field)
-    # In a real implementation, you'd add a sort_order field to Activity model
-    return {"detail": "Activity reordering not yet implemented - requires sort_order field in Activity model"}
+    if not ordering.is_permutation(db, models.Activity, models.Activity.stop_id, stop_id, reorder.activity_ids):
+        raise HTTPException(status_code=400, detail="activity_ids must list every activity of the stop exactly once")
+    
+    ordering.apply_order(db, models.Activity, models.Activity.stop_id, stop_id, reorder.activity_ids)
+    trip_id = stop.trip_id
+    db.commit()
+    invalidate_trip_views(trip_id, current_user.id)
+    return {"detail": "Activities reordered"}
+
+@app.post("/activities/{activity_id}/move")
+def move_activity(
+    activity_id: int,
+    move: schemas.ItemMove,
+    current_user: schemas.Principal = Depends(auth.get_current_principal),
+    db: Session = Depends(get_db)
+):
+    activity = db.query(models.Activity).join(models.Stop).join(models.Trip).filter(
+        models.Activity.id == activity_id,
+        models.Trip.owner_id == current_user.id
+    ).first()
+    
+    if not activity:
+        raise HTTPException(status_code=404, detail="Activity not found")
+    
+    sort_order = ordering.move_after(db, models.Activity, models.Activity.stop_id, activity.stop_id, activity_id, move.after_id)
+    trip_id = activity.stop.trip_id
+    db.commit()
+    invalidate_trip_views(trip_id, current_user.id)
+    return {"detail": "Activity moved", "sort_order": sort_order}
 
 @app.put("/activities/{activity_id}/time")
 def update_activity_time(
     activity_id: int,
     time_update: schemas.ActivityTimeUpdate,
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: schemas.Principal = Depends(auth.get_current_principal),
     db: Session = Depends(get_db)
 ):
     activity = db.query(models.Activity).join(models.Stop).join(models.Trip).filter(
@@ -484,35 +373,100 @@ def update_activity_time(
         # Could store duration in description or add a duration field
         pass
     
+    trip_id = activity.stop.trip_id
     db.commit()
     db.refresh(activity)
+    invalidate_trip_views(trip_id, current_user.id)
     return activity
 
 
 
 # --- TRIP ROUTES ---
-@app.get("/trips/", response_model=List[schemas.Trip])
-def get_user_trips(current_user: models.User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
-    return db.query(models.Trip).filter(models.Trip.owner_id == current_user.id).all()
+def invalidate_trip_views(trip_id: int, owner_id: int):
+    """Drop cached responses that embed the trip; call after committing a trip/stop/activity write"""
+    public_trips.invalidate_trip(trip_id)
+    dashboard.invalidate(owner_id)
+
+MAX_TRIPS_PAGE_SIZE = 100
+# Sort key for trips created before created_at was recorded (NULL), so they page after all others
+TRIP_CURSOR_EPOCH = datetime.datetime(1970, 1, 1)
+TRIP_SUMMARY_COLUMNS = [getattr(models.Trip, name) for name in schemas.TripSummary.model_fields]
+
+def trip_created_key():
+    return func.coalesce(models.Trip.created_at, TRIP_CURSOR_EPOCH)
+
+def encode_trip_cursor(trip: models.Trip):
+    raw = f"{(trip.created_at or TRIP_CURSOR_EPOCH).isoformat()}|{trip.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_trip_cursor(cursor: str):
+    try:
+        created_at, trip_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.datetime.fromisoformat(created_at), int(trip_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@app.get("/trips/", response_model=Union[List[schemas.Trip], List[schemas.TripSummary]])
+def get_user_trips(
+    response: Response,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    fields: str = "full",  # full, summary (TripSummary: trips without the stops field)
+    current_user: schemas.Principal = Depends(auth.get_current_principal),
+    db: Session = Depends(get_db)
+):
+    if fields not in ("full", "summary"):
+        raise HTTPException(status_code=400, detail="Invalid fields. Use full or summary")
+    if limit is not None and not 1 <= limit <= MAX_TRIPS_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_TRIPS_PAGE_SIZE}")
+    
+    if fields == "summary":
+        query = db.query(models.Trip).options(load_only(*TRIP_SUMMARY_COLUMNS), raiseload("*"))
+    else:
+        query = query_trip_graph(db)
+    
+    # Keyset pagination, newest first (NULL created_at last); ix_trips_owner_status_created serves the filters
+    query = query.filter(models.Trip.owner_id == current_user.id)
+    if status:
+        query = query.filter(models.Trip.status == status)
+    if cursor:
+        query = query.filter(tuple_(trip_created_key(), models.Trip.id) < decode_trip_cursor(cursor))
+    query = query.order_by(trip_created_key().desc(), models.Trip.id.desc())
+    
+    if limit is None:
+        trips = query.all()
+    else:
+        trips = query.limit(limit + 1).all()
+        if len(trips) > limit:
+            trips = trips[:limit]
+            response.headers["X-Next-Cursor"] = encode_trip_cursor(trips[-1])
+    if fields == "summary":
+        return [schemas.TripSummary.model_validate(trip) for trip in trips]
+    return trips
 
 @app.get("/trips/{trip_id}", response_model=schemas.Trip)
-def get_trip(trip_id: int, current_user: models.User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
-    trip = db.query(models.Trip).filter(models.Trip.id == trip_id, models.Trip.owner_id == current_user.id).first()
+def get_trip(trip_id: int, current_user: schemas.Principal = Depends(auth.get_current_principal), db: Session = Depends(get_db)):
+    trip = query_trip_graph(db).filter(models.Trip.id == trip_id, models.Trip.owner_id == current_user.id).first()
     if not trip:
         raise HTTPException(status_code=404, detail="Trip not found")
     return trip
 
 @app.post("/trips/", response_model=schemas.Trip)
-def create_trip(trip: schemas.TripCreate, current_user: models.User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
+def create_trip(trip: schemas.TripCreate, current_user: schemas.Principal = Depends(auth.get_current_principal), db: Session = Depends(get_db)):
     db_trip = models.Trip(**trip.model_dump(), owner_id=current_user.id)
     db.add(db_trip)
+    db.flush()
+    budget.create_trip_rollup(db, db_trip.id)
+    admin_stats.record_daily(db, trips_created=1)
     db.commit()
     db.refresh(db_trip)
+    dashboard.invalidate(current_user.id)
     return db_trip
 
 @app.put("/trips/{trip_id}", response_model=schemas.Trip)
-def update_trip(trip_id: int, trip: schemas.TripCreate, current_user: models.User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
-    db_trip = db.query(models.Trip).filter(models.Trip.id == trip_id, models.Trip.owner_id == current_user.id).first()
+def update_trip(trip_id: int, trip: schemas.TripCreate, current_user: schemas.Principal = Depends(auth.get_current_principal), db: Session = Depends(get_db)):
+    db_trip = query_trip_graph(db).filter(models.Trip.id == trip_id, models.Trip.owner_id == current_user.id).first()
     if not db_trip:
         raise HTTPException(status_code=404, detail="Trip not found")
     
@@ -521,116 +475,173 @@ def update_trip(trip_id: int, trip: schemas.TripCreate, current_user: models.Use
         setattr(db_trip, key, value)
     
     db.commit()
+    invalidate_trip_views(trip_id, current_user.id)
     db.refresh(db_trip)
     return db_trip
 
 @app.delete("/trips/{trip_id}")
-def delete_trip(trip_id: int, current_user: models.User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
+def delete_trip(trip_id: int, current_user: schemas.Principal = Depends(auth.get_current_principal), db: Session = Depends(get_db)):
     trip = db.query(models.Trip).filter(models.Trip.id == trip_id, models.Trip.owner_id == current_user.id).first()
     if not trip:
         raise HTTPException(status_code=404, detail="Trip not found")
     db.delete(trip)
     db.commit()
+    invalidate_trip_views(trip_id, current_user.id)
     return {"detail": "Trip deleted"}
 
 # --- ITINERARY ROUTES ---
 @app.post("/trips/{trip_id}/stops", response_model=schemas.Stop)
-def add_stop(trip_id: int, stop: schemas.StopCreate, current_user: models.User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
+def add_stop(trip_id: int, stop: schemas.StopCreate, current_user: schemas.Principal = Depends(auth.get_current_principal), db: Session = Depends(get_db)):
     trip = db.query(models.Trip).filter(models.Trip.id == trip_id, models.Trip.owner_id == current_user.id).first()
     if not trip:
         raise HTTPException(status_code=404, detail="Trip not found")
-    db_stop = models.Stop(**stop.model_dump(), trip_id=trip_id)
+    sort_order = ordering.next_rank(db, models.Stop, models.Stop.trip_id, trip_id)
+    db_stop = models.Stop(**stop.model_dump(exclude={"sort_order"}), trip_id=trip_id, sort_order=sort_order)
     db.add(db_stop)
+    budget.record_stop(db, db_stop)
     db.commit()
     db.refresh(db_stop)
+    invalidate_trip_views(trip_id, current_user.id)
     return db_stop
 
 @app.post("/stops/{stop_id}/activities", response_model=schemas.Activity)
-def add_activity(stop_id: int, activity: schemas.ActivityCreate, current_user: models.User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
+def add_activity(stop_id: int, activity: schemas.ActivityCreate, current_user: schemas.Principal = Depends(auth.get_current_principal), db: Session = Depends(get_db)):
     stop = db.query(models.Stop).join(models.Trip).filter(models.Stop.id == stop_id, models.Trip.owner_id == current_user.id).first()
     if not stop:
         raise HTTPException(status_code=404, detail="Stop not found")
-    db_activity = models.Activity(**activity.model_dump(), stop_id=stop_id)
+    sort_order = ordering.next_rank(db, models.Activity, models.Activity.stop_id, stop_id)
+    db_activity = models.Activity(**activity.model_dump(), stop_id=stop_id, sort_order=sort_order)
     db.add(db_activity)
+    trip_id = stop.trip_id
+    budget.record_activity(db, db_activity, trip_id)
     db.commit()
     db.refresh(db_activity)
+    invalidate_trip_views(trip_id, current_user.id)
     return db_activity
 
 @app.put("/stops/{stop_id}", response_model=schemas.Stop)
-def update_stop(stop_id: int, stop_update: schemas.StopUpdate, current_user: models.User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
+def update_stop(stop_id: int, stop_update: schemas.StopUpdate, current_user: schemas.Principal = Depends(auth.get_current_principal), db: Session = Depends(get_db)):
     stop = db.query(models.Stop).join(models.Trip).filter(models.Stop.id == stop_id, models.Trip.owner_id == current_user.id).first()
     if not stop:
         raise HTTPException(status_code=404, detail="Stop not found")
     
+    budget.record_stop(db, stop, sign=-1)
     for key, value in stop_update.model_dump().items():
         setattr(stop, key, value)
+    budget.record_stop(db, stop)
     
     db.commit()
     db.refresh(stop)
+    invalidate_trip_views(stop.trip_id, current_user.id)
     return stop
 
 @app.delete("/stops/{stop_id}")
-def delete_stop(stop_id: int, current_user: models.User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
+def delete_stop(stop_id: int, current_user: schemas.Principal = Depends(auth.get_current_principal), db: Session = Depends(get_db)):
     stop = db.query(models.Stop).join(models.Trip).filter(models.Stop.id == stop_id, models.Trip.owner_id == current_user.id).first()
     if not stop:
         raise HTTPException(status_code=404, detail="Stop not found")
     
+    trip_id = stop.trip_id
+    budget.record_stop_removal(db, stop)
     db.delete(stop)
     db.commit()
+    invalidate_trip_views(trip_id, current_user.id)
     return {"detail": "Stop deleted"}
 
 @app.put("/activities/{activity_id}", response_model=schemas.Activity)
-def update_activity(activity_id: int, activity_update: schemas.ActivityUpdate, current_user: models.User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
+def update_activity(activity_id: int, activity_update: schemas.ActivityUpdate, current_user: schemas.Principal = Depends(auth.get_current_principal), db: Session = Depends(get_db)):
     activity = db.query(models.Activity).join(models.Stop).join(models.Trip).filter(models.Activity.id == activity_id, models.Trip.owner_id == current_user.id).first()
     if not activity:
         raise HTTPException(status_code=404, detail="Activity not found")
     
+    budget.record_activity(db, activity, activity.stop.trip_id, sign=-1)
     for key, value in activity_update.model_dump().items():
         setattr(activity, key, value)
+    budget.record_activity(db, activity, activity.stop.trip_id)
     
+    trip_id = activity.stop.trip_id
     db.commit()
     db.refresh(activity)
+    invalidate_trip_views(trip_id, current_user.id)
     return activity
 
 @app.delete("/activities/{activity_id}")
-def delete_activity(activity_id: int, current_user: models.User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
+def delete_activity(activity_id: int, current_user: schemas.Principal = Depends(auth.get_current_principal), db: Session = Depends(get_db)):
     activity = db.query(models.Activity).join(models.Stop).join(models.Trip).filter(models.Activity.id == activity_id, models.Trip.owner_id == current_user.id).first()
     if not activity:
         raise HTTPException(status_code=404, detail="Activity not found")
     
+    trip_id = activity.stop.trip_id
+    budget.record_activity_removal(db, activity, trip_id)
     db.delete(activity)
     db.commit()
+    invalidate_trip_views(trip_id, current_user.id)
     return {"detail": "Activity deleted"}
 
 @app.post("/trips/{trip_id}/reorder_stops")
-def reorder_stops(trip_id: int, reorder: schemas.StopReorder, current_user: models.User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
+def reorder_stops(trip_id: int, reorder: schemas.StopReorder, current_user: schemas.Principal = Depends(auth.get_current_principal), db: Session = Depends(get_db)):
     trip = db.query(models.Trip).filter(models.Trip.id == trip_id, models.Trip.owner_id == current_user.id).first()
     if not trip:
         raise HTTPException(status_code=404, detail="Trip not found")
     
-    for index, stop_id in enumerate(reorder.stop_ids):
-        stop = db.query(models.Stop).filter(models.Stop.id == stop_id, models.Stop.trip_id == trip_id).first()
-        if stop:
-            stop.sort_order = index
+    if not ordering.is_permutation(db, models.Stop, models.Stop.trip_id, trip_id, reorder.stop_ids):
+        raise HTTPException(status_code=400, detail="stop_ids must list every stop of the trip exactly once")
     
+    ordering.apply_order(db, models.Stop, models.Stop.trip_id, trip_id, reorder.stop_ids)
     db.commit()
+    invalidate_trip_views(trip_id, current_user.id)
     return {"detail": "Stops reordered"}
 
+@app.post("/stops/{stop_id}/move")
+def move_stop(stop_id: int, move: schemas.ItemMove, current_user: schemas.Principal = Depends(auth.get_current_principal), db: Session = Depends(get_db)):
+    stop = db.query(models.Stop).join(models.Trip).filter(models.Stop.id == stop_id, models.Trip.owner_id == current_user.id).first()
+    if not stop:
+        raise HTTPException(status_code=404, detail="Stop not found")
+    
+    trip_id = stop.trip_id
+    sort_order = ordering.move_after(db, models.Stop, models.Stop.trip_id, trip_id, stop_id, move.after_id)
+    db.commit()
+    invalidate_trip_views(trip_id, current_user.id)
+    return {"detail": "Stop moved", "sort_order": sort_order}
+
+@app.post("/trips/{trip_id}/itinerary:batch", response_model=schemas.ItineraryBatchResult)
+def batch_update_itinerary(trip_id: int, batch: schemas.ItineraryBatch, current_user: schemas.Principal = Depends(auth.get_current_principal), db: Session = Depends(get_db)):
+    trip = db.query(models.Trip).filter(models.Trip.id == trip_id, models.Trip.owner_id == current_user.id).first()
+    if not trip:
+        raise HTTPException(status_code=404, detail="Trip not found")
+    
+    result = itinerary.apply_itinerary_batch(db, trip_id, batch)
+    db.commit()
+    invalidate_trip_views(trip_id, current_user.id)
+    return result
+
 
 
 # --- SEARCH ROUTES ---
 @app.get("/cities/search", response_model=List[schemas.City])
-def search_cities(query: str = "", country: str = "", db: Session = Depends(get_db)):
-    q = db.query(models.City)
-    if query:
-        q = q.filter(models.City.name.ilike(f"%{query}%"))
-    if country:
-        q = q.filter(models.City.country.ilike(f"%{country}%"))
-    return q.all()
+def search_cities(query: str = "", country: str = "", limit: int = search.DEFAULT_SEARCH_LIMIT, include_activities: bool = True, db: Session = Depends(get_db)):
+    if not 1 <= limit <= search.MAX_SEARCH_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {search.MAX_SEARCH_LIMIT}")
+    return search.search_cities(db, query, country, limit, include_activities)
+
+@app.get("/cities/typeahead", response_model=List[schemas.City])
+def city_typeahead(prefix: str = "", country: str = "", limit: int = DEFAULT_TYPEAHEAD_LIMIT, include_activities: bool = False, db: Session = Depends(get_db)):
+    # Served from the in-process index; the database is only hit on (re)load or for activities
+    if not 1 <= limit <= search.MAX_SEARCH_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {search.MAX_SEARCH_LIMIT}")
+    city_index.ensure_fresh(db)
+    cities = city_index.search(prefix, country, limit)
+    
+    activities = {}
+    if include_activities and cities:
+        city_ids = [city["id"] for city in cities]
+        for activity in db.query(models.CatalogActivity).filter(models.CatalogActivity.city_id.in_(city_ids)):
+            activities.setdefault(activity.city_id, []).append(activity)
+    return [{**city, "catalog_activities": activities.get(city["id"], [])} for city in cities]
 
 # --- SHARED ITINERARY ROUTES ---
 @app.post("/trips/{trip_id}/share", response_model=schemas.ShareTokenResponse)
-def share_trip(trip_id: int, current_user: models.User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
+def share_trip(trip_id: int, current_user: schemas.Principal = Depends(auth.get_current_principal), db: Session = Depends(get_db)):
     trip = db.query(models.Trip).filter(models.Trip.id == trip_id, models.Trip.owner_id == current_user.id).first()
     if not trip:
         raise HTTPException(status_code=404, detail="Trip not found")
@@ -649,7 +660,7 @@ def share_trip(trip_id: int, current_user: models.User = Depends(auth.get_curren
     return {"share_url": f"/trips/public/{trip.share_token}", "token": trip.share_token}
 
 @app.delete("/trips/{trip_id}/share")
-def unshare_trip(trip_id: int, current_user: models.User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
+def unshare_trip(trip_id: int, current_user: schemas.Principal = Depends(auth.get_current_principal), db: Session = Depends(get_db)):
     trip = db.query(models.Trip).filter(models.Trip.id == trip_id, models.Trip.owner_id == current_user.id).first()
     if not trip:
         raise HTTPException(status_code=404, detail="Trip not found")
@@ -657,91 +668,43 @@ def unshare_trip(trip_id: int, current_user: models.User = Depends(auth.get_curr
     trip.is_public = 0
     trip.share_token = None
     db.commit()
+    invalidate_trip_views(trip_id, current_user.id)
     return {"detail": "Trip unshared successfully"}
 
 @app.get("/trips/public/{share_token}", response_model=schemas.TripPublic)
-def get_public_trip(share_token: str, db: Session = Depends(get_db)):
-    trip = db.query(models.Trip).filter(models.Trip.share_token == share_token, models.Trip.is_public == 1).first()
-    if not trip:
-        raise HTTPException(status_code=404, detail="Trip not found or not public")
-    
-    # Construct response manually or rely on Pydantic to extract relation fields if mapped correctly.
-    # TripPublic schema expects 'owner_name' and 'owner_image'. 
-    # We need to ensure we pass an object that has these attributes or use a dict.
-    
-    response_data = {
-        "id": trip.id,
-        "destination": trip.destination,
-        "title": trip.title,
-        "description": trip.description,
-        "start_date": trip.start_date,
-        "end_date": trip.end_date,
-        "completion_percentage": trip.completion_percentage,
-        "cost_from": trip.cost_from,
-        "budget_limit": trip.budget_limit,
-        "cover_image_url": trip.cover_image_url,
-        "status": trip.status,
-        "owner_name": trip.owner.full_name,
-        "owner_image": trip.owner.profile_image_url,
-        "stops": trip.stops
-    }
-    return response_data
+def get_public_trip(share_token: str, if_none_match: Optional[str] = Header(None), db: Session = Depends(get_db)):
+    entry = public_trips.get(share_token)
+    if entry is None:
+        is_shared = (models.Trip.share_token == share_token, models.Trip.is_public == 1)
+        trip_id = db.query(models.Trip.id).filter(*is_shared).scalar()
+        if trip_id is None:
+            raise HTTPException(status_code=404, detail="Trip not found or not public")
+        marker = public_trips.begin_load(trip_id)
+        trip = query_trip_graph(db).options(joinedload(models.Trip.owner)).filter(models.Trip.id == trip_id, *is_shared).first()
+        if not trip:
+            raise HTTPException(status_code=404, detail="Trip not found or not public")
+        entry = public_trips.render(trip)
+        public_trips.store(share_token, trip_id, marker, entry)
+    
+    body, etag = entry
+    headers = {"ETag": etag, "Cache-Control": public_trips.CACHE_CONTROL}
+    if public_trips.etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @app.post("/trips/public/{share_token}/copy", response_model=schemas.Trip)
-def copy_trip(share_token: str, current_user: models.User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
+def copy_trip(share_token: str, include_expenses: bool = False, current_user: schemas.Principal = Depends(auth.get_current_principal), db: Session = Depends(get_db)):
     original_trip = db.query(models.Trip).filter(models.Trip.share_token == share_token, models.Trip.is_public == 1).first()
     if not original_trip:
         raise HTTPException(status_code=404, detail="Trip not found or not public")
     
-    # 1. Create new trip
-    new_trip = models.Trip(
-        destination=original_trip.destination,
-        title=f"Copy of {original_trip.title}",
-        description=original_trip.description,
-        start_date=datetime.now(), # Reset dates or keep? Usually reset for planning
-        end_date=datetime.now() + (original_trip.end_date - original_trip.start_date),
-        budget_limit=original_trip.budget_limit,
-        cover_image_url=original_trip.cover_image_url,
-        status="planning",
-        owner_id=current_user.id
-    )
-    db.add(new_trip)
-    db.commit()
-    db.refresh(new_trip)
-    
-    # 2. Copy Stops and Activities
-    for original_stop in original_trip.stops:
-        # Calculate offset days for new dates
-        days_offset = (original_stop.arrival_date - original_trip.start_date).days
-        duration_days = (original_stop.departure_date - original_stop.arrival_date).days
-        
-        new_arrival = new_trip.start_date + datetime.timedelta(days=days_offset)
-        new_departure = new_arrival + datetime.timedelta(days=duration_days)
-        
-        new_stop = models.Stop(
-            trip_id=new_trip.id,
-            city_name=original_stop.city_name,
-            arrival_date=new_arrival,
-            departure_date=new_departure,
-            sort_order=original_stop.sort_order,
-            accommodation_cost=original_stop.accommodation_cost,
-            transport_cost=original_stop.transport_cost
-        )
-        db.add(new_stop)
-        db.commit()
-        db.refresh(new_stop)
-        
-        for original_activity in original_stop.activities:
-            new_activity = models.Activity(
-                stop_id=new_stop.id,
-                description=original_activity.description,
-                time=original_activity.time,
-                cost=original_activity.cost
-            )
-            db.add(new_activity)
-            
+    # Dates are reset to start today for planning; the whole copy is one transaction
+    new_trip_id = itinerary.copy_trip_graph(db, original_trip, current_user.id, datetime.datetime.now(), include_expenses).id
+    copied_expenses = db.query(models.Expense).filter(models.Expense.trip_id == new_trip_id).count() if include_expenses else 0
+    admin_stats.record_daily(db, trips_created=1, expenses_logged=copied_expenses)
     db.commit()
-    return new_trip
+    dashboard.invalidate(current_user.id)
+    return query_trip_graph(db).filter(models.Trip.id == new_trip_id).first()
 
 # --- USER PROFILE ROUTES ---
 @app.get("/users/me", response_model=schemas.User)
@@ -756,22 +719,26 @@ def update_user_profile(user_update: schemas.UserUpdate, current_user: models.Us
     
     db.commit()
     db.refresh(current_user)
+    auth.invalidate_principal(current_user.email)
+    dashboard.invalidate(current_user.id)
     return current_user
 
 @app.delete("/users/me")
 def delete_user_account(current_user: models.User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
     # Cascade delete is handled by database models, but explicit cleanup is explicit
+    email = current_user.email
     db.delete(current_user)
     db.commit()
+    auth.invalidate_principal(email)
     return {"detail": "Account deleted successfully"}
 
 # --- SAVED DESTINATIONS ROUTES ---
 @app.get("/users/me/saved-destinations", response_model=List[schemas.SavedDestination])
-def get_saved_destinations(current_user: models.User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
+def get_saved_destinations(current_user: schemas.Principal = Depends(auth.get_current_principal), db: Session = Depends(get_db)):
     return db.query(models.SavedDestination).filter(models.SavedDestination.user_id == current_user.id).all()
 
 @app.post("/users/me/saved-destinations/{city_id}", response_model=schemas.SavedDestination)
-def save_destination(city_id: int, current_user: models.User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
+def save_destination(city_id: int, current_user: schemas.Principal = Depends(auth.get_current_principal), db: Session = Depends(get_db)):
     city = db.query(models.City).filter(models.City.id == city_id).first()
     if not city:
         raise HTTPException(status_code=404, detail="City not found")
@@ -791,7 +758,7 @@ def save_destination(city_id: int, current_user: models.User = Depends(auth.get_
     return saved
 
 @app.delete("/users/me/saved-destinations/{city_id}")
-def unsave_destination(city_id: int, current_user: models.User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
+def unsave_destination(city_id: int, current_user: schemas.Principal = Depends(auth.get_current_principal), db: Session = Depends(get_db)):
     saved = db.query(models.SavedDestination).filter(
         models.SavedDestination.user_id == current_user.id,
         models.SavedDestination.city_id == city_id
@@ -807,17 +774,10 @@ def unsave_destination(city_id: int, current_user: models.User = Depends(auth.ge
 # --- SEARCH ROUTES ---
 
 @app.get("/activities/search", response_model=List[schemas.CatalogActivity])
-def search_activities(city_id: int = None, query: str = "", interest: str = "", cost_max: float = None, db: Session = Depends(get_db)):
-    q = db.query(models.CatalogActivity)
-    if city_id:
-        q = q.filter(models.CatalogActivity.city_id == city_id)
-    if query:
-        q = q.filter(models.CatalogActivity.name.ilike(f"%{query}%") | models.CatalogActivity.description.ilike(f"%{query}%"))
-    if interest:
-        q = q.filter(models.CatalogActivity.category.ilike(f"%{interest}%"))
-    if cost_max is not None:
-        q = q.filter(models.CatalogActivity.cost <= cost_max)
-    return q.all()
+def search_activities(city_id: int = None, query: str = "", interest: str = "", cost_max: float = None, limit: int = search.DEFAULT_SEARCH_LIMIT, db: Session = Depends(get_db)):
+    if not 1 <= limit <= search.MAX_SEARCH_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {search.MAX_SEARCH_LIMIT}")
+    return search.search_activities(db, city_id, query, interest, cost_max, limit)
 
 def seed_data(db: Session):
     if db.query(models.City).count() == 0:
@@ -851,23 +811,9 @@ def seed_data(db: Session):
         print("Seeding complete.")
 
 @app.get("/dashboard/data", response_model=schemas.DashboardData)
-def get_dashboard_info(current_user: models.User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
-    upcoming_trip = db.query(models.Trip).filter(models.Trip.owner_id == current_user.id, models.Trip.status == "upcoming").first()
-    recent_trips = db.query(models.Trip).filter(models.Trip.owner_id == current_user.id).limit(5).all()
-    
-    recommendations = [
-        {"city": "Reykjavik", "country": "Iceland", "price_from": 450, "image_url": "https://lh3.googleusercontent.com/aida-public/AB6AXuC6GJgLZY4kyXAYASsKn277Ps-oRz1gH1edcnoSsSHRqVL8P2vKbFO1GfRiAHhhcYn2FS5UPtBlxjiDsszJKS4yxrsH7mr8rIzv18Jx-Bei0x-NoCn3g6qAb6yZexcvJx-YY-Jbd7MM2Wx3F485723CE_hO7Xp--tAKcLh_lHoX6K9n-h7nqWrgqShdJ28_6KOeMhU4Qz15u6QsvYE3bv4o6_4lrILnWlGyV1gK419XuaNOYuznIuqGcFYqcAdmWkYz5cEMLN6zzUap"},
-        {"city": "Kyoto", "country": "Japan", "price_from": 820, "image_url": "https://lh3.googleusercontent.com/aida-public/AB6AXuDxz9BBVOv6etnYJDXVwiRxtvgjfVRRz12N2KAHy6FCcNkULmmoncg7oCuPmMpZgkERSTtu8bk-c8bDAIwIwDKDepxm1Z8UFHADT0fWz6EFbNhBKXynVXWQbFMOzHf5ZqrfcsbmNIDSzOQYtDHcS50-OLNCLFxbyQK87HO4L5oLWrZtsD1YRDu0CKxKtxYDpDH-XCCV0WNqZ8bWQhmKYZf-9us7WIjKfaUwwyYhBHSslu3YiFDy2FVolHRL74BX0W4M6xOdJIdX7XB6"},
-        {"city": "Paris", "country": "France", "price_from": 620, "image_url": "https://lh3.googleusercontent.com/aida-public/AB6AXuAFJH8PAUCCRJ2nvhZYuiutdLeK_ukmLK5rF6mwRYlRVqOxQNMi7P8YMRHt-b8b5v6sbWH50udWNnasbLgL84oxURJnOtp-1gAtaX1_GXESra6Q4FGfKTW9EzTG1Ojeu4vwgKh2WMiFodC6ZCBNPwb0xPEicv_Lai60oWPa1eoF7eCfkfQ_vuVfkIKHWIt6QpHZz0hGYnKftfEB2GMgk49jlIdK1jT2U_Q_RCsn-Nfwy8SUU9WYbNzj3wbA2aSEJjEUkR2gGwTHGR-W"},
-        {"city": "Bali", "country": "Indonesia", "price_from": 380, "image_url": "https://lh3.googleusercontent.com/aida-public/AB6AXuCBSDIOqyW7ATjFUseJt5QifrMdpgvzq3D_80diDbfVH9Zlao8DJO3yLogI8o-yr8lp6aY4sMkYUW014lCWR5y2eZfONFLdrjv6NqEnSsZs3mPdsp_-MpZfZOFEgb3iLzX91u9EauIU492pHhdOTg3LpCUwnhC8ZcHNvWO7g8btuwB4EOeCdmkaFbVcu7tPgZaA_jtHwjyXRLqmdeiNRpsUCupr4ZVRl_OLstPjvcHj2LRDLICQ-cADXpBUmoivc5gbmBpuonIE8WTM"}
-    ]
-    
-    return {
-        "full_name": current_user.full_name,
-        "upcoming_trip": upcoming_trip,
-        "recent_trips": recent_trips,
-        "recommendations": recommendations
-    }
+def get_dashboard_info(background_tasks: BackgroundTasks, current_user: schemas.Principal = Depends(auth.get_current_principal), db: Session = Depends(get_db)):
+    body = dashboard.get_snapshot(db, current_user, background_tasks)
+    return Response(content=body, media_type="application/json")
 
 if __name__ == "__main__":
     import uvicorn
@@ -884,104 +830,64 @@ if __name__ == "__main__":
     uvicorn.run(app, host="127.0.0.1", port=8000, log_level="info")
 
 # --- ADMIN DEPENDENCY ---
-def get_current_admin(current_user: models.User = Depends(auth.get_current_user)):
+def get_current_admin(current_user: schemas.Principal = Depends(auth.get_current_principal)):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not authorized")
     return current_user
 
 # --- ADMIN ANALYTICS ROUTES ---
 @app.get("/admin/stats", response_model=schemas.AdminStats)
-def get_admin_stats(current_admin: models.User = Depends(get_current_admin), db: Session = Depends(get_db)):
-    total_users = db.query(models.User).count()
-    total_trips = db.query(models.Trip).count()
-    active_trips = db.query(models.Trip).filter(models.Trip.status == "active").count()
-    
-    # Calculate estimated revenue (Mock calculation or sum of budget/costs if applicable)
-    # Using simple heuristic: 1% of total budgets tracked
-    total_budget_sum = db.query(models.Trip).with_entities(func.sum(models.Trip.budget_limit)).scalar() or 0
-    total_revenue_estimated = total_budget_sum * 0.01 
-    
-    return {
-        "total_users": total_users,
-        "total_trips": total_trips,
-        "active_trips": active_trips,
-        "total_revenue_estimated": total_revenue_estimated
-    }
+def get_admin_stats(current_admin: schemas.Principal = Depends(get_current_admin), db: Session = Depends(get_db)):
+    return admin_stats.get_stats(db)
 
-from sqlalchemy import func, extract
+@app.post("/admin/stats/refresh", response_model=schemas.AdminStats)
+def refresh_admin_stats(current_admin: schemas.Principal = Depends(get_current_admin), db: Session = Depends(get_db)):
+    return admin_stats.refresh_stats(db)
 
 @app.get("/admin/stats/growth", response_model=List[schemas.GrowthData])
-def get_growth_stats(period: str = "monthly", current_admin: models.User = Depends(get_current_admin), db: Session = Depends(get_db)):
-<<<<<<< HEAD
-    # Group by creation date
-    if period == "monthly":
-        date_format = "YYYY-MM"
-    else:
-        date_format = "YYYY-WW" # Weekly
-        
-    query = db.query(
-        func.to_char(models.Trip.created_at, date_format).label('period'),
-=======
-    # Group by creation date (using SQLite compatible strftime)
-    if period == "monthly":
-        date_format = "%Y-%m"
-    else:
-        date_format = "%Y-%W" # Weekly
-        
-    # Stats for Trips creation
-    # Note: SQLite uses strftime('%Y-%m', date_col)
-    query = db.query(
-        func.strftime(date_format, models.Trip.created_at).label('period'),
->>>>>>> b1b02e3c0d2006fd00e882c768604aa877c20d20
-        func.count(models.Trip.id).label('count')
-    ).group_by('period').order_by('period').all()
+def get_growth_stats(period: str = "monthly", metric: str = "trips", current_admin: schemas.Principal = Depends(get_current_admin), db: Session = Depends(get_db)):
+    if period not in admin_stats.GROWTH_PERIODS:
+        raise HTTPException(status_code=400, detail="period must be daily, weekly or monthly")
+    if metric not in admin_stats.GROWTH_METRICS:
+        raise HTTPException(status_code=400, detail="metric must be trips, users or expenses")
     
-    return [{"period": row.period or "Unknown", "count": row.count} for row in query]
+    # Read from the per-day counters instead of scanning trips
+    return admin_stats.growth_series(db, metric, period)
 
 @app.get("/admin/stats/top-destinations", response_model=List[schemas.TopDestination])
-def get_top_destinations(limit: int = 5, current_admin: models.User = Depends(get_current_admin), db: Session = Depends(get_db)):
-    # Aggregating from Stops and SavedDestinations
-    query = db.query(
-        models.Stop.city_name,
-        func.count(models.Stop.id).label('visit_count')
-    ).group_by(models.Stop.city_name).order_by(func.count(models.Stop.id).desc()).limit(limit).all()
-    
-    # Simple mapping, country might be missing if only city_name is stored in Stop
-    #Ideally Stop should link to City model, but it stores city_name string based on current schema
-    # We can try to fetch country from City table if name matches
-    
-    results = []
-    for row in query:
-        city = db.query(models.City).filter(models.City.name == row.city_name).first()
-        country = city.country if city else "Unknown"
-        results.append({
-            "city_name": row.city_name,
-            "country": country,
-            "visit_count": row.visit_count
-        })
-        
-    return results
+def get_top_destinations(limit: int = 5, current_admin: schemas.Principal = Depends(get_current_admin), db: Session = Depends(get_db)):
+    # Stops linked to a catalog city are counted under it; unlinked ones by their own name
+    city_name = func.coalesce(models.City.name, models.Stop.city_name).label('city_name')
+    visit_count = func.count(models.Stop.id).label('visit_count')
+    query = db.query(city_name, models.City.country, visit_count).outerjoin(
+        models.City, models.City.id == models.Stop.city_id
+    ).group_by(city_name, models.City.country).order_by(visit_count.desc(), city_name).limit(limit).all()
+    
+    return [{"city_name": row.city_name, "country": row.country or "Unknown", "visit_count": row.visit_count} for row in query]
 
 @app.get("/admin/users", response_model=List[schemas.User])
-def list_users(skip: int = 0, limit: int = 20, current_admin: models.User = Depends(get_current_admin), db: Session = Depends(get_db)):
+def list_users(skip: int = 0, limit: int = 20, current_admin: schemas.Principal = Depends(get_current_admin), db: Session = Depends(get_db)):
     return db.query(models.User).offset(skip).limit(limit).all()
 
 @app.put("/admin/users/{user_id}/role")
-def change_user_role(user_id: int, is_admin: bool, current_admin: models.User = Depends(get_current_admin), db: Session = Depends(get_db)):
+def change_user_role(user_id: int, is_admin: bool, current_admin: schemas.Principal = Depends(get_current_admin), db: Session = Depends(get_db)):
     user = db.query(models.User).filter(models.User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
         
     user.is_admin = 1 if is_admin else 0
     db.commit()
+    auth.invalidate_principal(user.email)
     return {"detail": f"User role updated to {'Admin' if is_admin else 'User'}"}
 
 @app.delete("/admin/users/{user_id}")
-def delete_user(user_id: int, current_admin: models.User = Depends(get_current_admin), db: Session = Depends(get_db)):
+def delete_user(user_id: int, current_admin: schemas.Principal = Depends(get_current_admin), db: Session = Depends(get_db)):
     user = db.query(models.User).filter(models.User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
         
+    email = user.email
     db.delete(user)
     db.commit()
+    auth.invalidate_principal(email)
     return {"detail": "User deleted"}
@@ -0,0 +1,31 @@
+"""
+Database Migration Script for Activity Categories
+Adds the category column (and its index) to activities.
+Run backfill_activity_categories.py afterwards to classify existing rows.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(__file__))
+
+from sqlalchemy import inspect, text
+from database import script_engine as engine
+
+def migrate_database():
+    """Update activities with the category column"""
+    inspector = inspect(engine)
+
+    with engine.connect() as conn:
+        with conn.begin():
+            columns = [c['name'] for c in inspector.get_columns("activities")]
+            if "category" not in columns:
+                print("Adding category to activities...")
+                conn.execute(text("ALTER TABLE activities ADD COLUMN category VARCHAR"))
+
+            print("Creating ix_activities_category...")
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_activities_category ON activities (category)"))
+
+    print("✓ Activity category migration completed successfully!")
+
+if __name__ == "__main__":
+    migrate_database()
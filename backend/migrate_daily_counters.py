@@ -0,0 +1,34 @@
+"""
+Database Migration Script for Growth Counters
+Adds created_at to expenses (backfilled from the expense date) and creates
+the daily_counters table. Run rebuild_daily_counters.py afterwards to fill
+the counters from existing trips, users and expenses.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(__file__))
+
+from sqlalchemy import inspect, text
+from database import Base, script_engine as engine
+import models
+
+def migrate_database():
+    """Update expenses with created_at and create daily_counters"""
+    inspector = inspect(engine)
+
+    with engine.connect() as conn:
+        with conn.begin():
+            columns = [c['name'] for c in inspector.get_columns("expenses")]
+            if "created_at" not in columns:
+                print("Adding created_at to expenses...")
+                conn.execute(text("ALTER TABLE expenses ADD COLUMN created_at TIMESTAMP"))
+                conn.execute(text("UPDATE expenses SET created_at = date WHERE created_at IS NULL"))
+
+    print("Creating daily_counters...")
+    Base.metadata.create_all(bind=engine, tables=[models.DailyCounter.__table__])
+
+    print("✓ Growth counters migration completed successfully!")
+
+if __name__ == "__main__":
+    migrate_database()
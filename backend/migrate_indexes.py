@@ -0,0 +1,105 @@
+"""
+Database Migration Script for Hot Filter Columns
+Adds the composite indexes declared in models.py for the columns nearly
+every route filters on (CONCURRENTLY on PostgreSQL, so the tables stay
+writable while the indexes build), then EXPLAINs each hot query to confirm the planner
+uses its index (python migrate_indexes.py --check only runs the check).
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(__file__))
+
+from sqlalchemy import select, text
+from database import script_engine as engine
+import models
+
+INDEXES = {
+    "ix_trips_owner_status_created": ("trips", "owner_id, status, created_at"),
+    "ix_stops_trip_sort": ("stops", "trip_id, sort_order"),
+    "ix_activities_stop_sort": ("activities", "stop_id, sort_order"),
+    "ix_expenses_trip_date": ("expenses", "trip_id, date"),
+    "ix_expenses_trip_category": ("expenses", "trip_id, category"),
+    "ix_expenses_stop_id": ("expenses", "stop_id"),
+    "ix_expenses_activity_id": ("expenses", "activity_id"),
+}
+
+# Index each query is expected to use -> the query, shaped like the routes' filters
+HOT_QUERIES = {
+    "ix_trips_owner_status_created": select(models.Trip).where(models.Trip.owner_id == 1, models.Trip.status == "upcoming"),
+    "ix_stops_trip_sort": select(models.Stop).where(models.Stop.trip_id == 1).order_by(models.Stop.sort_order),
+    "ix_activities_stop_sort": select(models.Activity).where(models.Activity.stop_id == 1).order_by(models.Activity.sort_order),
+    "ix_expenses_trip_date": select(models.Expense).where(
+        models.Expense.trip_id == 1, models.Expense.date >= "2024-01-01", models.Expense.date <= "2024-12-31"
+    ),
+    "ix_expenses_trip_category": select(models.Expense).where(models.Expense.trip_id == 1, models.Expense.category == "food"),
+    "ix_expenses_stop_id": select(models.Expense).where(models.Expense.stop_id == 1),
+    "ix_expenses_activity_id": select(models.Expense).where(models.Expense.activity_id == 1),
+}
+
+def explain(conn, statement):
+    """Query plan of statement as text (EXPLAIN on PostgreSQL, EXPLAIN QUERY PLAN on SQLite)"""
+    compiled = statement.compile(dialect=conn.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup) if compiled.positional else compiled.params
+    prefix = "EXPLAIN " if conn.dialect.name == "postgresql" else "EXPLAIN QUERY PLAN "
+    rows = conn.exec_driver_sql(prefix + str(compiled), params).all()
+    return "\n".join(" ".join(str(value) for value in row) for row in rows)
+
+def check_index_usage(conn):
+    """{index name: (used, plan)} for every hot query"""
+    results = {}
+    with conn.begin():
+        if conn.dialect.name == "postgresql":
+            # Small tables are cheaper to scan; ask whether the index is usable at all
+            conn.execute(text("SET LOCAL enable_seqscan = off"))
+        for index_name, statement in HOT_QUERIES.items():
+            plan = explain(conn, statement)
+            results[index_name] = (index_name in plan, plan)
+    return results
+
+def create_index_sql(index_name, dialect_name):
+    """CREATE INDEX statement for one of INDEXES; CONCURRENTLY on PostgreSQL so writes are not blocked"""
+    table, columns = INDEXES[index_name]
+    concurrently = "CONCURRENTLY " if dialect_name == "postgresql" else ""
+    return f"CREATE INDEX {concurrently}IF NOT EXISTS {index_name} ON {table} ({columns})"
+
+# Leftovers of an interrupted CREATE INDEX CONCURRENTLY, which IF NOT EXISTS would keep
+INVALID_INDEXES_SQL = """
+SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+WHERE NOT i.indisvalid AND c.relname = ANY(:names)
+"""
+
+def migrate_database():
+    """Create the hot filter column indexes"""
+    if engine.dialect.name == "postgresql":
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            for (index_name,) in conn.execute(text(INVALID_INDEXES_SQL), {"names": list(INDEXES)}):
+                print(f"Dropping invalid {index_name}...")
+                conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}"))
+            for index_name in INDEXES:
+                print(f"Creating {index_name}...")
+                conn.execute(text(create_index_sql(index_name, "postgresql")))
+    else:
+        with engine.connect() as conn:
+            with conn.begin():
+                for index_name in INDEXES:
+                    print(f"Creating {index_name}...")
+                    conn.execute(text(create_index_sql(index_name, engine.dialect.name)))
+
+    print("✓ Index migration completed successfully!")
+
+def check_database():
+    """EXPLAIN the hot queries; True if each one uses its index"""
+    with engine.connect() as conn:
+        results = check_index_usage(conn)
+    for index_name, (used, plan) in results.items():
+        print(f"{'✓' if used else '✗'} {index_name}")
+        if not used:
+            print(f"    {plan}")
+    return all(used for used, _ in results.values())
+
+if __name__ == "__main__":
+    if "--check" not in sys.argv:
+        migrate_database()
+    sys.exit(0 if check_database() else 1)
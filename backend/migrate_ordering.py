@@ -0,0 +1,37 @@
+"""
+Database Migration Script for Ranked Ordering
+Turns stops.sort_order into a fractional rank key, adds activities.sort_order
+and backfills it so existing activities keep their current (id) order.
+Run rebalance_order.py afterwards to space the keys out.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(__file__))
+
+from sqlalchemy import inspect, text
+from database import script_engine as engine
+
+def migrate_database():
+    """Update stops/activities with rank key columns"""
+    inspector = inspect(engine)
+
+    with engine.connect() as conn:
+        with conn.begin():
+            # SQLite columns accept REAL values as-is; PostgreSQL needs a type change
+            if engine.dialect.name == "postgresql":
+                print("Changing stops.sort_order to DOUBLE PRECISION...")
+                conn.execute(text("ALTER TABLE stops ALTER COLUMN sort_order TYPE DOUBLE PRECISION"))
+
+            activity_columns = [c['name'] for c in inspector.get_columns("activities")]
+            if "sort_order" not in activity_columns:
+                print("Adding sort_order to activities...")
+                conn.execute(text("ALTER TABLE activities ADD COLUMN sort_order FLOAT"))
+
+            conn.execute(text("UPDATE activities SET sort_order = id WHERE sort_order IS NULL"))
+            conn.execute(text("UPDATE stops SET sort_order = 0 WHERE sort_order IS NULL"))
+
+    print("✓ Ordering migration completed successfully!")
+
+if __name__ == "__main__":
+    migrate_database()
@@ -0,0 +1,42 @@
+"""
+Database Migration Script for City & Activity Search
+Enables pg_trgm and adds trigram GIN indexes so the ILIKE '%q%' filters
+in search.py can use an index instead of scanning the whole table.
+PostgreSQL only; other databases fall back to in-process ranking.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(__file__))
+
+from sqlalchemy import text
+from database import script_engine as engine
+
+TRIGRAM_INDEXES = {
+    "ix_cities_name_trgm": ("cities", "name"),
+    "ix_cities_country_trgm": ("cities", "country"),
+    "ix_catalog_activities_name_trgm": ("catalog_activities", "name"),
+    "ix_catalog_activities_description_trgm": ("catalog_activities", "description"),
+}
+
+def migrate_database():
+    """Create the pg_trgm extension and trigram indexes"""
+    if engine.dialect.name != "postgresql":
+        print(f"Skipping: trigram indexes need PostgreSQL (current database: {engine.dialect.name})")
+        return
+
+    with engine.connect() as conn:
+        with conn.begin():
+            print("Enabling pg_trgm...")
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
+            for index_name, (table, column) in TRIGRAM_INDEXES.items():
+                print(f"Creating {index_name}...")
+                conn.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} USING gin ({column} gin_trgm_ops)"
+                ))
+
+    print("✓ Search index migration completed successfully!")
+
+if __name__ == "__main__":
+    migrate_database()
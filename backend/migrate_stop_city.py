@@ -0,0 +1,51 @@
+"""
+Database Migration Script for Stop Cities
+Adds the nullable city_id foreign key (and its index) to stops, then links
+existing stops to the cities catalog in bulk: the distinct unlinked names
+are resolved with one query and applied with one executemany UPDATE.
+Safe to re-run, e.g. after adding cities to the catalog.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(__file__))
+
+from sqlalchemy import bindparam, inspect, select, text, update
+from database import script_engine as engine
+import models, city_links
+
+def migrate_database():
+    """Update stops with city_id and link them to catalog cities"""
+    inspector = inspect(engine)
+
+    with engine.connect() as conn:
+        with conn.begin():
+            columns = [c['name'] for c in inspector.get_columns("stops")]
+            if "city_id" not in columns:
+                print("Adding city_id to stops...")
+                conn.execute(text("ALTER TABLE stops ADD COLUMN city_id INTEGER REFERENCES cities (id) ON DELETE SET NULL"))
+
+            print("Creating ix_stops_city_id...")
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_stops_city_id ON stops (city_id)"))
+
+        with conn.begin():
+            stops = models.Stop.__table__
+            names = conn.scalars(select(stops.c.city_name).where(stops.c.city_id.is_(None)).distinct()).all()
+            city_ids = city_links.resolve(conn, names)
+            links = [
+                {"name": name, "linked_city_id": city_ids[city_links.name_key(name)]}
+                for name in names if city_links.name_key(name) in city_ids
+            ]
+            print(f"Linking stops for {len(links)} of {len(names)} unlinked city names...")
+            if links:
+                conn.execute(
+                    update(stops)
+                    .where(stops.c.city_id.is_(None), stops.c.city_name == bindparam("name"))
+                    .values(city_id=bindparam("linked_city_id")),
+                    links
+                )
+
+    print("✓ Stop city migration completed successfully!")
+
+if __name__ == "__main__":
+    migrate_database()
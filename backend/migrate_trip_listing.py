@@ -0,0 +1,26 @@
+"""
+Database Migration Script for Paginated Trip Listing
+Adds the (owner_id, status, created_at) index used by GET /trips/.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(__file__))
+
+from sqlalchemy import text
+from database import script_engine as engine
+
+def migrate_database():
+    """Create the trip listing index"""
+    with engine.connect() as conn:
+        with conn.begin():
+            print("Creating ix_trips_owner_status_created...")
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_trips_owner_status_created "
+                "ON trips (owner_id, status, created_at)"
+            ))
+
+    print("✓ Trip listing migration completed successfully!")
+
+if __name__ == "__main__":
+    migrate_database()
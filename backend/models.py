@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Date, Index
 from sqlalchemy.orm import relationship
 from database import Base
 import datetime
@@ -40,8 +40,15 @@ class Trip(Base):
     owner_id = Column(Integer, ForeignKey("users.id"))
     
     owner = relationship("User", back_populates="trips")
-    stops = relationship("Stop", back_populates="trip", cascade="all, delete-orphan")
+    stops = relationship("Stop", back_populates="trip", cascade="all, delete-orphan", order_by=lambda: (Stop.sort_order, Stop.id))
     expenses = relationship("Expense", back_populates="trip", cascade="all, delete-orphan")
+    budget_rollup = relationship("TripBudgetRollup", uselist=False, cascade="all, delete-orphan")
+    daily_budget_rollups = relationship("TripBudgetDailyRollup", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        # Trip listing: filter by owner (+ status), keyset-paginate on created_at
+        Index("ix_trips_owner_status_created", "owner_id", "status", "created_at"),
+    )
 
 class Stop(Base):
     __tablename__ = "stops"
@@ -49,15 +56,22 @@ class Stop(Base):
     id = Column(Integer, primary_key=True, index=True)
     trip_id = Column(Integer, ForeignKey("trips.id"))
     city_name = Column(String)
+    city_id = Column(Integer, ForeignKey("cities.id", ondelete="SET NULL"), nullable=True, index=True) # catalog city, see city_links.py
     arrival_date = Column(DateTime)
     departure_date = Column(DateTime)
-    sort_order = Column(Integer)
+    sort_order = Column(Float) # fractional rank key, see ordering.py
     accommodation_cost = Column(Float, default=0.0)
     transport_cost = Column(Float, default=0.0)
     
     trip = relationship("Trip", back_populates="stops")
-    activities = relationship("Activity", back_populates="stop", cascade="all, delete-orphan")
+    city = relationship("City", back_populates="stops")
+    activities = relationship("Activity", back_populates="stop", cascade="all, delete-orphan", order_by=lambda: (Activity.sort_order, Activity.id))
     expenses = relationship("Expense", back_populates="stop", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        # A trip's stops in display order
+        Index("ix_stops_trip_sort", "trip_id", "sort_order"),
+    )
 
 class Activity(Base):
     __tablename__ = "activities"
@@ -67,9 +81,16 @@ class Activity(Base):
     description = Column(String)
     time = Column(String, nullable=True)
     cost = Column(Float, default=0.0)
+    sort_order = Column(Float) # fractional rank key, see ordering.py
+    category = Column(String, nullable=True, index=True) # set from description, see activity_categories.py
     
     stop = relationship("Stop", back_populates="activities")
     expenses = relationship("Expense", back_populates="activity", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        # A stop's activities in display order
+        Index("ix_activities_stop_sort", "stop_id", "sort_order"),
+    )
 
 class City(Base):
     __tablename__ = "cities"
@@ -82,13 +103,9 @@ class City(Base):
     cost_index = Column(Float) # 1.0 = average, >1 expensive
     popularity = Column(Integer) # 0-100
     
-<<<<<<< HEAD
-    popularity = Column(Integer) # 0-100
-    
-=======
->>>>>>> b1b02e3c0d2006fd00e882c768604aa877c20d20
     catalog_activities = relationship("CatalogActivity", back_populates="city")
     users_saved = relationship("SavedDestination", back_populates="city")
+    stops = relationship("Stop", back_populates="city")
 
 class CatalogActivity(Base):
     __tablename__ = "catalog_activities"
@@ -118,10 +135,44 @@ class Expense(Base):
     currency = Column(String, default="USD")
     date = Column(DateTime)
     notes = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
     
     trip = relationship("Trip", back_populates="expenses")
     stop = relationship("Stop", back_populates="expenses")
     activity = relationship("Activity", back_populates="expenses")
+    
+    __table_args__ = (
+        # Expense list/export filters, daily budget trends and category totals
+        Index("ix_expenses_trip_date", "trip_id", "date"),
+        Index("ix_expenses_trip_category", "trip_id", "category"),
+        # Cleanup when a stop or activity is deleted
+        Index("ix_expenses_stop_id", "stop_id"),
+        Index("ix_expenses_activity_id", "activity_id"),
+    )
+
+# Materialized budget totals, updated in the same transaction as stop/activity/expense writes
+class TripBudgetRollup(Base):
+    __tablename__ = "trip_budget_rollup"
+    
+    trip_id = Column(Integer, ForeignKey("trips.id"), primary_key=True)
+    transport = Column(Float, default=0.0)
+    stay = Column(Float, default=0.0)
+    food = Column(Float, default=0.0)
+    activities = Column(Float, default=0.0)
+    other = Column(Float, default=0.0)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+# Expense totals per trip and calendar day
+class TripBudgetDailyRollup(Base):
+    __tablename__ = "trip_budget_daily_rollup"
+    
+    trip_id = Column(Integer, ForeignKey("trips.id"), primary_key=True)
+    date = Column(Date, primary_key=True)
+    transport = Column(Float, default=0.0)
+    stay = Column(Float, default=0.0)
+    food = Column(Float, default=0.0)
+    activities = Column(Float, default=0.0)
+    other = Column(Float, default=0.0)
 
 class SavedDestination(Base):
     __tablename__ = "saved_destinations"
@@ -132,3 +183,23 @@ class SavedDestination(Base):
     
     user = relationship("User", back_populates="saved_destinations")
     city = relationship("City", back_populates="users_saved")
+
+# Per-day (UTC) growth counters, incremented on write; rebuild_daily_counters.py recomputes them
+class DailyCounter(Base):
+    __tablename__ = "daily_counters"
+    
+    date = Column(Date, primary_key=True)
+    trips_created = Column(Integer, default=0, nullable=False)
+    users_signed_up = Column(Integer, default=0, nullable=False)
+    expenses_logged = Column(Integer, default=0, nullable=False)
+
+# Precomputed top-k destinations per user, rebuilt by build_recommendations.py
+class UserRecommendation(Base):
+    __tablename__ = "user_recommendations"
+    
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    rank = Column(Integer, primary_key=True)
+    city_id = Column(Integer, ForeignKey("cities.id", ondelete="CASCADE"))
+    score = Column(Float)
+    
+    city = relationship("City")
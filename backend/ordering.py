@@ -0,0 +1,89 @@
+"""
+Ordering of stops within a trip and activities within a stop.
+sort_order holds fractional rank keys: moving one item gives it the midpoint
+of its new neighbours' keys, so a move writes a single row. When two
+neighbours get too close (or tie) the parent is rebalanced back to evenly
+spaced keys; rebalance_order.py does the same for every parent offline.
+A full reorder is applied with one UPDATE ... SET sort_order = CASE id ... END.
+"""
+
+from fastapi import HTTPException
+from sqlalchemy import case, func, select, tuple_, update
+from sqlalchemy.orm import Session
+
+RANK_STEP = 1024.0
+
+def rank_between(before, after):
+    """Key strictly between two neighbour keys (None = list end), or None if there is no room"""
+    if before is None and after is None:
+        return RANK_STEP
+    if before is None:
+        return after - RANK_STEP
+    if after is None:
+        return before + RANK_STEP
+    middle = (before + after) / 2
+    return middle if before < middle < after else None
+
+def next_rank(db: Session, model, parent_column, parent_id: int):
+    """Key that places a new row after every existing row of the parent"""
+    return last_ranks(db, model, parent_column, [parent_id]).get(parent_id, 0.0) + RANK_STEP
+
+def last_ranks(db: Session, model, parent_column, parent_ids):
+    """Highest key per parent, for parents that have rows"""
+    if not parent_ids:
+        return {}
+    rows = db.execute(
+        select(parent_column, func.max(model.sort_order))
+        .where(parent_column.in_(parent_ids))
+        .group_by(parent_column)
+    )
+    return {parent_id: rank for parent_id, rank in rows if rank is not None}
+
+def is_permutation(db: Session, model, parent_column, parent_id: int, ordered_ids):
+    """True if ordered_ids lists every child row of parent_id exactly once"""
+    current_ids = set(db.scalars(select(model.id).where(parent_column == parent_id)))
+    return len(ordered_ids) == len(set(ordered_ids)) and set(ordered_ids) == current_ids
+
+def apply_order(db: Session, model, parent_column, parent_id: int, ordered_ids):
+    """Give the ids evenly spaced keys in the given order with one UPDATE"""
+    if not ordered_ids:
+        return
+    ranks = case({row_id: (index + 1) * RANK_STEP for index, row_id in enumerate(ordered_ids)}, value=model.id)
+    db.execute(
+        update(model)
+        .where(parent_column == parent_id, model.id.in_(ordered_ids))
+        .values(sort_order=ranks)
+        .execution_options(synchronize_session=False)
+    )
+
+def rebalance(db: Session, model, parent_column, parent_id: int):
+    """Re-space the keys of one parent's rows, keeping their current order"""
+    ordered_ids = list(db.scalars(
+        select(model.id).where(parent_column == parent_id).order_by(model.sort_order, model.id)
+    ))
+    apply_order(db, model, parent_column, parent_id, ordered_ids)
+
+def _rank_after(db: Session, model, parent_column, parent_id: int, row_id: int, after_id):
+    siblings = select(model.id, model.sort_order).where(parent_column == parent_id, model.id != row_id)
+    before = None
+    if after_id is not None:
+        before = db.execute(siblings.where(model.id == after_id)).first()
+        if before is None:
+            raise HTTPException(status_code=404, detail=f"{model.__name__} not found")
+        siblings = siblings.where(tuple_(model.sort_order, model.id) > tuple_(before.sort_order, before.id))
+    after = db.execute(siblings.order_by(model.sort_order, model.id).limit(1)).first()
+    return rank_between(before.sort_order if before else None, after.sort_order if after else None)
+
+def move_after(db: Session, model, parent_column, parent_id: int, row_id: int, after_id=None):
+    """Place row_id right after sibling after_id (first when None); returns its new key"""
+    rank = _rank_after(db, model, parent_column, parent_id, row_id, after_id)
+    if rank is None:
+        rebalance(db, model, parent_column, parent_id)
+        rank = _rank_after(db, model, parent_column, parent_id, row_id, after_id)
+    db.execute(
+        update(model)
+        .where(model.id == row_id)
+        .values(sort_order=rank)
+        .execution_options(synchronize_session=False)
+    )
+    return rank
@@ -0,0 +1,74 @@
+"""
+Response cache for shared (public) itineraries.
+GET /trips/public/{share_token} stores the serialized TripPublic body and
+its strong ETag per trip id, and remembers which trip each token resolves
+to, so repeat hits are served without touching the database. Both maps are
+bounded TTL caches. Routes that change a trip, its stops or activities call
+invalidate_trip() after committing; owner profile changes and writes made
+by other workers are picked up within PUBLIC_TRIP_CACHE_TTL_SECONDS.
+A load first puts a marker in the trip's slot (begin_load) and only stores
+its body if the marker is still there, so a write that commits and
+invalidates while the trip is being read cannot leave a stale body behind.
+"""
+
+import hashlib
+import schemas
+from cache import TTLCache
+
+PUBLIC_TRIP_CACHE_SIZE = 1000
+PUBLIC_TRIP_CACHE_TTL_SECONDS = 300
+PUBLIC_TRIP_MAX_AGE_SECONDS = 60
+CACHE_CONTROL = f"public, max-age={PUBLIC_TRIP_MAX_AGE_SECONDS}"
+
+public_trip_cache = TTLCache(maxsize=PUBLIC_TRIP_CACHE_SIZE, ttl=PUBLIC_TRIP_CACHE_TTL_SECONDS)  # trip_id -> (token, body, etag) or load marker
+trip_ids_by_token = TTLCache(maxsize=PUBLIC_TRIP_CACHE_SIZE, ttl=PUBLIC_TRIP_CACHE_TTL_SECONDS)
+
+def render(trip):
+    """(body, etag) of the TripPublic representation of trip (stops, activities and owner loaded)"""
+    body = schemas.TripPublic.model_validate({
+        "id": trip.id,
+        "destination": trip.destination,
+        "title": trip.title,
+        "description": trip.description,
+        "start_date": trip.start_date,
+        "end_date": trip.end_date,
+        "completion_percentage": trip.completion_percentage,
+        "cost_from": trip.cost_from,
+        "budget_limit": trip.budget_limit,
+        "cover_image_url": trip.cover_image_url,
+        "status": trip.status,
+        "owner_name": trip.owner.full_name,
+        "owner_image": trip.owner.profile_image_url,
+        "stops": trip.stops
+    }).model_dump_json().encode()
+    return body, f'"{hashlib.sha256(body).hexdigest()}"'
+
+def get(share_token: str):
+    """Cached (body, etag) for share_token, or None"""
+    trip_id = trip_ids_by_token.get(share_token)
+    entry = public_trip_cache.get(trip_id) if trip_id is not None else None
+    if isinstance(entry, tuple) and entry[0] == share_token:
+        return entry[1:]
+    return None
+
+def begin_load(trip_id: int):
+    """Mark trip_id as being read from the database; pass the marker to store()"""
+    marker = object()
+    public_trip_cache.set(trip_id, marker)
+    return marker
+
+def store(share_token: str, trip_id: int, marker, entry):
+    """Cache entry unless trip_id was invalidated (or reloaded) since begin_load()"""
+    trip_ids_by_token.set(share_token, trip_id)
+    return public_trip_cache.replace(trip_id, marker, (share_token, *entry))
+
+def invalidate_trip(trip_id: int):
+    """Drop the cached public view of trip_id, if any"""
+    public_trip_cache.pop(trip_id)
+
+def etag_matches(if_none_match, etag: str):
+    """If-None-Match check (weak comparison as the header requires; list and * aware)"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
@@ -0,0 +1,39 @@
+"""
+Rank Key Rebalance Script
+Re-spaces the sort_order keys of every trip's stops and every stop's
+activities, keeping their order. Single moves halve the gap between two
+neighbours, so run this periodically (e.g. nightly) to restore headroom.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(__file__))
+
+from database import ScriptSessionLocal as SessionLocal
+import models, ordering
+
+BATCH_SIZE = 100
+
+def rebalance_all():
+    """Rebalance stop and activity keys of every trip"""
+    db = SessionLocal()
+    try:
+        trip_ids = [trip_id for (trip_id,) in db.query(models.Trip.id).order_by(models.Trip.id)]
+        print(f"Rebalancing stops and activities of {len(trip_ids)} trips...")
+
+        for index, trip_id in enumerate(trip_ids, start=1):
+            ordering.rebalance(db, models.Stop, models.Stop.trip_id, trip_id)
+            stop_ids = [stop_id for (stop_id,) in db.query(models.Stop.id).filter(models.Stop.trip_id == trip_id)]
+            for stop_id in stop_ids:
+                ordering.rebalance(db, models.Activity, models.Activity.stop_id, stop_id)
+            if index % BATCH_SIZE == 0:
+                db.commit()
+                print(f"  {index}/{len(trip_ids)}")
+        db.commit()
+    finally:
+        db.close()
+
+    print("✓ Rank keys rebalanced successfully!")
+
+if __name__ == "__main__":
+    rebalance_all()
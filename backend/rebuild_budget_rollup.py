@@ -0,0 +1,38 @@
+"""
+Budget Rollup Rebuild Script
+Creates the trip_budget_rollup / trip_budget_daily_rollup tables if needed
+and recomputes them from stops, activities and expenses.
+Safe to re-run at any time, e.g. to backfill existing trips.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(__file__))
+
+from database import Base, script_engine as engine, ScriptSessionLocal as SessionLocal
+import models, budget
+
+BATCH_SIZE = 100
+
+def rebuild_rollups():
+    """Rebuild the budget rollups of every trip"""
+    Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        trip_ids = [trip_id for (trip_id,) in db.query(models.Trip.id).order_by(models.Trip.id)]
+        print(f"Rebuilding budget rollups for {len(trip_ids)} trips...")
+
+        for index, trip_id in enumerate(trip_ids, start=1):
+            budget.rebuild_trip_rollup(db, trip_id)
+            if index % BATCH_SIZE == 0:
+                db.commit()
+                print(f"  {index}/{len(trip_ids)}")
+        db.commit()
+    finally:
+        db.close()
+
+    print("✓ Budget rollups rebuilt successfully!")
+
+if __name__ == "__main__":
+    rebuild_rollups()
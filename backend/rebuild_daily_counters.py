@@ -0,0 +1,30 @@
+"""
+Growth Counters Rebuild Script
+Creates the daily_counters table if needed and recomputes every day's
+trip, signup and expense counts from the created_at columns.
+Safe to re-run at any time, e.g. nightly to correct drift from writes that
+bypass the API.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(__file__))
+
+from database import Base, script_engine as engine, ScriptSessionLocal as SessionLocal
+import admin_stats
+
+def rebuild_counters():
+    """Rebuild the daily growth counters"""
+    Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        days = admin_stats.rebuild_daily_counters(db)
+        db.commit()
+    finally:
+        db.close()
+
+    print(f"✓ Daily counters rebuilt for {days} days!")
+
+if __name__ == "__main__":
+    rebuild_counters()
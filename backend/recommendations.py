@@ -0,0 +1,192 @@
+"""
+Destination recommendations.
+rebuild() is the offline scorer (run via build_recommendations.py): it
+compares cities by cost_index, popularity and country, plus how often they
+appear together in the same trip, and keeps each city's CITY_NEIGHBOURS most
+similar cities. Similarities are computed one block of cities at a time, so
+memory grows with the catalog size rather than its square. Every user is
+scored from the neighbours of the cities they saved or visited. The top
+RECOMMENDATION_TOP_K per user go into user_recommendations, so for_user() is
+one indexed read. Users without any history get the most popular cities.
+"""
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+import models
+
+RECOMMENDATION_TOP_K = 10
+DASHBOARD_RECOMMENDATIONS = 4
+USER_BATCH_SIZE = 500
+# Neighbour table: similar cities kept per city, and cities compared per block
+CITY_NEIGHBOURS = 50
+SIMILARITY_BLOCK_SIZE = 1024
+
+# Similarity blend: catalog features vs. trip co-occurrence
+CONTENT_WEIGHT = 0.4
+CO_OCCURRENCE_WEIGHT = 0.6
+COUNTRY_WEIGHT = 1.0
+# User profile: a saved city counts more than a city already on a trip
+SAVED_WEIGHT = 2.0
+VISITED_WEIGHT = 1.0
+# Small popularity prior so ties go to better-known cities
+POPULARITY_PRIOR = 0.05
+# Shown as "from $..." on the dashboard; cost_index 1.0 = average destination
+PRICE_FROM_PER_COST_INDEX = 500
+
+def recommendation_payload(city: models.City):
+    return {
+        "city": city.name,
+        "country": city.country,
+        "price_from": round((city.cost_index or 1.0) * PRICE_FROM_PER_COST_INDEX),
+        "image_url": city.image_url
+    }
+
+def for_user(db: Session, user_id: int, limit: int = DASHBOARD_RECOMMENDATIONS):
+    """Precomputed recommendations for user_id, or the most popular cities if there are none"""
+    cities = db.scalars(
+        select(models.City)
+        .join(models.UserRecommendation, models.UserRecommendation.city_id == models.City.id)
+        .where(models.UserRecommendation.user_id == user_id)
+        .order_by(models.UserRecommendation.rank)
+        .limit(limit)
+    ).all()
+    if not cities:
+        # NULL popularity ranks as 0 (PostgreSQL would otherwise sort NULLs first)
+        popularity = func.coalesce(models.City.popularity, 0)
+        cities = db.scalars(select(models.City).order_by(popularity.desc(), models.City.id).limit(limit)).all()
+    return [recommendation_payload(city) for city in cities]
+
+def _l2_normalize(np, matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+def _city_features(np, cities):
+    """L2-normalized rows of [cost z-score, popularity, country one-hot], and popularity (0-1)"""
+    count = len(cities)
+    cost = np.array([city.cost_index or 1.0 for city in cities], dtype=np.float32)
+    popularity = np.array([(city.popularity or 0) / 100.0 for city in cities], dtype=np.float32)
+    countries = sorted({(city.country or "").lower() for city in cities})
+    country_index = {country: index for index, country in enumerate(countries)}
+    country_onehot = np.zeros((count, len(countries)), dtype=np.float32)
+    country_onehot[np.arange(count), [country_index[(city.country or "").lower()] for city in cities]] = COUNTRY_WEIGHT
+
+    cost_z = (cost - cost.mean()) / (cost.std() or 1.0)
+    return _l2_normalize(np, np.column_stack([cost_z, popularity, country_onehot])), popularity
+
+def _co_occurrence(np, count, trip_city_indexes):
+    """Sparse cosine-normalized co-occurrence: (rows, cols, values) for every pair of
+    distinct cities sharing a trip, sorted by row"""
+    trips_per_city = np.zeros(count, dtype=np.float32)
+    pairs = []
+    for indexes in trip_city_indexes:
+        indexes = np.fromiter(indexes, dtype=np.int64)
+        trips_per_city[indexes] += 1
+        if len(indexes) > 1:
+            a, b = np.meshgrid(indexes, indexes, indexing="ij")
+            pairs.append((a * count + b)[a != b])
+    if not pairs:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, np.zeros(0, dtype=np.float32)
+
+    keys, counts = np.unique(np.concatenate(pairs), return_counts=True)
+    rows, cols = keys // count, keys % count
+    norms = np.sqrt(trips_per_city)
+    return rows, cols, (counts / (norms[rows] * norms[cols])).astype(np.float32)
+
+def city_neighbours(np, cities, trip_city_indexes, neighbours: int = CITY_NEIGHBOURS, block_size: int = SIMILARITY_BLOCK_SIZE):
+    """Each city's most similar other cities: (indexes, scores, popularity), indexes and
+    scores being cities x min(neighbours, cities - 1). Similarity is cosine over catalog
+    features blended with trip co-occurrence, built block_size rows at a time."""
+    count = len(cities)
+    features, popularity = _city_features(np, cities)
+    co_rows, co_cols, co_values = _co_occurrence(np, count, trip_city_indexes)
+
+    k = max(min(neighbours, count - 1), 0)
+    neighbour_indexes = np.zeros((count, k), dtype=np.int64)
+    neighbour_scores = np.zeros((count, k), dtype=np.float32)
+    if k == 0:
+        return neighbour_indexes, neighbour_scores, popularity
+
+    for start in range(0, count, block_size):
+        end = min(start + block_size, count)
+        block = CONTENT_WEIGHT * (features[start:end] @ features.T)
+        lo, hi = np.searchsorted(co_rows, [start, end])
+        block[co_rows[lo:hi] - start, co_cols[lo:hi]] += CO_OCCURRENCE_WEIGHT * co_values[lo:hi]
+        block[np.arange(end - start), np.arange(start, end)] = -np.inf  # not its own neighbour
+        top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        neighbour_indexes[start:end] = top
+        neighbour_scores[start:end] = np.take_along_axis(block, top, axis=1)
+    return neighbour_indexes, neighbour_scores, popularity
+
+def score_user(np, profile: dict, neighbour_indexes, neighbour_scores, popularity, popular_order, top_k: int):
+    """Top top_k (city index, score) for a {city index: weight} profile, best first.
+    A city scores the weighted similarity of the profile cities it neighbours plus the
+    popularity prior; cities outside every neighbour list score the prior alone."""
+    owned = np.fromiter(profile.keys(), dtype=np.int64)
+    weights = np.fromiter(profile.values(), dtype=np.float32)
+    candidates, inverse = np.unique(neighbour_indexes[owned].ravel(), return_inverse=True)
+    contributions = (neighbour_scores[owned] * weights[:, None]).ravel()
+    scores = np.bincount(inverse, weights=contributions, minlength=len(candidates)) + POPULARITY_PRIOR * popularity[candidates]
+    scored = {int(index): float(score) for index, score in zip(candidates, scores) if index not in profile}
+
+    filler = 0
+    for index in popular_order:
+        if filler == top_k:
+            break
+        index = int(index)
+        if index not in profile and index not in scored:
+            scored[index] = float(POPULARITY_PRIOR * popularity[index])
+            filler += 1
+    return sorted(scored.items(), key=lambda item: (-item[1], item[0]))[:top_k]
+
+def rebuild(db: Session, top_k: int = RECOMMENDATION_TOP_K):
+    """Recompute user_recommendations for every user; commits once per batch of users"""
+    import numpy as np  # batch-only dependency; the API only reads the table
+
+    cities = db.scalars(select(models.City).order_by(models.City.id)).all()
+    city_index = {city.id: index for index, city in enumerate(cities)}
+
+    # Cities per trip (stops linked to the catalog) and the trips' owners
+    trip_cities = {}
+    trip_owner = {}
+    for trip_id, owner_id, city_id in db.execute(
+        select(models.Trip.id, models.Trip.owner_id, models.Stop.city_id)
+        .join(models.Stop, models.Stop.trip_id == models.Trip.id)
+        .where(models.Stop.city_id.isnot(None))
+    ):
+        index = city_index.get(city_id)
+        if index is not None:
+            trip_cities.setdefault(trip_id, set()).add(index)
+            trip_owner[trip_id] = owner_id
+
+    if cities:
+        neighbour_indexes, neighbour_scores, popularity = city_neighbours(np, cities, list(trip_cities.values()))
+        popular_order = np.lexsort((np.arange(len(cities)), -popularity))
+
+    profiles = {}
+    for trip_id, indexes in trip_cities.items():
+        profile = profiles.setdefault(trip_owner[trip_id], {})
+        for index in indexes:
+            profile[index] = max(profile.get(index, 0.0), VISITED_WEIGHT)
+    for user_id, city_id in db.execute(select(models.SavedDestination.user_id, models.SavedDestination.city_id)):
+        if city_id in city_index:
+            profiles.setdefault(user_id, {})[city_index[city_id]] = SAVED_WEIGHT
+
+    user_ids = list(db.scalars(select(models.User.id).order_by(models.User.id)))
+    for start in range(0, len(user_ids), USER_BATCH_SIZE):
+        batch = user_ids[start:start + USER_BATCH_SIZE]
+        rows = []
+        for user_id in batch:
+            if not cities or not profiles.get(user_id):
+                continue
+            ranked = score_user(np, profiles[user_id], neighbour_indexes, neighbour_scores, popularity, popular_order, top_k)
+            rows.extend(
+                {"user_id": user_id, "rank": rank, "city_id": cities[index].id, "score": score}
+                for rank, (index, score) in enumerate(ranked)
+            )
+
+        db.execute(delete(models.UserRecommendation).where(models.UserRecommendation.user_id.in_(batch)))
+        if rows:
+            db.execute(insert(models.UserRecommendation), rows)
+        db.commit()
+    return len(user_ids)
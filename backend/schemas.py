@@ -16,6 +16,8 @@ class ActivityUpdate(ActivityBase):
 class Activity(ActivityBase):
     id: int
     stop_id: int
+    sort_order: Optional[float] = None
+    category: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -54,12 +56,12 @@ class StopBase(BaseModel):
     city_name: str
     arrival_date: datetime
     departure_date: datetime
-    sort_order: int
+    sort_order: float
     accommodation_cost: float = 0.0
     transport_cost: float = 0.0
 
 class StopCreate(StopBase):
-    pass
+    sort_order: Optional[float] = None  # ignored: new stops are appended after the trip's existing stops
 
 class StopUpdate(StopBase):
     pass
@@ -67,9 +69,13 @@ class StopUpdate(StopBase):
 class StopReorder(BaseModel):
     stop_ids: List[int]
 
+class ItemMove(BaseModel):
+    after_id: Optional[int] = None  # sibling to place the item after; None moves it first
+
 class Stop(StopBase):
     id: int
     trip_id: int
+    city_id: Optional[int] = None
     activities: List[Activity] = []
 
     class Config:
@@ -90,15 +96,17 @@ class TripBase(BaseModel):
 class TripCreate(TripBase):
     pass
 
-class Trip(TripBase):
+class TripSummary(TripBase):
     id: int
     owner_id: int
     created_at: Optional[datetime] = None
-    stops: List[Stop] = []
 
     class Config:
         from_attributes = True
 
+class Trip(TripSummary):
+    stops: List[Stop] = []
+
 class UserBase(BaseModel):
     email: EmailStr
 
@@ -155,6 +163,7 @@ class AdminStats(BaseModel):
     total_trips: int
     active_trips: int
     total_revenue_estimated: float
+    computed_at: Optional[datetime] = None  # snapshot time (UTC)
     
 class GrowthData(BaseModel):
     period: str # e.g., "2023-01"
@@ -172,6 +181,13 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     email: Optional[str] = None
 
+class Principal(BaseModel):
+    # Authenticated user as cached by auth.get_current_principal
+    id: int
+    email: str
+    full_name: Optional[str] = None
+    is_admin: int = 0
+
 class DashboardData(BaseModel):
     full_name: str
     upcoming_trip: Optional[Trip] = None
@@ -207,6 +223,15 @@ class Expense(ExpenseBase):
     class Config:
         from_attributes = True
 
+class ExpenseImportError(BaseModel):
+    row: int  # 1-based data row (CSV header and blank NDJSON lines not counted)
+    error: str
+
+class ExpenseImportResult(BaseModel):
+    imported: int
+    failed: int
+    errors: List[ExpenseImportError] = []  # capped; `failed` has the full count
+
 # --- BUDGET SCHEMAS ---
 class BudgetBreakdown(BaseModel):
     transport: float
@@ -241,6 +266,7 @@ class DailySpending(BaseModel):
 class DailyTrendResponse(BaseModel):
     days: List[DailySpending]
     budget_limit_per_day: float
+    granularity: str = "day"  # day, week, month
 
 # --- TIMELINE SCHEMAS ---
 class TimelineActivity(BaseModel):
@@ -250,7 +276,7 @@ class TimelineActivity(BaseModel):
     duration: Optional[str] = None
     cost: float
     category: str
-    sort_order: int = 0
+    sort_order: Optional[float] = None
 
 class TimelineStop(BaseModel):
     id: int
@@ -282,7 +308,8 @@ class CalendarDay(BaseModel):
     is_trip_day: bool
 
 class CalendarResponse(BaseModel):
-    month: str
+    month: str  # first month shown
+    months: List[str] = []  # every month covered by days (several with from/to)
     days: List[CalendarDay]
 
 class ActivityReorder(BaseModel):
@@ -291,3 +318,35 @@ class ActivityReorder(BaseModel):
 class ActivityTimeUpdate(BaseModel):
     time: str
     duration: Optional[str] = None
+
+# --- ITINERARY BATCH SCHEMAS ---
+class BatchStopCreate(StopCreate):
+    ref: Optional[str] = None  # client-side id so new activities can target this stop
+    activities: List[ActivityCreate] = []
+
+class BatchStopUpdate(StopUpdate):
+    id: int
+
+class BatchActivityCreate(ActivityCreate):
+    stop_id: Optional[int] = None   # existing stop
+    stop_ref: Optional[str] = None  # or a stop created in the same batch
+
+class BatchActivityUpdate(ActivityUpdate):
+    id: int
+
+class ItineraryBatch(BaseModel):
+    create_stops: List[BatchStopCreate] = []
+    update_stops: List[BatchStopUpdate] = []
+    delete_stops: List[int] = []
+    create_activities: List[BatchActivityCreate] = []
+    update_activities: List[BatchActivityUpdate] = []
+    delete_activities: List[int] = []
+
+class BatchCreatedStop(BaseModel):
+    id: int
+    ref: Optional[str] = None
+    activity_ids: List[int] = []
+
+class ItineraryBatchResult(BaseModel):
+    stops: List[BatchCreatedStop]  # in create_stops order
+    activity_ids: List[int]        # in create_activities order
@@ -0,0 +1,74 @@
+"""
+City and catalog activity search.
+On PostgreSQL the substring filters are served by pg_trgm GIN indexes
+(see migrate_search_indexes.py) and results are ranked by trigram similarity.
+Other databases (SQLite in tests) use the same filters and rank in-process
+with a pure Python port of pg_trgm's similarity(), so ordering matches.
+"""
+
+import re
+from sqlalchemy import func
+from sqlalchemy.orm import Session, noload, selectinload
+import models
+
+DEFAULT_SEARCH_LIMIT = 50
+MAX_SEARCH_LIMIT = 200
+
+_WORD_RE = re.compile(r"[^\W_]+")
+
+def trigrams(text: str):
+    """Trigram set of text, built the way pg_trgm does (lowercased, per word, padded)"""
+    grams = set()
+    for word in _WORD_RE.findall((text or "").lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def similarity(a: str, b: str):
+    """Equivalent of pg_trgm similarity(a, b)"""
+    a_grams, b_grams = trigrams(a), trigrams(b)
+    union = len(a_grams | b_grams)
+    return len(a_grams & b_grams) / union if union else 0.0
+
+def uses_trigram_index(db: Session):
+    return db.get_bind().dialect.name == "postgresql"
+
+def _ranked(db: Session, q, columns, query: str, limit: int):
+    """Order by trigram similarity to query of the best-matching column, in SQL when pg_trgm is available"""
+    if uses_trigram_index(db):
+        scores = [func.similarity(func.coalesce(column, ""), query) for column in columns]
+        score = scores[0] if len(scores) == 1 else func.greatest(*scores)
+        return q.order_by(score.desc(), columns[0]).limit(limit).all()
+    rows = q.all()
+    attributes = [column.key for column in columns]
+    rows.sort(key=lambda row: (
+        -max(similarity(getattr(row, attribute), query) for attribute in attributes),
+        getattr(row, attributes[0]) or "",
+    ))
+    return rows[:limit]
+
+def search_cities(db: Session, query: str = "", country: str = "", limit: int = DEFAULT_SEARCH_LIMIT, include_activities: bool = True):
+    activities = selectinload if include_activities else noload
+    q = db.query(models.City).options(activities(models.City.catalog_activities))
+    if query:
+        q = q.filter(models.City.name.ilike(f"%{query}%"))
+    if country:
+        q = q.filter(models.City.country.ilike(f"%{country}%"))
+    if query:
+        return _ranked(db, q, [models.City.name], query, limit)
+    return q.order_by(func.coalesce(models.City.popularity, 0).desc(), models.City.name).limit(limit).all()
+
+def search_activities(db: Session, city_id: int = None, query: str = "", interest: str = "", cost_max: float = None, limit: int = DEFAULT_SEARCH_LIMIT):
+    q = db.query(models.CatalogActivity)
+    if city_id:
+        q = q.filter(models.CatalogActivity.city_id == city_id)
+    if query:
+        q = q.filter(models.CatalogActivity.name.ilike(f"%{query}%") | models.CatalogActivity.description.ilike(f"%{query}%"))
+    if interest:
+        q = q.filter(models.CatalogActivity.category.ilike(f"%{interest}%"))
+    if cost_max is not None:
+        q = q.filter(models.CatalogActivity.cost <= cost_max)
+    if query:
+        # Ranked on whichever of name or description the query matched best
+        return _ranked(db, q, [models.CatalogActivity.name, models.CatalogActivity.description], query, limit)
+    return q.order_by(models.CatalogActivity.name).limit(limit).all()
@@ -0,0 +1,90 @@
+"""
+Day-by-day trip timeline and calendar.
+Each stop is placed directly on the days it covers (by date offset from the
+trip start) instead of scanning every stop for every day, and each
+activity is classified and serialized once, however many days its stop spans.
+Calendar activity counts are grouped by day in SQL for the requested window only.
+"""
+
+import datetime
+from sqlalchemy import Date, func, select
+from sqlalchemy.orm import Session
+import models, activity_categories
+
+MAX_CALENDAR_MONTHS = 12
+
+def activity_entry(activity):
+    return {
+        "id": activity.id,
+        "description": activity.description,
+        "time": activity.time,
+        "duration": None,  # Could be extracted from description
+        "cost": activity.cost,
+        "category": activity.category or activity_categories.classify(activity.description),
+        "sort_order": activity.sort_order
+    }
+
+def build_days(start_date: datetime.date, end_date: datetime.date, stops):
+    """Timeline days from start_date to end_date; stops in display order with activities loaded"""
+    day_count = (end_date - start_date).days + 1
+    day_stops = [[] for _ in range(day_count)]
+    day_activities = [[] for _ in range(day_count)]
+
+    for stop in stops:
+        first = max((stop.arrival_date.date() - start_date).days, 0)
+        last = min((stop.departure_date.date() - start_date).days, day_count - 1)
+        if first > last:
+            continue
+        entries = [activity_entry(activity) for activity in stop.activities]
+        for index in range(first, last + 1):
+            day_stops[index].append(stop)
+            day_activities[index].extend(entries)
+
+    days = []
+    for index in range(day_count):
+        title = f"Day {index + 1}"
+        if day_stops[index]:
+            title += f": {day_stops[index][0].city_name}"
+        days.append({
+            "day_number": index + 1,
+            "date": (start_date + datetime.timedelta(days=index)).strftime("%Y-%m-%d"),
+            "title": title,
+            "stops": day_stops[index],
+            "activities": day_activities[index]
+        })
+    return days
+
+def month_end(start_of_month: datetime.date):
+    """Last day of the month starting on start_of_month"""
+    if start_of_month.month == 12:
+        return datetime.date(start_of_month.year + 1, 1, 1) - datetime.timedelta(days=1)
+    return datetime.date(start_of_month.year, start_of_month.month + 1, 1) - datetime.timedelta(days=1)
+
+def get_activity_counts(db: Session, trip_id: int, start: datetime.date, end: datetime.date):
+    """Activities per day between start and end (inclusive), dated by their stop's arrival"""
+    day = func.date(models.Stop.arrival_date, type_=Date)
+    rows = db.execute(
+        select(day, func.count(models.Activity.id))
+        .join(models.Activity, models.Activity.stop_id == models.Stop.id)
+        .where(
+            models.Stop.trip_id == trip_id,
+            models.Stop.arrival_date >= datetime.datetime.combine(start, datetime.time.min),
+            models.Stop.arrival_date < datetime.datetime.combine(end + datetime.timedelta(days=1), datetime.time.min),
+        )
+        .group_by(day)
+    )
+    return {date: count for date, count in rows}
+
+def build_calendar_days(start: datetime.date, end: datetime.date, trip_start: datetime.date, trip_end: datetime.date, activity_counts):
+    days = []
+    current_date = start
+    while current_date <= end:
+        activity_count = activity_counts.get(current_date, 0)
+        days.append({
+            "date": current_date.strftime("%Y-%m-%d"),
+            "activity_count": activity_count,
+            "has_activities": activity_count > 0,
+            "is_trip_day": trip_start <= current_date <= trip_end
+        })
+        current_date += datetime.timedelta(days=1)
+    return days
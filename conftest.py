@@ -0,0 +1,55 @@
+"""
+Shared fixtures for the in-process tests (test_*.py that call the routes
+directly instead of going through a running server).
+Each test gets a fresh in-memory SQLite database built from models.py;
+the test files only seed their own data into it.
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "backend"))
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database import Base
+
+@pytest.fixture
+def engine_factory():
+    """Returns new_engine(url="sqlite://"), which creates a database with every table;
+    for tests that need several databases or a file one. Engines are disposed afterwards."""
+    engines = []
+
+    def new_engine(url="sqlite://"):
+        if url == "sqlite://":
+            # One shared connection, so every session sees the same in-memory database
+            engine = create_engine(url, connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        else:
+            engine = create_engine(url)
+        Base.metadata.create_all(bind=engine)
+        engines.append(engine)
+        return engine
+
+    yield new_engine
+    for engine in engines:
+        engine.dispose()
+
+@pytest.fixture
+def engine(engine_factory):
+    return engine_factory()
+
+@pytest.fixture
+def session_factory(engine):
+    """Configured like database.SessionLocal"""
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+@pytest.fixture
+def db(session_factory):
+    db = session_factory()
+    try:
+        yield db
+    finally:
+        db.close()
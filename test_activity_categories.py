@@ -0,0 +1,130 @@
+"""
+Checks the stored activity categories (backend/activity_categories.py).
+Pins the category of every keyword and checks classify() against the
+original "first category whose keyword list matches" rule, including
+keywords that are prefixes of each other. Categories are set on ORM writes
+and batch writes, returned by the timeline, and filled in for older rows by
+backfill_activity_categories.py. Runs in-process against in-memory SQLite.
+Run with: python -m pytest test_activity_categories.py
+"""
+
+import os
+import sys
+import datetime
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "backend"))
+
+import pytest
+from sqlalchemy import update
+
+import main, models, schemas, activity_categories, backfill_activity_categories
+
+START = datetime.datetime(2026, 6, 1)
+
+KEYWORD_CATEGORIES = [
+    ("flight", "transport"), ("train", "transport"), ("bus", "transport"), ("taxi", "transport"), ("transport", "transport"),
+    ("hotel", "accommodation"), ("check-in", "accommodation"), ("accommodation", "accommodation"), ("stay", "accommodation"),
+    ("lunch", "food"), ("dinner", "food"), ("breakfast", "food"), ("restaurant", "food"), ("food", "food"),
+    ("museum", "sightseeing"), ("tour", "sightseeing"), ("visit", "sightseeing"), ("sightseeing", "sightseeing"),
+]
+
+def first_matching_category(description, keywords=activity_categories.ACTIVITY_KEYWORDS):
+    """The original classifier: first category with a keyword in the description"""
+    description = (description or "").lower()
+    for category, words in keywords.items():
+        if any(word in description for word in words):
+            return category
+    return activity_categories.DEFAULT_CATEGORY
+
+def test_keyword_lists_are_pinned():
+    assert [(word, category) for category, words in activity_categories.ACTIVITY_KEYWORDS.items() for word in words] == KEYWORD_CATEGORIES
+
+@pytest.mark.parametrize("keyword, category", KEYWORD_CATEGORIES)
+def test_keyword_category(keyword, category):
+    assert activity_categories.classify(keyword) == category
+    assert activity_categories.classify(f"Morning {keyword.upper()} with friends") == category
+
+MIXED_DESCRIPTIONS = [
+    "Bus tour of the old town", "Dinner at the hotel", "Visit the train museum", "Breakfast, then a taxi",
+    "Guided sightseeing with lunch", "Stay at the beach", "Hotel check-in and dinner", "Gelato", "", None,
+]
+
+@pytest.mark.parametrize("description", MIXED_DESCRIPTIONS)
+def test_matches_first_matching_category(description):
+    assert activity_categories.classify(description) == first_matching_category(description)
+
+def test_prefix_keywords_in_other_categories():
+    # "tour" (sightseeing) is a prefix of "tourist bus" (transport), and "din" (transport) of "dinner" (food)
+    keywords = {
+        "transport": ["tourist bus", "din"],
+        "accommodation": [],
+        "food": ["dinner"],
+        "sightseeing": ["tour"],
+    }
+    pattern, priorities = activity_categories._compile(keywords)
+    saved = activity_categories._KEYWORD_RE, activity_categories._KEYWORD_PRIORITY
+    activity_categories._KEYWORD_RE, activity_categories._KEYWORD_PRIORITY = pattern, priorities
+    try:
+        for description in ("Tourist bus to the coast", "Tour of the port", "Dinner cruise", "Tourist dinner", "Walking tourist trail"):
+            assert activity_categories.classify(description) == first_matching_category(description, keywords), description
+    finally:
+        activity_categories._KEYWORD_RE, activity_categories._KEYWORD_PRIORITY = saved
+
+def seed(db):
+    """Adds one trip and one stop; returns (principal, trip_id, stop_id)"""
+    user = models.User(email="category@example.com", hashed_password="x", full_name="Category")
+    db.add(user)
+    db.flush()
+    trip = models.Trip(destination="Italy", title="Italy", start_date=START, end_date=START, status="upcoming", owner_id=user.id)
+    trip.stops = [models.Stop(city_name="Rome", arrival_date=START, departure_date=START, sort_order=1)]
+    db.add(trip)
+    db.commit()
+    principal = schemas.Principal(id=user.id, email=user.email, full_name=user.full_name)
+    return principal, trip.id, trip.stops[0].id
+
+def stored_categories(db):
+    db.expire_all()
+    return {activity.description: activity.category for activity in db.query(models.Activity)}
+
+def test_category_stored_on_write(db):
+    user, trip_id, stop_id = seed(db)
+    activity = main.add_activity(stop_id, schemas.ActivityCreate(description="Vatican Museum"), current_user=user, db=db)
+    main.add_activity(stop_id, schemas.ActivityCreate(description="Gelato walk"), current_user=user, db=db)
+    assert stored_categories(db) == {"Vatican Museum": "sightseeing", "Gelato walk": "other"}
+
+    main.update_activity(activity.id, schemas.ActivityUpdate(description="Dinner in Trastevere"), current_user=user, db=db)
+    assert stored_categories(db)["Dinner in Trastevere"] == "food"
+
+    main.batch_update_itinerary(trip_id, schemas.ItineraryBatch(
+        create_activities=[schemas.BatchActivityCreate(description="Taxi to the hotel", stop_id=stop_id)],
+        update_activities=[schemas.BatchActivityUpdate(id=activity.id, description="Hotel check-in")],
+    ), current_user=user, db=db)
+    assert stored_categories(db) == {"Hotel check-in": "accommodation", "Gelato walk": "other", "Taxi to the hotel": "transport"}
+
+    timeline = main.get_trip_timeline(trip_id, current_user=user, db=db)
+    categories = {activity["description"]: activity["category"] for activity in timeline["days"][0]["activities"]}
+    assert categories == {"Hotel check-in": "accommodation", "Gelato walk": "other", "Taxi to the hotel": "transport"}
+
+def test_backfill_classifies_unset_rows(session_factory, db):
+    user, trip_id, stop_id = seed(db)
+    saved = backfill_activity_categories.SessionLocal
+    backfill_activity_categories.SessionLocal = session_factory
+    try:
+        for description in ("Museum tour", "Breakfast", "Night train", "Beach day", "Old flight"):
+            main.add_activity(stop_id, schemas.ActivityCreate(description=description), current_user=user, db=db)
+        # Rows written before the column existed, and one with an outdated category
+        db.execute(update(models.Activity).where(models.Activity.description != "Old flight").values(category=None))
+        db.execute(update(models.Activity).where(models.Activity.description == "Old flight").values(category="food"))
+        db.commit()
+
+        backfill_activity_categories.backfill_categories(chunk_size=2)
+        assert stored_categories(db) == {
+            "Museum tour": "sightseeing", "Breakfast": "food", "Night train": "transport", "Beach day": "other", "Old flight": "food"
+        }
+        backfill_activity_categories.backfill_categories(chunk_size=2, reclassify=True)
+        assert stored_categories(db)["Old flight"] == "transport"
+    finally:
+        backfill_activity_categories.SessionLocal = saved
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
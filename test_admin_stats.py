@@ -0,0 +1,125 @@
+"""
+Checks the admin analytics (backend/admin_stats.py).
+Overview counters are compared with the per-table queries the route used to
+run. Growth series come from the per-day counters, which the write routes
+bump and rebuild_daily_counters() recomputes. Runs in-process against SQLite.
+Run with: python -m pytest test_admin_stats.py
+"""
+
+import os
+import sys
+import datetime
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "backend"))
+
+import pytest
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+import main, models, schemas, admin_stats
+
+def counters(db):
+    return {
+        row.date: (row.trips_created, row.users_signed_up, row.expenses_logged)
+        for row in db.query(models.DailyCounter).order_by(models.DailyCounter.date)
+    }
+
+def per_query_stats(db):
+    """The overview counters as GET /admin/stats computed them before compute_stats(), one query each"""
+    total_budget = db.query(models.Trip).with_entities(func.sum(models.Trip.budget_limit)).scalar() or 0
+    return {
+        "total_users": db.query(models.User).count(),
+        "total_trips": db.query(models.Trip).count(),
+        "active_trips": db.query(models.Trip).filter(models.Trip.status == "active").count(),
+        "total_revenue_estimated": total_budget * 0.01,
+    }
+
+def overview(stats):
+    return {key: value for key, value in stats.items() if key != "computed_at"}
+
+def add_trips(db):
+    owner = models.User(email="owner@example.com", hashed_password="x", full_name="Owner")
+    db.add_all([owner, models.User(email="idle@example.com", hashed_password="x", full_name="Idle")])
+    db.flush()
+    start = datetime.datetime(2026, 6, 1)
+    for status, budget_limit in (("active", 1200.0), ("active", None), ("upcoming", 800.0), ("past", 350.5), ("planning", None)):
+        db.add(models.Trip(destination="Italy", title=status, start_date=start, end_date=start, status=status, budget_limit=budget_limit, owner_id=owner.id))
+    db.commit()
+
+def test_compute_stats_matches_per_query_numbers(db):
+    assert overview(admin_stats.compute_stats(db)) == per_query_stats(db) == {
+        "total_users": 0, "total_trips": 0, "active_trips": 0, "total_revenue_estimated": 0.0
+    }
+    add_trips(db)
+    stats = admin_stats.compute_stats(db)
+    assert overview(stats) == per_query_stats(db)
+    assert (stats["total_users"], stats["total_trips"], stats["active_trips"]) == (2, 5, 2)
+    assert abs(stats["total_revenue_estimated"] - 23.505) < 1e-9
+
+def test_stats_snapshot_until_refresh(db):
+    bucket = admin_stats._bucket
+    admin_stats._bucket = lambda: 1  # stay within one time bucket
+    admin_stats._snapshot = None
+    try:
+        add_trips(db)
+        cached = main.get_admin_stats(current_admin=None, db=db)
+        db.add(models.User(email="late@example.com", hashed_password="x", full_name="Late"))
+        db.commit()
+        assert main.get_admin_stats(current_admin=None, db=db) is cached
+        refreshed = main.refresh_admin_stats(current_admin=None, db=db)
+        assert refreshed["total_users"] == cached["total_users"] + 1
+        assert overview(main.get_admin_stats(current_admin=None, db=db)) == per_query_stats(db)
+    finally:
+        admin_stats._bucket = bucket
+        admin_stats._snapshot = None
+
+def test_record_daily_accumulates(db):
+    day = datetime.date(2026, 3, 2)
+    admin_stats.record_daily(db, day=day, trips_created=1)
+    admin_stats.record_daily(db, day=day, trips_created=2, expenses_logged=5)
+    admin_stats.record_daily(db, day=day + datetime.timedelta(days=1), users_signed_up=1)
+    db.commit()
+    assert counters(db) == {day: (3, 0, 5), day + datetime.timedelta(days=1): (0, 1, 0)}
+
+def test_failed_signup_is_not_masked(db):
+    db.add(models.User(email="first@example.com", hashed_password="x", full_name="First"))
+    db.commit()
+    # A concurrent signup with the same email that passed the existence check
+    db.add(models.User(email="first@example.com", hashed_password="x", full_name="Second"))
+    admin_stats.record_daily(db, users_signed_up=1)
+    with pytest.raises(IntegrityError):
+        db.commit()
+    db.rollback()
+    assert counters(db) == {}
+    assert db.query(models.User).count() == 1
+
+def test_write_routes_match_rebuild(db):
+    user = main.signup(schemas.UserCreate(email="grower@example.com", password="secret", full_name="Grower"), db=db)
+    principal = schemas.Principal(id=user.id, email=user.email, full_name=user.full_name)
+    start = datetime.datetime(2026, 6, 1)
+    for t in range(3):
+        trip = main.create_trip(schemas.TripCreate(destination="Italy", title=f"Trip {t}", start_date=start, end_date=start, status="upcoming"), current_user=principal, db=db)
+        for e in range(t + 1):
+            main.create_expense(trip.id, schemas.ExpenseCreate(name="Lunch", category="food", amount=10.0, date=start), current_user=principal, db=db)
+    recorded = counters(db)
+    assert list(recorded.values()) == [(3, 1, 6)]
+
+    admin_stats.rebuild_daily_counters(db)
+    db.commit()
+    assert counters(db) == recorded
+
+def test_growth_periods(db):
+    for day, trips in ((datetime.date(2025, 12, 29), 1), (datetime.date(2026, 1, 1), 2), (datetime.date(2026, 1, 5), 4), (datetime.date(2026, 2, 10), 8)):
+        admin_stats.record_daily(db, day=day, trips_created=trips)
+    db.commit()
+    assert main.get_growth_stats("monthly", "trips", current_admin=None, db=db) == [
+        {"period": "2025-12", "count": 1}, {"period": "2026-01", "count": 6}, {"period": "2026-02", "count": 8}
+    ]
+    # ISO weeks: 2025-12-29 and 2026-01-01 are both in 2026-W01
+    assert main.get_growth_stats("weekly", "trips", current_admin=None, db=db) == [
+        {"period": "2026-W01", "count": 3}, {"period": "2026-W02", "count": 4}, {"period": "2026-W07", "count": 8}
+    ]
+    assert main.get_growth_stats("daily", "users", current_admin=None, db=db) == []
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
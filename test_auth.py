@@ -0,0 +1,105 @@
+"""
+Checks the cached principal lookup (backend/auth.py get_current_principal /
+invalidate_principal).
+A cache hit must not query the database, role changes and account deletes
+must evict the cached entry, and a token whose uid does not belong to its
+subject is rejected whether or not the subject is cached. Runs in-process
+against an in-memory SQLite database.
+Run with: python -m pytest test_auth.py
+"""
+
+import os
+import sys
+import asyncio
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "backend"))
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+
+import main, models, auth
+
+def seed(db):
+    """An admin and two users, and an empty principal cache; returns (admin principal, alice, bob)"""
+    admin = models.User(email="admin@example.com", hashed_password="x", full_name="Admin", is_admin=1)
+    alice = models.User(email="alice@example.com", hashed_password="x", full_name="Alice")
+    bob = models.User(email="bob@example.com", hashed_password="x", full_name="Bob")
+    db.add_all([admin, alice, bob])
+    db.commit()
+    auth.principal_cache.clear()
+    return auth.principal_from_user(admin), alice, bob
+
+def token_for(user, **claims):
+    return auth.create_access_token({"sub": user.email, "uid": user.id, **claims})
+
+def principal(db, token):
+    return asyncio.run(auth.get_current_principal(token, db=db))
+
+def count_queries(engine, call):
+    statements = []
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(engine, "before_cursor_execute", on_execute)
+    try:
+        result = call()
+    finally:
+        event.remove(engine, "before_cursor_execute", on_execute)
+    return result, len(statements)
+
+def assert_rejected(db, token):
+    try:
+        principal(db, token)
+    except HTTPException as e:
+        assert e.status_code == 401
+    else:
+        raise AssertionError("token was accepted")
+
+def test_cache_hit_runs_no_queries(engine, db):
+    admin, alice, bob = seed(db)
+    token = token_for(alice)
+    db.expire_all()
+    first, misses = count_queries(engine, lambda: principal(db, token))
+    second, hits = count_queries(engine, lambda: principal(db, token))
+    assert (first.id, first.email, first.is_admin) == (alice.id, "alice@example.com", 0)
+    assert second == first
+    assert (misses, hits) == (1, 0)
+
+    # Tokens issued before the uid claim resolve by email and share the entry
+    legacy, queries = count_queries(engine, lambda: principal(db, auth.create_access_token({"sub": alice.email})))
+    assert (legacy, queries) == (first, 0)
+
+def test_mismatched_uid_is_rejected(db):
+    admin, alice, bob = seed(db)
+    # Not cached yet: the uid's row belongs to someone else
+    assert_rejected(db, auth.create_access_token({"sub": alice.email, "uid": bob.id}))
+    assert_rejected(db, auth.create_access_token({"sub": alice.email, "uid": 999}))
+    # Cached: the entry for the subject is not reused for another uid
+    principal(db, token_for(alice))
+    assert_rejected(db, auth.create_access_token({"sub": alice.email, "uid": bob.id}))
+    assert principal(db, token_for(alice)).id == alice.id
+
+def test_role_change_evicts(db):
+    admin, alice, bob = seed(db)
+    token = token_for(alice)
+    assert principal(db, token).is_admin == 0
+    main.change_user_role(alice.id, True, current_admin=admin, db=db)
+    assert auth.principal_cache.get(alice.email) is None
+    assert principal(db, token).is_admin == 1
+
+def test_deletes_evict(db):
+    admin, alice, bob = seed(db)
+    alice_token, bob_token = token_for(alice), token_for(bob)
+    principal(db, alice_token)
+    principal(db, bob_token)
+
+    main.delete_user(alice.id, current_admin=admin, db=db)
+    assert auth.principal_cache.get("alice@example.com") is None
+    assert_rejected(db, alice_token)
+
+    main.delete_user_account(current_user=db.get(models.User, bob.id), db=db)
+    assert auth.principal_cache.get("bob@example.com") is None
+    assert_rejected(db, bob_token)
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
@@ -0,0 +1,124 @@
+"""
+Checks the materialized budget rollups (backend/budget.py).
+Creates, updates and deletes stops, activities and expenses through the
+routes and compares trip_budget_rollup / trip_budget_daily_rollup with totals
+recomputed from scratch after every step, and checks that trips without a
+rollup row are read live without writing one. Runs in-process against SQLite.
+Run with: python -m pytest test_budget_rollup.py
+"""
+
+import os
+import sys
+import datetime
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "backend"))
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+import main, models, schemas, budget
+
+START = datetime.datetime(2026, 6, 1)
+
+def seed(db):
+    """Adds one user and one empty trip; returns (principal, trip_id)"""
+    user = models.User(email="rollup@example.com", hashed_password="x", full_name="Rollup")
+    db.add(user)
+    db.commit()
+    principal = schemas.Principal(id=user.id, email=user.email, full_name=user.full_name)
+    trip = main.create_trip(schemas.TripCreate(
+        destination="Italy", title="Rome", start_date=START, end_date=START + datetime.timedelta(days=4),
+        status="upcoming", budget_limit=1000.0
+    ), current_user=principal, db=db)
+    return principal, trip.id
+
+def assert_rollup_matches(db, trip_id, step):
+    db.expire_all()
+    rollup = db.get(models.TripBudgetRollup, trip_id)
+    assert rollup is not None, f"{step}: rollup missing"
+    expected = budget.get_trip_category_totals(db, trip_id)
+    actual = budget.rollup_breakdown(rollup)
+    for category in budget.BUDGET_CATEGORIES:
+        assert abs(actual[category] - expected[category]) < 1e-6, f"{step}: {category} {actual[category]} != {expected[category]}"
+
+    daily = {
+        row.date: budget.rollup_breakdown(row)
+        for row in db.query(models.TripBudgetDailyRollup).filter(models.TripBudgetDailyRollup.trip_id == trip_id)
+    }
+    expected_daily = budget.get_trip_daily_totals(db, trip_id)
+    for day in set(daily) | set(expected_daily):
+        for category in budget.BUDGET_CATEGORIES:
+            got = daily.get(day, budget.empty_breakdown())[category]
+            want = expected_daily.get(day, budget.empty_breakdown())[category]
+            assert abs(got - want) < 1e-6, f"{step}: {day} {category} {got} != {want}"
+
+def expense(name, category, amount, day, **refs):
+    return schemas.ExpenseCreate(name=name, category=category, amount=amount, date=START + datetime.timedelta(days=day), **refs)
+
+def test_rollup_tracks_writes(db):
+    user, trip_id = seed(db)
+    assert_rollup_matches(db, trip_id, "created")
+    assert main.get_trip_budget(trip_id, current_user=user, db=db)["total_cost"] == 0.0
+
+    stop_in = schemas.StopCreate(city_name="Rome", arrival_date=START, departure_date=START, sort_order=1, accommodation_cost=300.0, transport_cost=80.0)
+    stop = main.add_stop(trip_id, stop_in, current_user=user, db=db)
+    other_stop = main.add_stop(trip_id, stop_in.model_copy(update={"city_name": "Florence", "accommodation_cost": 120.0}), current_user=user, db=db)
+    assert_rollup_matches(db, trip_id, "add stops")
+
+    activity = main.add_activity(stop.id, schemas.ActivityCreate(description="Colosseum tour", cost=45.0), current_user=user, db=db)
+    main.add_activity(other_stop.id, schemas.ActivityCreate(description="Uffizi", cost=25.0), current_user=user, db=db)
+    assert_rollup_matches(db, trip_id, "add activities")
+
+    dinner = main.create_expense(trip_id, expense("Dinner", "Food", 60.0, 0), current_user=user, db=db)
+    main.create_expense(trip_id, expense("Taxi", "transport", 20.0, 1, stop_id=stop.id), current_user=user, db=db)
+    main.create_expense(trip_id, expense("Tickets", "museum", 15.0, 1, activity_id=activity.id), current_user=user, db=db)
+    main.create_expense(trip_id, expense("Train", "transport", 35.0, 2, stop_id=other_stop.id), current_user=user, db=db)
+    assert_rollup_matches(db, trip_id, "create expenses")
+
+    main.update_expense(dinner.id, schemas.ExpenseUpdate(amount=75.0, category="other", date=START + datetime.timedelta(days=3)), current_user=user, db=db)
+    main.update_stop(stop.id, stop_in.model_copy(update={"accommodation_cost": 280.0, "transport_cost": 95.0}), current_user=user, db=db)
+    main.update_activity(activity.id, schemas.ActivityUpdate(description="Colosseum tour", cost=55.0), current_user=user, db=db)
+    assert_rollup_matches(db, trip_id, "updates")
+
+    main.delete_activity(activity.id, current_user=user, db=db)
+    assert_rollup_matches(db, trip_id, "delete activity with expense")
+    main.delete_expense(dinner.id, current_user=user, db=db)
+    assert_rollup_matches(db, trip_id, "delete expense")
+    main.delete_stop(other_stop.id, current_user=user, db=db)
+    assert_rollup_matches(db, trip_id, "delete stop with activity and expense")
+
+    summary = main.get_trip_budget(trip_id, current_user=user, db=db)
+    assert abs(summary["total_cost"] - (280.0 + 95.0 + 20.0)) < 1e-6
+
+def test_trip_without_rollup_is_read_live(engine_factory, tmp_path):
+    # A file database, so the second session below reads over its own connection
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine_factory(f"sqlite:///{tmp_path}/rollup.db"))
+    db = SessionLocal()
+    try:
+        user, trip_id = seed(db)
+        main.add_stop(trip_id, schemas.StopCreate(city_name="Rome", arrival_date=START, departure_date=START, accommodation_cost=300.0), current_user=user, db=db)
+        main.create_expense(trip_id, expense("Dinner", "food", 60.0, 0), current_user=user, db=db)
+        main.create_expense(trip_id, expense("Train", "transport", 35.0, 8), current_user=user, db=db)
+        summary = main.get_trip_budget(trip_id, current_user=user, db=db)
+        trend = main.get_daily_trend(trip_id, "week", current_user=user, db=db)
+
+        # A trip created before the rollup tables existed
+        db.query(models.TripBudgetDailyRollup).delete()
+        db.query(models.TripBudgetRollup).delete()
+        db.commit()
+        assert main.get_trip_budget(trip_id, current_user=user, db=db) == summary
+        assert main.get_daily_trend(trip_id, "week", current_user=user, db=db) == trend
+        assert summary["breakdown"]["stay"] == 300.0 and trend["days"][0]["total"] == 60.0
+    finally:
+        db.close()
+
+    # The reads wrote nothing
+    other = SessionLocal()
+    try:
+        assert other.query(models.TripBudgetRollup).count() == 0
+        assert other.query(models.TripBudgetDailyRollup).count() == 0
+    finally:
+        other.close()
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
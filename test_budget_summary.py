@@ -0,0 +1,85 @@
+"""
+Checks the values of GET /budget/{trip_id} (backend/budget.py).
+Category totals, remaining budget, daily figures and alerts for a small
+trip, compared with numbers worked out by hand. Runs the route in-process
+against an in-memory SQLite database.
+Run with: python -m pytest test_budget_summary.py
+"""
+
+import os
+import sys
+import datetime
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "backend"))
+
+import pytest
+from fastapi import HTTPException
+
+import main, models, schemas
+
+START = datetime.datetime(2026, 6, 1)
+
+def seed(db):
+    """Adds a 5-day trip (budget 1000) and a second user.
+    Totals: stay 500, transport 220, activities 100, food 60, other 25 (905 in all)"""
+    owner = models.User(email="budget@example.com", hashed_password="x", full_name="Budget")
+    other = models.User(email="other@example.com", hashed_password="x", full_name="Other")
+    db.add_all([owner, other])
+    db.flush()
+    trip = models.Trip(
+        destination="Italy", title="Italy", start_date=START, end_date=START + datetime.timedelta(days=4),
+        status="upcoming", budget_limit=1000.0, owner_id=owner.id
+    )
+    rome = models.Stop(city_name="Rome", arrival_date=START, departure_date=START, sort_order=1, accommodation_cost=300.0, transport_cost=40.0)
+    rome.activities = [models.Activity(description="Colosseum tour", cost=45.0), models.Activity(description="Vatican", cost=30.0)]
+    naples = models.Stop(city_name="Naples", arrival_date=START, departure_date=START, sort_order=2, accommodation_cost=200.0, transport_cost=0.0)
+    naples.activities = [models.Activity(description="Pompeii", cost=25.0)]
+    trip.stops = [rome, naples]
+    trip.expenses = [
+        models.Expense(name="Flight", category="Transport", amount=180.0, date=START),
+        models.Expense(name="Dinner", category="food", amount=35.0, date=START),
+        models.Expense(name="Lunch", category="FOOD", amount=25.0, date=START),
+        models.Expense(name="Postcards", category="souvenirs", amount=25.0, date=START),
+    ]
+    db.add(trip)
+    db.commit()
+    principal = lambda user: schemas.Principal(id=user.id, email=user.email, full_name=user.full_name)
+    return principal(owner), principal(other), trip.id
+
+def test_budget_summary_values(db):
+    user, other, trip_id = seed(db)
+    summary = main.get_trip_budget(trip_id, current_user=user, db=db)
+    assert summary["breakdown"] == {"transport": 220.0, "stay": 500.0, "food": 60.0, "activities": 100.0, "other": 25.0}
+    assert summary["budget_limit"] == 1000.0
+    assert summary["total_cost"] == 905.0
+    assert summary["remaining"] == 95.0
+    assert summary["utilization_percentage"] == 90.5
+    assert summary["daily_average"] == 181.0
+    assert summary["daily_target"] == 200.0
+    assert summary["currency"] == "USD"
+    # Each category is measured against 25% of the budget (250)
+    assert [(alert["type"], alert["category"], alert["percentage"]) for alert in summary["alerts"]] == [
+        ("warning", "transport", 88.0), ("danger", "stay", 200.0), ("danger", "overall", 90.5)
+    ]
+    assert summary["alerts"][1]["message"] == "Stay category is 200% full"
+    assert summary["alerts"][2]["message"] == "You've used 90% of your total budget"
+
+def test_budget_without_limit(db):
+    user, other, trip_id = seed(db)
+    db.get(models.Trip, trip_id).budget_limit = None
+    db.commit()
+    summary = main.get_trip_budget(trip_id, current_user=user, db=db)
+    assert (summary["budget_limit"], summary["remaining"], summary["utilization_percentage"]) == (0.0, -905.0, 0)
+    assert (summary["daily_average"], summary["daily_target"], summary["alerts"]) == (181.0, 0, [])
+
+def test_other_users_trip_is_not_found(db):
+    user, other, trip_id = seed(db)
+    try:
+        main.get_trip_budget(trip_id, current_user=other, db=db)
+    except HTTPException as e:
+        assert e.status_code == 404
+    else:
+        raise AssertionError("served another user's budget")
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
@@ -0,0 +1,99 @@
+"""
+Checks the values of GET /trips/{trip_id}/calendar (backend/timeline.py
+get_activity_counts / build_calendar_days).
+A trip from 2026-01-30 to 2026-02-02 is viewed one month at a time and as a
+month range, and the per-day activity counts and trip days are compared with
+the fixture. Runs the route in-process against an in-memory SQLite database.
+Run with: python -m pytest test_calendar.py
+"""
+
+import os
+import sys
+import datetime
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "backend"))
+
+import pytest
+from fastapi import HTTPException
+
+import main, models, schemas, timeline
+
+def seed(db):
+    """Adds the calendar trip and, for the same user, another trip on the same days"""
+    user = models.User(email="calendar@example.com", hashed_password="x", full_name="Calendar")
+    db.add(user)
+    db.flush()
+    at = lambda month, day, hour=0, minute=0: datetime.datetime(2026, month, day, hour, minute)
+    def stop(city, arrival, activity_count):
+        stop = models.Stop(city_name=city, arrival_date=arrival, departure_date=arrival, sort_order=1)
+        stop.activities = [models.Activity(description=f"{city} {n}") for n in range(activity_count)]
+        return stop
+
+    trip = models.Trip(destination="Alps", title="Alps", start_date=at(1, 30), end_date=at(2, 2), status="upcoming", owner_id=user.id)
+    trip.stops = [
+        stop("Zurich", at(1, 30, 9), 2),
+        stop("Lucerne", at(1, 31, 23, 30), 3),
+        stop("Bern", at(2, 1), 1),
+        stop("Geneva", at(2, 2, 12), 0),
+    ]
+    other = models.Trip(destination="Alps", title="Other", start_date=at(1, 31), end_date=at(1, 31), status="upcoming", owner_id=user.id)
+    other.stops = [stop("Basel", at(1, 31, 10), 4)]
+    db.add_all([trip, other])
+    db.commit()
+    return schemas.Principal(id=user.id, email=user.email, full_name=user.full_name), trip.id
+
+def calendar(db, user, trip_id, month=None, from_month=None, to_month=None):
+    return main.get_trip_calendar(trip_id, month, from_month, to_month, current_user=user, db=db)
+
+def counts(result):
+    return {day["date"]: day["activity_count"] for day in result["days"] if day["activity_count"]}
+
+def trip_days(result):
+    return [day["date"] for day in result["days"] if day["is_trip_day"]]
+
+def test_default_month_is_trip_start(db):
+    user, trip_id = seed(db)
+    result = calendar(db, user, trip_id)
+    assert (result["month"], result["months"], len(result["days"])) == ("2026-01", ["2026-01"], 31)
+    assert result["days"][0]["date"] == "2026-01-01" and result["days"][-1]["date"] == "2026-01-31"
+    assert counts(result) == {"2026-01-30": 2, "2026-01-31": 3}
+    assert trip_days(result) == ["2026-01-30", "2026-01-31"]
+    assert all(day["has_activities"] == (day["activity_count"] > 0) for day in result["days"])
+
+def test_single_month_after_boundary(db):
+    user, trip_id = seed(db)
+    result = calendar(db, user, trip_id, month="2026-02")
+    assert (result["month"], result["months"], len(result["days"])) == ("2026-02", ["2026-02"], 28)
+    assert counts(result) == {"2026-02-01": 1}
+    assert trip_days(result) == ["2026-02-01", "2026-02-02"]
+
+def test_month_range_across_boundary(db):
+    user, trip_id = seed(db)
+    result = calendar(db, user, trip_id, from_month="2025-12", to_month="2026-02")
+    assert (result["month"], result["months"], len(result["days"])) == ("2025-12", ["2025-12", "2026-01", "2026-02"], 31 + 31 + 28)
+    assert counts(result) == {"2026-01-30": 2, "2026-01-31": 3, "2026-02-01": 1}
+    assert trip_days(result) == ["2026-01-30", "2026-01-31", "2026-02-01", "2026-02-02"]
+    # Same counts as asking for each month separately
+    assert counts(result) == {**counts(calendar(db, user, trip_id, month="2026-01")), **counts(calendar(db, user, trip_id, month="2026-02"))}
+
+def test_invalid_month_ranges(db):
+    user, trip_id = seed(db)
+    invalid = [
+        {"month": "2026-13"},
+        {"month": "January"},
+        {"from_month": "2026-01"},
+        {"month": "2026-01", "from_month": "2026-01", "to_month": "2026-02"},
+        {"from_month": "2026-02", "to_month": "2026-01"},
+        {"from_month": "2026-01", "to_month": "2027-01"},
+    ]
+    for params in invalid:
+        try:
+            calendar(db, user, trip_id, **params)
+        except HTTPException as e:
+            assert e.status_code == 400, params
+        else:
+            raise AssertionError(f"calendar request was accepted: {params}")
+    assert len(calendar(db, user, trip_id, from_month="2026-01", to_month="2026-12")["months"]) == timeline.MAX_CALENDAR_MONTHS
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
@@ -0,0 +1,102 @@
+"""
+Checks the in-process city typeahead index (backend/city_index.py) and
+GET /cities/typeahead.
+Covers name and word-start prefixes, the country filter, popularity order,
+and reloading after City rows are committed (but not after a flush or a
+rollback). Runs in-process against an in-memory SQLite database.
+Run with: python -m pytest test_city_index.py
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "backend"))
+
+import pytest
+
+import main, models
+from city_index import CityIndex, city_index
+
+CITIES = [
+    # name, country, popularity
+    ("New York", "USA", 94),
+    ("New Delhi", "India", 80),
+    ("Newcastle", "UK", 40),
+    ("York", "UK", 55),
+    ("San Francisco", "USA", 85),
+    ("Santiago", "Chile", 70),
+    ("Santa Fe", "USA", None),
+    ("Sana'a", "Yemen", 70),
+]
+
+def seed(db):
+    """Adds the CITIES catalog; Santiago has one catalog activity"""
+    cities = [models.City(name=name, country=country, description="", cost_index=1.0, popularity=popularity) for name, country, popularity in CITIES]
+    cities[5].catalog_activities = [models.CatalogActivity(name="Cerro San Cristóbal", description="", cost=10.0, duration="2 hours", category="Nature")]
+    db.add_all(cities)
+    db.commit()
+
+def names(cities):
+    return [city["name"] for city in cities]
+
+def test_prefix_and_word_start(db):
+    seed(db)
+    index = CityIndex()
+    index.load(db)
+    assert names(index.search("new")) == ["New York", "New Delhi", "Newcastle"]
+    assert names(index.search("NEW Y")) == ["New York"]
+    # "york" matches the start of the second word of "New York" as well as "York"
+    assert names(index.search("york")) == ["New York", "York"]
+    assert names(index.search("delhi")) == ["New Delhi"]
+    assert names(index.search("ork")) == []
+    assert names(index.search("  fran ")) == ["San Francisco"]
+
+def test_country_filter(db):
+    seed(db)
+    index = CityIndex()
+    index.load(db)
+    assert names(index.search("new", country="uk")) == ["Newcastle"]
+    assert names(index.search("san", country="USA")) == ["San Francisco", "Santa Fe"]
+    assert names(index.search("", country="uk")) == ["York", "Newcastle"]
+
+def test_popularity_order_and_limit(db):
+    seed(db)
+    index = CityIndex()
+    index.load(db)
+    # Equal popularity keeps id order; no popularity sorts last
+    assert names(index.search("san")) == ["San Francisco", "Santiago", "Sana'a", "Santa Fe"]
+    assert names(index.search("san", limit=2)) == ["San Francisco", "Santiago"]
+    assert names(index.search("", limit=3)) == ["New York", "San Francisco", "New Delhi"]
+
+def test_typeahead_route(db):
+    seed(db)
+    city_index.load(db)
+    cities = main.city_typeahead("santi", "", 10, True, db=db)
+    assert [(city["name"], [activity.name for activity in city["catalog_activities"]]) for city in cities] == [("Santiago", ["Cerro San Cristóbal"])]
+    assert main.city_typeahead("santi", "", 10, False, db=db)[0]["catalog_activities"] == []
+
+def test_reload_after_city_commit(db):
+    seed(db)
+    city_index.load(db)
+    db.add(models.City(name="Newport", country="USA", description="", cost_index=1.0, popularity=60))
+    db.flush()
+    assert not city_index._stale  # flushed but not committed
+    db.rollback()
+    assert not city_index._stale
+
+    db.add(models.City(name="Newport", country="USA", description="", cost_index=1.0, popularity=60))
+    db.commit()
+    assert city_index._stale
+    assert names(main.city_typeahead("new", "", 10, False, db=db)) == ["New York", "New Delhi", "Newport", "Newcastle"]
+
+    york = db.query(models.City).filter(models.City.name == "York").one()
+    york.popularity = 99
+    db.commit()
+    assert names(main.city_typeahead("york", "", 10, False, db=db)) == ["York", "New York"]
+
+    db.delete(york)
+    db.commit()
+    assert names(main.city_typeahead("york", "", 10, False, db=db)) == ["New York"]
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
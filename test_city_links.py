@@ -0,0 +1,95 @@
+"""
+Checks the links from itinerary stops to the cities catalog (backend/city_links.py).
+Covers case-insensitive resolution, tie-breaking, the itinerary batch path
+and linking existing stops when a city is added or renamed later. Runs
+in-process against an in-memory SQLite database.
+Run with: python -m pytest test_city_links.py
+"""
+
+import os
+import sys
+import datetime
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "backend"))
+
+import pytest
+
+import main, models, schemas, city_links
+
+START = datetime.datetime(2026, 6, 1)
+
+def seed(db):
+    """Adds a small catalog (two cities named Paris) and one user with an empty trip"""
+    for name, country, popularity in (("Paris", "USA", None), ("Paris", "France", 95), ("Rome", "Italy", 92), ("Springfield", "USA", 10), ("Springfield", "USA", 10)):
+        db.add(models.City(name=name, country=country, description="", cost_index=1.0, popularity=popularity))
+    user = models.User(email="linker@example.com", hashed_password="x", full_name="Linker")
+    db.add(user)
+    db.flush()
+    trip = models.Trip(destination="Europe", title="Tour", start_date=START, end_date=START, status="upcoming", owner_id=user.id)
+    db.add(trip)
+    db.commit()
+    return schemas.Principal(id=user.id, email=user.email, full_name=user.full_name), trip.id
+
+def city_id(db, name, country):
+    return db.query(models.City.id).filter(models.City.name == name, models.City.country == country).order_by(models.City.id).first()[0]
+
+def stop_in(city_name, sort_order=1):
+    return schemas.StopCreate(city_name=city_name, arrival_date=START, departure_date=START, sort_order=sort_order)
+
+def test_resolution_is_case_insensitive(db):
+    user, trip_id = seed(db)
+    assert main.add_stop(trip_id, stop_in("  rOME "), current_user=user, db=db).city_id == city_id(db, "Rome", "Italy")
+    assert main.add_stop(trip_id, stop_in("Atlantis"), current_user=user, db=db).city_id is None
+
+    stop = main.add_stop(trip_id, stop_in("Atlantis", 2), current_user=user, db=db)
+    assert main.update_stop(stop.id, stop_in("ROME", 2), current_user=user, db=db).city_id == city_id(db, "Rome", "Italy")
+
+def test_ties_go_to_most_popular_then_lowest_id(db):
+    user, trip_id = seed(db)
+    assert city_links.resolve(db, ["paris", "Springfield", "Nowhere", ""]) == {
+        "paris": city_id(db, "Paris", "France"),
+        "springfield": city_id(db, "Springfield", "USA"),
+    }
+    assert main.add_stop(trip_id, stop_in("Paris"), current_user=user, db=db).city_id == city_id(db, "Paris", "France")
+
+def test_batch_links_created_and_renamed_stops(db):
+    user, trip_id = seed(db)
+    existing = main.add_stop(trip_id, stop_in("Atlantis"), current_user=user, db=db)
+    batch = schemas.ItineraryBatch(
+        create_stops=[
+            schemas.BatchStopCreate(city_name="PARIS", arrival_date=START, departure_date=START, sort_order=2),
+            schemas.BatchStopCreate(city_name="El Dorado", arrival_date=START, departure_date=START, sort_order=3),
+        ],
+        update_stops=[schemas.BatchStopUpdate(id=existing.id, city_name="rome", arrival_date=START, departure_date=START, sort_order=1)],
+    )
+    result = main.batch_update_itinerary(trip_id, batch, current_user=user, db=db)
+    db.expire_all()
+    links = {stop.id: stop.city_id for stop in db.query(models.Stop)}
+    assert links == {
+        existing.id: city_id(db, "Rome", "Italy"),
+        result["stops"][0]["id"]: city_id(db, "Paris", "France"),
+        result["stops"][1]["id"]: None,
+    }
+
+def test_new_city_links_existing_stops(db):
+    user, trip_id = seed(db)
+    lisbon_stop = main.add_stop(trip_id, stop_in("lisbon "), current_user=user, db=db)
+    rome_stop = main.add_stop(trip_id, stop_in("Rome", 2), current_user=user, db=db)
+    atlantis_stop = main.add_stop(trip_id, stop_in("Atlantis", 3), current_user=user, db=db)
+    assert lisbon_stop.city_id is None
+
+    lisbon = models.City(name="Lisbon", country="Portugal", description="", cost_index=0.9, popularity=80)
+    # Already linked stops keep their city
+    second_rome = models.City(name="Rome", country="USA", description="", cost_index=1.0, popularity=99)
+    db.add_all([lisbon, second_rome])
+    db.commit()
+    assert db.get(models.Stop, lisbon_stop.id).city_id == lisbon.id
+    assert db.get(models.Stop, rome_stop.id).city_id == city_id(db, "Rome", "Italy")
+
+    springfield = db.get(models.City, city_id(db, "Springfield", "USA"))
+    springfield.name = "Atlantis"
+    db.commit()
+    assert db.get(models.Stop, atlantis_stop.id).city_id == springfield.id
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
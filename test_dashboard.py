@@ -0,0 +1,108 @@
+"""
+Checks the per-user dashboard snapshots (backend/dashboard.py).
+Covers the snapshot contents, stale-while-revalidate scheduling,
+reclaiming a refresh whose background task never ran, and invalidations
+that land while a snapshot is being built. Runs in-process
+against an in-memory SQLite database.
+Run with: python -m pytest test_dashboard.py
+"""
+
+import os
+import sys
+import json
+import time
+import datetime
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "backend"))
+
+import pytest
+from fastapi import BackgroundTasks
+
+import main, models, schemas, database, dashboard
+from cache import TTLCache
+
+@pytest.fixture(autouse=True)
+def refresh_sessions(monkeypatch, session_factory):
+    # Background refreshes open their own session
+    monkeypatch.setattr(database, "SessionLocal", session_factory)
+
+def seed(db):
+    """Adds one user owning an upcoming and a past trip, and empty caches"""
+    user = models.User(email="home@example.com", hashed_password="x", full_name="Home Page")
+    db.add(user)
+    db.flush()
+    start = datetime.datetime(2026, 6, 1)
+    for title, status in (("Past", "past"), ("Next", "upcoming")):
+        trip = models.Trip(destination="Italy", title=title, start_date=start, end_date=start, status=status, owner_id=user.id)
+        trip.stops = [models.Stop(city_name="Rome", arrival_date=start, departure_date=start, sort_order=1)]
+        trip.stops[0].activities = [models.Activity(description="Walking tour", cost=10.0)]
+        db.add(trip)
+    db.commit()
+    dashboard.dashboard_cache.clear()
+    dashboard._refresh_claims.clear()
+    return schemas.Principal(id=user.id, email=user.email, full_name=user.full_name)
+
+def make_stale(user_id):
+    built_at, body = dashboard.dashboard_cache.get(user_id)
+    dashboard.dashboard_cache.set(user_id, (built_at - dashboard.DASHBOARD_FRESH_SECONDS - 1, body))
+
+def test_snapshot_contents(db):
+    user = seed(db)
+    data = json.loads(main.get_dashboard_info(BackgroundTasks(), current_user=user, db=db).body)
+    assert data["full_name"] == "Home Page"
+    assert data["upcoming_trip"]["title"] == "Next"
+    assert data["upcoming_trip"]["stops"][0]["activities"][0]["description"] == "Walking tour"
+    assert sorted(trip["title"] for trip in data["recent_trips"]) == ["Next", "Past"]
+    assert data["recommendations"] == dashboard.FEATURED_DESTINATIONS
+
+def test_stale_snapshot_refreshes_once(db):
+    user = seed(db)
+    dashboard.get_snapshot(db, user, BackgroundTasks())
+    make_stale(user.id)
+    first, second = BackgroundTasks(), BackgroundTasks()
+    dashboard.get_snapshot(db, user, first)
+    dashboard.get_snapshot(db, user, second)
+    assert len(first.tasks) == 1 and len(second.tasks) == 0
+
+    task = first.tasks[0]
+    task.func(*task.args, **task.kwargs)
+    built_at, _ = dashboard.dashboard_cache.get(user.id)
+    assert time.monotonic() - built_at < dashboard.DASHBOARD_FRESH_SECONDS
+    assert dashboard._refresh_claims.get(user.id) is None
+
+def test_unrun_refresh_can_be_reclaimed(db):
+    claims = dashboard._refresh_claims
+    dashboard._refresh_claims = TTLCache(maxsize=10, ttl=0.05)
+    user = seed(db)
+    try:
+        dashboard.get_snapshot(db, user, BackgroundTasks())
+        make_stale(user.id)
+        abandoned = BackgroundTasks()
+        dashboard.get_snapshot(db, user, abandoned)
+        assert len(abandoned.tasks) == 1  # never run, as if the client disconnected
+
+        time.sleep(0.06)
+        retry = BackgroundTasks()
+        dashboard.get_snapshot(db, user, retry)
+        assert len(retry.tasks) == 1
+    finally:
+        dashboard._refresh_claims = claims
+
+def test_write_during_build_is_not_cached(db):
+    user = seed(db)
+    build = dashboard.build_snapshot
+    def build_then_write(db, user):
+        body = build(db, user)
+        # A trip write commits and invalidates before this request stores its snapshot
+        dashboard.invalidate(user.id)
+        return body
+    dashboard.build_snapshot = build_then_write
+    try:
+        body = dashboard.get_snapshot(db, user, BackgroundTasks())
+        assert json.loads(body)["full_name"] == "Home Page"
+        assert dashboard.dashboard_cache.get(user.id) is None
+    finally:
+        dashboard.build_snapshot = build
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
@@ -0,0 +1,98 @@
+"""
+Checks expense export/import (backend/expense_io.py).
+Exports a trip's expenses as CSV and NDJSON, imports them back and compares
+the rows, and checks that malformed uploads are reported per row instead of
+failing the request. Runs in-process against an in-memory SQLite database.
+Run with: python -m pytest test_expense_io.py
+"""
+
+import os
+import sys
+import io
+import datetime
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "backend"))
+
+import pytest
+from fastapi import UploadFile
+
+import main, models, database, expense_io
+
+COMPARED_FIELDS = ["name", "category", "amount", "currency", "date", "notes", "stop_id", "activity_id"]
+
+@pytest.fixture(autouse=True)
+def export_sessions(monkeypatch, session_factory):
+    # stream_expenses opens its own session
+    monkeypatch.setattr(database, "SessionLocal", session_factory)
+
+def seed(db):
+    """Adds one trip holding a stop, an activity and 5 expenses; returns (user, trip_id)"""
+    user = models.User(email="io@example.com", hashed_password="x", full_name="Expense IO")
+    db.add(user)
+    db.flush()
+    start = datetime.datetime(2026, 6, 1)
+    trip = models.Trip(destination="Italy", title="Rome", start_date=start, end_date=start, status="upcoming", owner_id=user.id)
+    stop = models.Stop(city_name="Rome", arrival_date=start, departure_date=start, sort_order=1)
+    stop.activities = [models.Activity(description="Colosseum tour", cost=30.0)]
+    trip.stops = [stop]
+    db.add(trip)
+    db.flush()
+    for e in range(5):
+        db.add(models.Expense(
+            trip_id=trip.id, name=f"Expense, \"{e}\"", category=["food", "transport"][e % 2], amount=10.5 * e,
+            currency="EUR", date=start + datetime.timedelta(hours=e), notes=None if e % 2 else f"line one\nline {e}",
+            stop_id=stop.id if e > 1 else None, activity_id=stop.activities[0].id if e == 4 else None
+        ))
+    db.commit()
+    return user, trip.id
+
+def expense_values(db, trip_id):
+    expenses = db.query(models.Expense).filter(models.Expense.trip_id == trip_id).order_by(models.Expense.id)
+    return [tuple(getattr(expense, field) for field in COMPARED_FIELDS) for expense in expenses]
+
+def import_file(db, user, trip_id, filename, content: bytes):
+    upload = UploadFile(file=io.BytesIO(content), filename=filename)
+    return main.import_trip_expenses(trip_id, upload, None, current_user=user, db=db)
+
+@pytest.mark.parametrize("export_format", expense_io.EXPORT_FORMATS)
+def test_export_import_round_trip(db, export_format):
+    user, trip_id = seed(db)
+    original = expense_values(db, trip_id)
+    exported = "".join(expense_io.stream_expenses(trip_id, export_format, chunk_size=2)).encode()
+
+    result = import_file(db, user, trip_id, f"expenses.{export_format}", exported)
+    assert result == {"imported": 5, "failed": 0, "errors": []}, result
+    assert expense_values(db, trip_id) == original + original
+
+def test_malformed_csv_rows_are_reported(db):
+    user, trip_id = seed(db)
+    content = (
+        "name,category,amount,date\n"
+        "Pasta,food,12,2026-06-01T12:00:00\n"
+        f"Huge,food,1,{'x' * 200000}\n"
+        "Train,transport,not-a-number,2026-06-02T08:00:00\n"
+        "Gelato,food,4,2026-06-02T15:00:00\n"
+    ).encode()
+    result = import_file(db, user, trip_id, "expenses.csv", content)
+    assert result["imported"] == 2
+    assert result["failed"] == 2
+    assert [error["row"] for error in result["errors"]] == [2, 3]
+    assert result["errors"][0]["error"].startswith("Invalid CSV")
+
+def test_malformed_csv_header_is_reported(db):
+    user, trip_id = seed(db)
+    content = ("name," + "x" * 200000 + "\nPasta,food\n").encode()
+    result = import_file(db, user, trip_id, "expenses.csv", content)
+    assert result["imported"] == 0
+    assert result["errors"][0]["row"] == 0
+    assert result["errors"][0]["error"].startswith("Invalid CSV header")
+
+def test_malformed_ndjson_rows_are_reported(db):
+    user, trip_id = seed(db)
+    content = b'{"name": "Pasta", "category": "food", "amount": 12, "date": "2026-06-01T12:00:00"}\n{not json\n[1, 2]\n'
+    result = import_file(db, user, trip_id, "expenses.ndjson", content)
+    assert result["imported"] == 1
+    assert [error["row"] for error in result["errors"]] == [2, 3]
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
@@ -0,0 +1,128 @@
+"""
+Checks POST /trips/{trip_id}/itinerary:batch (backend/itinerary.py).
+Covers ref mapping for new stops, result order, appended activity ranks,
+updates and deletes in the same batch, and rejected batches. Runs the route
+in-process against an in-memory SQLite database.
+Run with: python -m pytest test_itinerary_batch.py
+"""
+
+import os
+import sys
+import datetime
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "backend"))
+
+import pytest
+from fastapi import HTTPException
+
+import main, models, schemas, ordering
+
+START = datetime.datetime(2026, 6, 1)
+
+def seed(db):
+    """Adds one trip holding stop "Rome" (activities "Forum", "Pantheon") and stop "Naples" (activity "Pizza")"""
+    user = models.User(email="batch@example.com", hashed_password="x", full_name="Batch")
+    db.add(user)
+    db.flush()
+    trip = models.Trip(destination="Italy", title="Italy", start_date=START, end_date=START, status="upcoming", owner_id=user.id)
+    rome = models.Stop(city_name="Rome", arrival_date=START, departure_date=START, sort_order=ordering.RANK_STEP)
+    rome.activities = [
+        models.Activity(description="Forum", cost=16.0, sort_order=ordering.RANK_STEP),
+        models.Activity(description="Pantheon", cost=5.0, sort_order=2 * ordering.RANK_STEP),
+    ]
+    naples = models.Stop(city_name="Naples", arrival_date=START, departure_date=START, sort_order=2 * ordering.RANK_STEP)
+    naples.activities = [models.Activity(description="Pizza", cost=12.0, sort_order=ordering.RANK_STEP)]
+    trip.stops = [rome, naples]
+    db.add(trip)
+    db.commit()
+    return schemas.Principal(id=user.id, email=user.email, full_name=user.full_name), trip
+
+def new_stop(city_name, sort_order, ref=None, activities=()):
+    return schemas.BatchStopCreate(
+        city_name=city_name, arrival_date=START, departure_date=START, sort_order=sort_order, ref=ref,
+        activities=[schemas.ActivityCreate(description=description) for description in activities]
+    )
+
+def activity_descriptions(db, stop_id):
+    return [
+        activity.description
+        for activity in db.query(models.Activity).filter(models.Activity.stop_id == stop_id).order_by(models.Activity.sort_order)
+    ]
+
+def run_batch(db, user, trip_id, **batch):
+    result = main.batch_update_itinerary(trip_id, schemas.ItineraryBatch(**batch), current_user=user, db=db)
+    db.expire_all()
+    return result
+
+def test_refs_map_to_created_stops_in_order(db):
+    user, trip = seed(db)
+    rome_id = trip.stops[0].id
+    result = run_batch(
+        db, user, trip.id,
+        create_stops=[
+            new_stop("Florence", 3 * ordering.RANK_STEP, ref="florence", activities=["Uffizi", "Duomo"]),
+            new_stop("Venice", 4 * ordering.RANK_STEP),
+            new_stop("Milan", 5 * ordering.RANK_STEP, ref="milan", activities=["Last Supper"]),
+        ],
+        create_activities=[
+            schemas.BatchActivityCreate(description="Gondola", stop_ref="milan"),
+            schemas.BatchActivityCreate(description="Trastevere", stop_id=rome_id),
+            schemas.BatchActivityCreate(description="Boboli", stop_ref="florence"),
+        ],
+    )
+    stops = result["stops"]
+    assert [stop["ref"] for stop in stops] == ["florence", None, "milan"]
+    assert [db.get(models.Stop, stop["id"]).city_name for stop in stops] == ["Florence", "Venice", "Milan"]
+    assert [db.get(models.Activity, activity_id).description for activity_id in stops[0]["activity_ids"]] == ["Uffizi", "Duomo"]
+    assert stops[1]["activity_ids"] == []
+
+    # create_activities results keep request order and land on the mapped stops
+    created = [db.get(models.Activity, activity_id) for activity_id in result["activity_ids"]]
+    assert [(activity.description, activity.stop_id) for activity in created] == [
+        ("Gondola", stops[2]["id"]), ("Trastevere", rome_id), ("Boboli", stops[0]["id"])
+    ]
+    # New activities are appended after the stop's existing ones
+    assert activity_descriptions(db, rome_id) == ["Forum", "Pantheon", "Trastevere"]
+    assert activity_descriptions(db, stops[0]["id"]) == ["Uffizi", "Duomo", "Boboli"]
+    assert activity_descriptions(db, stops[2]["id"]) == ["Last Supper", "Gondola"]
+
+def test_updates_and_deletes(db):
+    user, trip = seed(db)
+    rome, naples = trip.stops
+    forum, pantheon = rome.activities
+    run_batch(
+        db, user, trip.id,
+        update_stops=[schemas.BatchStopUpdate(id=rome.id, city_name="Roma", arrival_date=START, departure_date=START, sort_order=rome.sort_order, accommodation_cost=200.0)],
+        delete_stops=[naples.id],
+        update_activities=[schemas.BatchActivityUpdate(id=pantheon.id, description="Pantheon at night", cost=7.5)],
+        delete_activities=[forum.id],
+    )
+    stops = db.query(models.Stop).filter(models.Stop.trip_id == trip.id).all()
+    assert [(stop.city_name, stop.accommodation_cost) for stop in stops] == [("Roma", 200.0)]
+    assert [(activity.description, activity.cost) for activity in stops[0].activities] == [("Pantheon at night", 7.5)]
+    assert db.query(models.Activity).count() == 1
+
+def test_invalid_batches_are_rejected_without_writes(db):
+    user, trip = seed(db)
+    rome, naples = trip.stops
+    invalid = [
+        (404, {"delete_stops": [999]}),
+        (404, {"delete_activities": [999]}),
+        (400, {"create_stops": [new_stop("A", 3.0, ref="x"), new_stop("B", 4.0, ref="x")]}),
+        (400, {"create_activities": [schemas.BatchActivityCreate(description="Nowhere")]}),
+        (400, {"create_activities": [schemas.BatchActivityCreate(description="Lost", stop_ref="missing")]}),
+        (400, {"delete_stops": [naples.id], "create_activities": [schemas.BatchActivityCreate(description="Gone", stop_id=naples.id)]}),
+    ]
+    for status_code, batch in invalid:
+        try:
+            run_batch(db, user, trip.id, **batch)
+        except HTTPException as e:
+            assert e.status_code == status_code, batch
+        else:
+            raise AssertionError(f"batch was accepted: {batch}")
+        db.rollback()
+    assert db.query(models.Stop).count() == 2
+    assert db.query(models.Activity).count() == 3
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
@@ -0,0 +1,169 @@
+"""
+Checks stop and activity ordering (backend/ordering.py).
+Covers full reorders applied with one UPDATE and the permutation check,
+and single moves, including neighbours running out of room between their
+keys, which rebalances the parent.
+Runs the routes in-process against an in-memory SQLite database.
+Run with: python -m pytest test_ordering.py
+"""
+
+import os
+import sys
+import math
+import datetime
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "backend"))
+
+import pytest
+from fastapi import HTTPException
+
+import main, models, schemas, ordering
+
+START = datetime.datetime(2026, 6, 1)
+CITIES = ["Rome", "Florence", "Venice", "Milan"]
+
+def seed(db):
+    """Adds one trip of 4 stops (CITIES, in order); the first stop has activities A-D"""
+    user = models.User(email="order@example.com", hashed_password="x", full_name="Order")
+    db.add(user)
+    db.flush()
+    trip = models.Trip(destination="Italy", title="Italy", start_date=START, end_date=START, status="upcoming", owner_id=user.id)
+    trip.stops = [
+        models.Stop(city_name=city, arrival_date=START, departure_date=START, sort_order=(index + 1) * ordering.RANK_STEP)
+        for index, city in enumerate(CITIES)
+    ]
+    trip.stops[0].activities = [
+        models.Activity(description=name, sort_order=(index + 1) * ordering.RANK_STEP) for index, name in enumerate("ABCD")
+    ]
+    db.add(trip)
+    db.commit()
+    return schemas.Principal(id=user.id, email=user.email, full_name=user.full_name), trip.id
+
+def stop_ids(db, trip_id):
+    return {stop.city_name: stop.id for stop in db.query(models.Stop).filter(models.Stop.trip_id == trip_id)}
+
+def city_order(db, trip_id):
+    db.expire_all()
+    return [stop.city_name for stop in db.query(models.Stop).filter(models.Stop.trip_id == trip_id).order_by(models.Stop.sort_order, models.Stop.id)]
+
+def activity_order(db, stop_id):
+    db.expire_all()
+    return [activity.description for activity in db.query(models.Activity).filter(models.Activity.stop_id == stop_id).order_by(models.Activity.sort_order, models.Activity.id)]
+
+def test_reorder_stops(db):
+    user, trip_id = seed(db)
+    ids = stop_ids(db, trip_id)
+    order = ["Milan", "Rome", "Venice", "Florence"]
+    main.reorder_stops(trip_id, schemas.StopReorder(stop_ids=[ids[city] for city in order]), current_user=user, db=db)
+    assert city_order(db, trip_id) == order
+    keys = [stop.sort_order for stop in db.query(models.Stop).order_by(models.Stop.sort_order)]
+    assert keys == [(index + 1) * ordering.RANK_STEP for index in range(len(CITIES))]
+
+def test_reorder_activities(db):
+    user, trip_id = seed(db)
+    rome_id = stop_ids(db, trip_id)["Rome"]
+    ids = {activity.description: activity.id for activity in db.query(models.Activity)}
+    main.reorder_activities(rome_id, schemas.ActivityReorder(activity_ids=[ids[name] for name in "DBCA"]), current_user=user, db=db)
+    assert activity_order(db, rome_id) == list("DBCA")
+
+def test_reorder_must_be_a_permutation(db):
+    user, trip_id = seed(db)
+    ids = list(stop_ids(db, trip_id).values())
+    for invalid in (ids[:-1], ids + [ids[0]], ids[:-1] + [999]):
+        try:
+            main.reorder_stops(trip_id, schemas.StopReorder(stop_ids=invalid), current_user=user, db=db)
+        except HTTPException as e:
+            assert e.status_code == 400
+        else:
+            raise AssertionError(f"reorder was accepted: {invalid}")
+    assert city_order(db, trip_id) == CITIES
+
+def move_stop(db, user, stop_id, after_id=None):
+    return main.move_stop(stop_id, schemas.ItemMove(after_id=after_id), current_user=user, db=db)["sort_order"]
+
+def test_move_stop(db):
+    user, trip_id = seed(db)
+    ids = stop_ids(db, trip_id)
+    assert move_stop(db, user, ids["Milan"], ids["Rome"]) == 1.5 * ordering.RANK_STEP
+    assert city_order(db, trip_id) == ["Rome", "Milan", "Florence", "Venice"]
+    assert move_stop(db, user, ids["Venice"]) == 0.0
+    assert city_order(db, trip_id) == ["Venice", "Rome", "Milan", "Florence"]
+    assert move_stop(db, user, ids["Rome"], ids["Florence"]) == 3 * ordering.RANK_STEP
+    assert city_order(db, trip_id) == ["Venice", "Milan", "Florence", "Rome"]
+    # Only the moved row is written
+    assert db.get(models.Stop, ids["Florence"]).sort_order == 2 * ordering.RANK_STEP
+
+    try:
+        move_stop(db, user, ids["Rome"], 999)
+    except HTTPException as e:
+        assert e.status_code == 404
+    else:
+        raise AssertionError("move after an unknown stop was accepted")
+
+def test_move_activity(db):
+    user, trip_id = seed(db)
+    rome_id = stop_ids(db, trip_id)["Rome"]
+    ids = {activity.description: activity.id for activity in db.query(models.Activity)}
+    main.move_activity(ids["A"], schemas.ItemMove(after_id=ids["C"]), current_user=user, db=db)
+    main.move_activity(ids["D"], schemas.ItemMove(), current_user=user, db=db)
+    assert activity_order(db, rome_id) == list("DBCA")
+
+def test_exhausted_midpoint_rebalances(db):
+    user, trip_id = seed(db)
+    rebalance = ordering.rebalance
+    rebalanced = []
+    def counting_rebalance(*args):
+        rebalanced.append(args[3])
+        return rebalance(*args)
+    ordering.rebalance = counting_rebalance
+    try:
+        ids = stop_ids(db, trip_id)
+        # Keep inserting right after Rome: each move halves the gap until it runs out
+        order = list(CITIES)
+        for move in range(60):
+            city = order[-1]
+            move_stop(db, user, ids[city], ids["Rome"])
+            order.remove(city)
+            order.insert(1, city)
+            assert city_order(db, trip_id) == order, move
+        assert rebalanced == [trip_id]
+        keys = [stop.sort_order for stop in db.query(models.Stop).order_by(models.Stop.sort_order)]
+        assert all(later - earlier >= 1.0 for earlier, later in zip(keys, keys[1:]))
+    finally:
+        ordering.rebalance = rebalance
+
+def test_adjacent_and_tied_keys_rebalance(db):
+    user, trip_id = seed(db)
+    ids = stop_ids(db, trip_id)
+    rome, florence = db.get(models.Stop, ids["Rome"]), db.get(models.Stop, ids["Florence"])
+    florence.sort_order = math.nextafter(rome.sort_order, math.inf)
+    db.commit()
+    sort_order = move_stop(db, user, ids["Milan"], ids["Rome"])
+    assert city_order(db, trip_id) == ["Rome", "Milan", "Florence", "Venice"]
+    assert sort_order == 1.5 * ordering.RANK_STEP
+    assert db.get(models.Stop, ids["Florence"]).sort_order == 2 * ordering.RANK_STEP
+
+    # Tied keys fall back to id order, and a move between them rebalances too
+    for city in ("Florence", "Venice"):
+        db.get(models.Stop, ids[city]).sort_order = 5 * ordering.RANK_STEP
+    db.commit()
+    move_stop(db, user, ids["Rome"], ids["Florence"])
+    assert city_order(db, trip_id) == ["Milan", "Florence", "Rome", "Venice"]
+
+def test_new_stops_are_appended_after_reorder(db):
+    user, trip_id = seed(db)
+    ids = stop_ids(db, trip_id)
+    order = ["Milan", "Rome", "Venice", "Florence"]
+    main.reorder_stops(trip_id, schemas.StopReorder(stop_ids=[ids[city] for city in order]), current_user=user, db=db)
+    # The client's sort_order (the builder sends 99) is ignored; the stop goes last
+    main.add_stop(trip_id, schemas.StopCreate(city_name="Naples", arrival_date=START, departure_date=START, sort_order=99), current_user=user, db=db)
+    assert city_order(db, trip_id) == order + ["Naples"]
+
+    main.batch_update_itinerary(trip_id, schemas.ItineraryBatch(create_stops=[
+        schemas.BatchStopCreate(ref="a", city_name="Bari", arrival_date=START, departure_date=START, sort_order=1),
+        schemas.BatchStopCreate(ref="b", city_name="Lecce", arrival_date=START, departure_date=START),
+    ]), current_user=user, db=db)
+    assert city_order(db, trip_id) == order + ["Naples", "Bari", "Lecce"]
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
@@ -0,0 +1,100 @@
+"""
+Checks the public itinerary response cache (backend/public_trips.py).
+Covers invalidation on writes, a write racing a cache fill, unsharing and
+the bound on both cache maps. Runs in-process against in-memory SQLite.
+Run with: python -m pytest test_public_trips.py
+"""
+
+import os
+import sys
+import json
+import datetime
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "backend"))
+
+import pytest
+from fastapi import HTTPException
+
+import main, models, schemas, public_trips
+from cache import TTLCache
+
+def seed(db, trip_count=1):
+    """Adds trip_count shared trips (tokens token-0, token-1, ...) and clears the caches"""
+    user = models.User(email="sharer@example.com", hashed_password="x", full_name="Sharer")
+    db.add(user)
+    db.flush()
+    start = datetime.datetime(2026, 6, 1)
+    for t in range(trip_count):
+        trip = models.Trip(
+            destination="Italy", title=f"Trip {t}", start_date=start, end_date=start, status="upcoming",
+            owner_id=user.id, is_public=1, share_token=f"token-{t}"
+        )
+        trip.stops = [models.Stop(city_name="Rome", arrival_date=start, departure_date=start, sort_order=1)]
+        db.add(trip)
+    db.commit()
+    public_trips.public_trip_cache.clear()
+    public_trips.trip_ids_by_token.clear()
+    principal = schemas.Principal(id=user.id, email=user.email, full_name=user.full_name)
+    return principal
+
+def public_title(db, token):
+    return json.loads(main.get_public_trip(token, None, db=db).body)["title"]
+
+def rename(db, user, trip_id, title):
+    trip = db.get(models.Trip, trip_id)
+    update = schemas.TripCreate(
+        destination=trip.destination, title=title, start_date=trip.start_date, end_date=trip.end_date, status=trip.status
+    )
+    main.update_trip(trip_id, update, current_user=user, db=db)
+
+def test_write_invalidates_cached_view(db):
+    user = seed(db)
+    assert public_title(db, "token-0") == "Trip 0"
+    assert public_trips.get("token-0") is not None
+    rename(db, user, 1, "Renamed")
+    assert public_trips.get("token-0") is None
+    assert public_title(db, "token-0") == "Renamed"
+
+def test_write_during_fill_is_not_cached(db):
+    user = seed(db)
+    render = public_trips.render
+    def render_then_write(trip):
+        entry = render(trip)
+        # Another request commits a change and invalidates before this one stores
+        public_trips.invalidate_trip(trip.id)
+        return entry
+    public_trips.render = render_then_write
+    try:
+        assert public_title(db, "token-0") == "Trip 0"
+        assert public_trips.get("token-0") is None
+    finally:
+        public_trips.render = render
+
+def test_unshared_token_is_not_served(db):
+    user = seed(db)
+    public_title(db, "token-0")
+    main.unshare_trip(1, current_user=user, db=db)
+    try:
+        main.get_public_trip("token-0", None, db=db)
+    except HTTPException as e:
+        assert e.status_code == 404
+    else:
+        raise AssertionError("unshared trip was served")
+
+def test_cache_maps_are_bounded(db):
+    cache, tokens = public_trips.public_trip_cache, public_trips.trip_ids_by_token
+    public_trips.public_trip_cache = TTLCache(maxsize=3, ttl=60)
+    public_trips.trip_ids_by_token = TTLCache(maxsize=3, ttl=60)
+    user = seed(db, trip_count=6)
+    try:
+        for t in range(6):
+            public_title(db, f"token-{t}")
+        assert len(public_trips.public_trip_cache) == 3
+        assert len(public_trips.trip_ids_by_token) == 3
+        assert public_trips.get("token-5") is not None
+        assert public_trips.get("token-0") is None
+    finally:
+        public_trips.public_trip_cache, public_trips.trip_ids_by_token = cache, tokens
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
@@ -0,0 +1,154 @@
+"""
+Query-count checks for routes that serialize the full trip graph.
+Runs the route functions in-process against an in-memory SQLite database
+(no server needed) and asserts the number of SQL statements does not grow
+with the number of trips, stops or activities.
+"""
+
+import os
+import sys
+import datetime
+from typing import List
+sys.path.append(os.path.join(os.path.dirname(__file__), "backend"))
+
+import pytest
+from fastapi import BackgroundTasks, Response
+from pydantic import TypeAdapter
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+import main, models, schemas, public_trips, dashboard, admin_stats
+
+class QueryCounter:
+    """Counts statements executed on an engine while active"""
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+def seed(db, trip_count, stops_per_trip=3, activities_per_stop=2):
+    """Seed the database and return (user, first trip)"""
+    user = models.User(email="counter@example.com", hashed_password="x", full_name="Query Counter")
+    db.add(user)
+    db.flush()
+    start = datetime.datetime(2026, 6, 1)
+    for t in range(trip_count):
+        trip = models.Trip(
+            destination="Europe", title=f"Trip {t}", start_date=start, end_date=start + datetime.timedelta(days=10),
+            status="upcoming", owner_id=user.id, is_public=1, share_token=f"token-{t}"
+        )
+        for s in range(stops_per_trip):
+            stop = models.Stop(
+                city_name=f"City {s}", arrival_date=start + datetime.timedelta(days=s),
+                departure_date=start + datetime.timedelta(days=s + 1), sort_order=s
+            )
+            stop.activities = [models.Activity(description=f"Activity {a}", cost=10.0) for a in range(activities_per_stop)]
+            trip.stops.append(stop)
+        db.add(trip)
+    db.commit()
+
+    # Clear the identity map so nothing is served from it
+    db.expunge_all()
+    user = db.query(models.User).first()
+    trip = db.query(models.Trip).order_by(models.Trip.id).first()
+    db.expunge(trip)
+    return user, trip
+
+def count_queries(engine_factory, trip_count, call):
+    engine = engine_factory()
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        user, trip = seed(db, trip_count)
+        with QueryCounter(engine) as counter:
+            call(db, user, trip)
+        return counter.count
+    finally:
+        db.close()
+
+def serialize_trips(db, user, trip):
+    TypeAdapter(List[schemas.Trip]).validate_python(main.get_user_trips(Response(), current_user=user, db=db), from_attributes=True)
+
+def serialize_trip_summaries(db, user, trip):
+    trips = main.get_user_trips(Response(), limit=10, fields="summary", current_user=user, db=db)
+    TypeAdapter(List[schemas.TripSummary]).validate_python(trips, from_attributes=True)
+
+def serialize_trip(db, user, trip):
+    schemas.Trip.model_validate(main.get_trip(trip.id, current_user=user, db=db))
+
+def serialize_dashboard(db, user, trip):
+    dashboard.dashboard_cache.clear()
+    schemas.DashboardData.model_validate_json(main.get_dashboard_info(BackgroundTasks(), current_user=user, db=db).body)
+
+def serialize_public_trip(db, user, trip):
+    public_trips.public_trip_cache.clear()
+    schemas.TripPublic.model_validate_json(main.get_public_trip(trip.share_token, None, db=db).body)
+
+def assert_constant(engine_factory, call, max_queries):
+    small = count_queries(engine_factory, 2, call)
+    large = count_queries(engine_factory, 20, call)
+    assert small == large, f"{call.__name__}: {small} queries for 2 trips, {large} for 20"
+    assert large <= max_queries, f"{call.__name__}: {large} queries (expected at most {max_queries})"
+
+def test_user_trips_query_count(engine_factory):
+    assert_constant(engine_factory, serialize_trips, 3)
+
+def test_trip_summary_page_query_count(engine_factory):
+    assert_constant(engine_factory, serialize_trip_summaries, 1)
+
+def test_trip_detail_query_count(engine_factory):
+    assert_constant(engine_factory, serialize_trip, 3)
+
+def test_dashboard_query_count(engine_factory):
+    # 6 for the trips + recommendations lookup and its popular-cities fallback
+    assert_constant(engine_factory, serialize_dashboard, 8)
+
+def test_public_trip_query_count(engine_factory):
+    # 3 for the trip graph + the token -> trip id lookup that guards the cache fill
+    assert_constant(engine_factory, serialize_public_trip, 4)
+
+def test_cached_public_trip_query_count(engine, db):
+    user, trip = seed(db, 2)
+    public_trips.public_trip_cache.clear()
+    first = main.get_public_trip(trip.share_token, None, db=db)
+    with QueryCounter(engine) as counter:
+        second = main.get_public_trip(trip.share_token, None, db=db)
+        not_modified = main.get_public_trip(trip.share_token, first.headers["etag"], db=db)
+    assert counter.count == 0, f"cached public trip ran {counter.count} queries"
+    assert second.body == first.body
+    assert not_modified.status_code == 304
+
+def test_cached_dashboard_query_count(engine, db):
+    user, trip = seed(db, 2)
+    dashboard.dashboard_cache.clear()
+    first = main.get_dashboard_info(BackgroundTasks(), current_user=user, db=db)
+    with QueryCounter(engine) as counter:
+        second = main.get_dashboard_info(BackgroundTasks(), current_user=user, db=db)
+    assert counter.count == 0, f"cached dashboard ran {counter.count} queries"
+    assert second.body == first.body
+
+def serialize_top_destinations(db, user, trip):
+    TypeAdapter(List[schemas.TopDestination]).validate_python(main.get_top_destinations(5, current_admin=user, db=db))
+
+def test_top_destinations_query_count(engine_factory):
+    assert_constant(engine_factory, serialize_top_destinations, 1)
+
+def test_growth_stats_query_count(engine, db):
+    user, trip = seed(db, 20)
+    admin_stats.rebuild_daily_counters(db)
+    db.commit()
+    with QueryCounter(engine) as counter:
+        growth = main.get_growth_stats("weekly", "trips", current_admin=user, db=db)
+    assert counter.count == 1, f"growth stats ran {counter.count} queries"
+    assert sum(row["count"] for row in growth) == 20
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
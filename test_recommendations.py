@@ -0,0 +1,121 @@
+"""
+Checks the precomputed destination recommendations (backend/recommendations.py).
+Runs rebuild() on a small catalog and compares what for_user() returns for
+users with and without history, and checks the block-wise neighbour table
+against the full cities x cities similarity. Runs in-process against
+in-memory SQLite.
+Run with: python -m pytest test_recommendations.py
+"""
+
+import os
+import sys
+import datetime
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "backend"))
+
+import pytest
+
+import models, recommendations
+
+CITIES = [
+    # name, country, cost_index, popularity
+    ("Paris", "France", 1.2, 95),
+    ("Lyon", "France", 1.0, 60),
+    ("Tokyo", "Japan", 1.3, 90),
+    ("Kyoto", "Japan", 1.3, 70),
+    ("Unranked", "Peru", 0.7, None),
+]
+
+def seed(db):
+    """Adds the CITIES catalog and three users:
+    a traveller who went to Paris and Lyon on one trip, a user who saved Tokyo, and a new user"""
+    cities = {}
+    for name, country, cost_index, popularity in CITIES:
+        cities[name] = models.City(name=name, country=country, description="", cost_index=cost_index, popularity=popularity)
+        db.add(cities[name])
+    users = {}
+    for name in ("traveller", "saver", "newcomer"):
+        users[name] = models.User(email=f"{name}@example.com", hashed_password="x", full_name=name.title())
+        db.add(users[name])
+    db.flush()
+
+    start = datetime.datetime(2026, 6, 1)
+    trip = models.Trip(destination="France", title="France", start_date=start, end_date=start, status="past", owner_id=users["traveller"].id)
+    trip.stops = [
+        models.Stop(city_name=name, city_id=cities[name].id, arrival_date=start, departure_date=start, sort_order=order)
+        for order, name in enumerate(("Paris", "Lyon"), start=1)
+    ]
+    db.add(trip)
+    db.add(models.SavedDestination(user_id=users["saver"].id, city_id=cities["Tokyo"].id))
+    db.commit()
+    return {name: user.id for name, user in users.items()}
+
+def recommended(db, user_id, limit=recommendations.DASHBOARD_RECOMMENDATIONS):
+    return [item["city"] for item in recommendations.for_user(db, user_id, limit)]
+
+def test_rebuild_scores_users_with_history(db):
+    users = seed(db)
+    assert recommendations.rebuild(db) == 3
+    saver = recommended(db, users["saver"])
+    # Closest catalog match first, never the city the user already saved
+    assert saver[0] == "Kyoto"
+    assert "Tokyo" not in saver
+    traveller = recommended(db, users["traveller"], limit=len(CITIES))
+    assert sorted(traveller) == ["Kyoto", "Tokyo", "Unranked"]
+    # Only users with history get stored rows
+    assert db.query(models.UserRecommendation).filter(models.UserRecommendation.user_id == users["newcomer"]).count() == 0
+    assert recommendations.for_user(db, users["saver"], 1) == [
+        {"city": "Kyoto", "country": "Japan", "price_from": 650, "image_url": None}
+    ]
+
+def test_users_without_history_get_popular_cities(db):
+    users = seed(db)
+    recommendations.rebuild(db)
+    assert recommended(db, users["newcomer"]) == ["Paris", "Tokyo", "Kyoto", "Lyon"]
+    # A city with no popularity ranks last, not first
+    assert recommended(db, users["newcomer"], limit=len(CITIES))[-1] == "Unranked"
+
+def dense_similarity(cities, trip_city_indexes):
+    """Reference: the full cities x cities similarity the neighbour table is cut from"""
+    features, popularity = recommendations._city_features(np, cities)
+    similarity = recommendations.CONTENT_WEIGHT * (features @ features.T)
+    incidence = np.zeros((len(trip_city_indexes), len(cities)), dtype=np.float32)
+    for row, indexes in enumerate(trip_city_indexes):
+        incidence[row, list(indexes)] = 1.0
+    co_occurrence = incidence.T @ incidence
+    norms = np.sqrt(np.diag(co_occurrence)).copy()
+    norms[norms == 0] = 1.0
+    similarity += recommendations.CO_OCCURRENCE_WEIGHT * co_occurrence / np.outer(norms, norms)
+    return similarity
+
+def test_neighbour_table_matches_dense_similarity():
+    cities = [
+        models.City(name=f"City {n}", country=("France", "Japan", "Peru")[n % 3], cost_index=0.5 + n / 10, popularity=None if n == 7 else 10 * n)
+        for n in range(11)
+    ]
+    trips = [{0, 1, 2}, {1, 2}, {3, 4, 9}, {9, 10}, {5}]
+    similarity = dense_similarity(cities, trips)
+    np.fill_diagonal(similarity, -np.inf)
+
+    # Blocks of 4 rows (the last one short), 3 neighbours each
+    indexes, scores, popularity = recommendations.city_neighbours(np, cities, trips, neighbours=3, block_size=4)
+    assert indexes.shape == scores.shape == (len(cities), 3)
+    for row in range(len(cities)):
+        expected = np.sort(similarity[row])[::-1][:3]
+        assert np.allclose(np.sort(scores[row])[::-1], expected, atol=1e-5), row
+        assert np.allclose(similarity[row, indexes[row]], scores[row], atol=1e-5), row
+
+    # With every other city as a neighbour, scoring a user matches the full matrix
+    indexes, scores, popularity = recommendations.city_neighbours(np, cities, trips, block_size=4)
+    profile = {1: recommendations.SAVED_WEIGHT, 9: recommendations.VISITED_WEIGHT}
+    popular_order = np.lexsort((np.arange(len(cities)), -popularity))
+    ranked = recommendations.score_user(np, profile, indexes, scores, popularity, popular_order, top_k=5)
+    full = 2.0 * similarity[1] + 1.0 * similarity[9] + recommendations.POPULARITY_PRIOR * popularity
+    full[[1, 9]] = -np.inf
+    assert [index for index, _ in ranked] == sorted(range(len(cities)), key=lambda index: (-full[index], index))[:5]
+    assert np.allclose([score for _, score in ranked], np.sort(full)[::-1][:5], atol=1e-5)
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
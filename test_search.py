@@ -0,0 +1,51 @@
+"""
+Checks city and catalog activity search (backend/search.py).
+Covers similarity ranking, including activities matched on their description,
+and the result limit. Runs in-process against an in-memory SQLite database,
+which ranks with the Python port of pg_trgm similarity().
+Run with: python -m pytest test_search.py
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "backend"))
+
+import pytest
+from fastapi import HTTPException
+
+import main, models, search
+
+def seed(db):
+    """Adds one city and a few catalog activities"""
+    city = models.City(name="Paris", country="France", description="", cost_index=1.2, popularity=90)
+    city.catalog_activities = [
+        models.CatalogActivity(name="Louvre", category="Culture", cost=17.0, duration="3 hours", description="Museum of art"),
+        models.CatalogActivity(name="Museum pass tour", category="Culture", cost=55.0, duration="1 day", description="Guided walk"),
+        models.CatalogActivity(name="Seine cruise", category="Sightseeing", cost=15.0, duration="1 hour", description="Boat trip past the museum quarter"),
+        models.CatalogActivity(name="Bakery class", category="Food", cost=40.0, duration="2 hours", description="Croissants"),
+    ]
+    db.add(city)
+    db.commit()
+
+def test_activities_ranked_on_matched_field(db):
+    seed(db)
+    results = search.search_activities(db, query="museum")
+    assert [activity.name for activity in results] == ["Louvre", "Museum pass tour", "Seine cruise"]
+    # The Louvre only matches on its description and outranks a longer name match
+    louvre, tour = results[0], results[1]
+    assert search.similarity(louvre.description, "museum") > search.similarity(tour.name, "museum")
+
+def test_search_limit(db):
+    seed(db)
+    assert len(main.search_activities(None, "", "", None, limit=2, db=db)) == 2
+    assert len(main.search_activities(None, "", "", None, limit=search.DEFAULT_SEARCH_LIMIT, db=db)) == 4
+    try:
+        main.search_activities(None, "", "", None, limit=search.MAX_SEARCH_LIMIT + 1, db=db)
+    except HTTPException as e:
+        assert e.status_code == 400
+    else:
+        raise AssertionError("limit above MAX_SEARCH_LIMIT was accepted")
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
@@ -0,0 +1,101 @@
+"""
+Checks the values of GET /budget/{trip_id}/daily-trend (backend/budget.py
+get_trip_period_totals / build_spending_trend).
+A 6-day trip spanning a week and a month boundary is bucketed by day, week
+and month and compared with totals worked out by hand. Runs the route
+in-process against an in-memory SQLite database.
+Run with: python -m pytest test_spending_trend.py
+"""
+
+import os
+import sys
+import datetime
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "backend"))
+
+import pytest
+from fastapi import HTTPException
+
+import main, models, schemas, budget
+
+# Thursday 2026-01-29 to Tuesday 2026-02-03, budget 600 (100 per day)
+START = datetime.datetime(2026, 1, 29)
+END = datetime.datetime(2026, 2, 3)
+
+def seed(db):
+    """Adds one trip and 5 expenses inside its dates, one outside"""
+    user = models.User(email="trend@example.com", hashed_password="x", full_name="Trend")
+    db.add(user)
+    db.flush()
+    trip = models.Trip(destination="Alps", title="Alps", start_date=START, end_date=END, status="upcoming", budget_limit=600.0, owner_id=user.id)
+    at = lambda month, day, hour=12: datetime.datetime(2026, month, day, hour)
+    trip.expenses = [
+        models.Expense(name="Fondue", category="food", amount=30.0, date=at(1, 29)),
+        models.Expense(name="Train", category="transport", amount=50.0, date=at(1, 31, 23)),
+        models.Expense(name="Tips", category="misc", amount=10.0, date=at(2, 1, 0)),
+        models.Expense(name="Lunch", category="food", amount=20.0, date=at(2, 2)),
+        models.Expense(name="Ski pass", category="activities", amount=90.0, date=at(2, 2)),
+        # Outside the trip dates
+        models.Expense(name="Deposit", category="stay", amount=500.0, date=at(1, 10)),
+    ]
+    db.add(trip)
+    db.commit()
+    return schemas.Principal(id=user.id, email=user.email, full_name=user.full_name), trip.id
+
+def trend(db, user, trip_id, granularity):
+    result = main.get_daily_trend(trip_id, granularity, current_user=user, db=db)
+    assert result["granularity"] == granularity
+    assert result["budget_limit_per_day"] == 100.0
+    return [(period["date"], period["total"], period["over_budget"]) for period in result["days"]]
+
+def test_daily_buckets(db):
+    user, trip_id = seed(db)
+    assert trend(db, user, trip_id, "day") == [
+        ("2026-01-29", 30.0, False),
+        ("2026-01-30", 0.0, False),
+        ("2026-01-31", 50.0, False),
+        ("2026-02-01", 10.0, False),
+        ("2026-02-02", 110.0, True),
+        ("2026-02-03", 0.0, False),
+    ]
+    days = main.get_daily_trend(trip_id, "day", current_user=user, db=db)["days"]
+    assert days[3]["breakdown"] == {"transport": 0.0, "stay": 0.0, "food": 0.0, "activities": 0.0, "other": 10.0}
+    assert days[4]["breakdown"] == {"transport": 0.0, "stay": 0.0, "food": 20.0, "activities": 90.0, "other": 0.0}
+
+def test_weekly_buckets(db):
+    user, trip_id = seed(db)
+    # Weeks start on Monday; each bucket is labelled by its first trip day and budgeted for its trip days only
+    assert trend(db, user, trip_id, "week") == [
+        ("2026-01-29", 90.0, False),   # Thu-Sun, limit 400
+        ("2026-02-02", 110.0, False),  # Mon-Tue, limit 200
+    ]
+
+def test_monthly_buckets(db):
+    user, trip_id = seed(db)
+    assert trend(db, user, trip_id, "month") == [
+        ("2026-01-29", 80.0, False),   # 3 trip days in January
+        ("2026-02-01", 120.0, False),  # 3 trip days in February
+    ]
+    totals = budget.get_trip_period_totals(db, trip_id, START.date(), END.date(), "month")
+    assert totals[datetime.date(2026, 2, 1)]["activities"] == 90.0
+
+def test_over_budget_period(db):
+    user, trip_id = seed(db)
+    db.get(models.Trip, trip_id).budget_limit = 120.0  # 20 per day
+    db.commit()
+    result = main.get_daily_trend(trip_id, "week", current_user=user, db=db)
+    assert [period["over_budget"] for period in result["days"]] == [True, True]
+    result = main.get_daily_trend(trip_id, "month", current_user=user, db=db)
+    assert [period["over_budget"] for period in result["days"]] == [True, True]
+
+def test_invalid_granularity(db):
+    user, trip_id = seed(db)
+    try:
+        main.get_daily_trend(trip_id, "year", current_user=user, db=db)
+    except HTTPException as e:
+        assert e.status_code == 400
+    else:
+        raise AssertionError("granularity 'year' was accepted")
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
@@ -0,0 +1,135 @@
+"""
+Checks deep copies of shared trips (backend/itinerary.py copy_trip_graph and
+POST /trips/public/{share_token}/copy).
+The copy must match the source's stops, activities, expenses and budget
+rollups, shifted to the new start date and pointing at the copied rows.
+Runs in-process against an in-memory SQLite database.
+Run with: python -m pytest test_trip_copy.py
+"""
+
+import os
+import sys
+import datetime
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "backend"))
+
+import pytest
+from fastapi import HTTPException
+
+import main, models, schemas, budget, itinerary
+
+START = datetime.datetime(2026, 6, 1)
+COPY_START = datetime.datetime(2026, 9, 14)
+
+def seed(db):
+    """Adds a shared 4-day trip (2 stops, 3 activities, 4 expenses) and a second user who copies it"""
+    db.add(models.City(name="Rome", country="Italy", description="", cost_index=1.1, popularity=92))
+    owner = models.User(email="sharer@example.com", hashed_password="x", full_name="Sharer")
+    copier = models.User(email="copier@example.com", hashed_password="x", full_name="Copier")
+    db.add_all([owner, copier])
+    db.flush()
+    day = lambda offset, hour=0: START + datetime.timedelta(days=offset, hours=hour)
+    trip = models.Trip(
+        destination="Italy", title="Italy", description="Two cities", start_date=START, end_date=day(3),
+        status="upcoming", budget_limit=900.0, owner_id=owner.id, is_public=1, share_token="share-me"
+    )
+    rome = models.Stop(city_name="Rome", arrival_date=day(0), departure_date=day(2), sort_order=1024.0, accommodation_cost=300.0, transport_cost=40.0)
+    rome.activities = [
+        models.Activity(description="Colosseum tour", time="09:00", cost=45.0, sort_order=2048.0),
+        models.Activity(description="Pasta class", time="18:00", cost=60.0, sort_order=1024.0),
+    ]
+    naples = models.Stop(city_name="Naples", arrival_date=day(2), departure_date=day(3), sort_order=1536.0, accommodation_cost=90.0)
+    naples.activities = [models.Activity(description="Pompeii", cost=18.0, sort_order=1024.0)]
+    trip.stops = [rome, naples]
+    db.add(trip)
+    db.flush()
+    db.add_all([
+        models.Expense(trip_id=trip.id, name="Flight", category="transport", amount=220.0, currency="EUR", date=day(0, 7)),
+        models.Expense(trip_id=trip.id, stop_id=rome.id, name="Gelato", category="food", amount=4.5, date=day(1, 15), notes="two scoops"),
+        models.Expense(trip_id=trip.id, stop_id=rome.id, activity_id=rome.activities[0].id, name="Audio guide", category="activities", amount=8.0, date=day(1, 10)),
+        models.Expense(trip_id=trip.id, stop_id=naples.id, name="Pizza", category="food", amount=12.0, date=day(2, 20)),
+    ])
+    db.flush()
+    budget.rebuild_trip_rollup(db, trip.id)
+    db.commit()
+    principal = schemas.Principal(id=copier.id, email=copier.email, full_name=copier.full_name)
+    return principal, trip
+
+def stop_graph(db, trip):
+    """Stops in display order with their activities (in order) and day offsets from the trip start"""
+    stops = db.query(models.Stop).filter(models.Stop.trip_id == trip.id).order_by(models.Stop.sort_order, models.Stop.id)
+    return [
+        (
+            stop.city_name, stop.city_id, stop.sort_order, stop.accommodation_cost, stop.transport_cost,
+            (stop.arrival_date - trip.start_date).days, (stop.departure_date - stop.arrival_date).days,
+            [(activity.description, activity.time, activity.cost, activity.sort_order, activity.category) for activity in stop.activities],
+        )
+        for stop in stops
+    ]
+
+def expense_graph(db, trip):
+    """Expenses with their stop/activity as names, and timestamps as offsets from the trip start"""
+    expenses = db.query(models.Expense).filter(models.Expense.trip_id == trip.id).order_by(models.Expense.date)
+    return [
+        (
+            expense.name, expense.category, expense.amount, expense.currency, expense.notes, expense.date - trip.start_date,
+            expense.stop.city_name if expense.stop else None, expense.activity.description if expense.activity else None,
+        )
+        for expense in expenses
+    ]
+
+def daily_rollup(db, trip):
+    """{day offset from the trip start: breakdown}"""
+    rows = db.query(models.TripBudgetDailyRollup).filter(models.TripBudgetDailyRollup.trip_id == trip.id)
+    return {(row.date - trip.start_date.date()).days: budget.rollup_breakdown(row) for row in rows}
+
+def test_copy_matches_source(db):
+    user, source = seed(db)
+    copy = itinerary.copy_trip_graph(db, source, user.id, COPY_START, include_expenses=True)
+    db.commit()
+    db.expire_all()
+
+    assert (copy.title, copy.owner_id, copy.status, copy.is_public, copy.share_token) == ("Copy of Italy", user.id, "planning", 0, None)
+    assert (copy.start_date, copy.end_date, copy.budget_limit) == (COPY_START, COPY_START + datetime.timedelta(days=3), 900.0)
+    assert stop_graph(db, copy) == stop_graph(db, source)
+    assert expense_graph(db, copy) == expense_graph(db, source)
+
+    # Copied rows point at the copy's stops and activities, never the source's
+    copy_stop_ids = {stop.id for stop in copy.stops}
+    copy_activity_ids = {activity.id for stop in copy.stops for activity in stop.activities}
+    for expense in db.query(models.Expense).filter(models.Expense.trip_id == copy.id):
+        assert expense.stop_id is None or expense.stop_id in copy_stop_ids
+        assert expense.activity_id is None or expense.activity_id in copy_activity_ids
+
+    assert budget.rollup_breakdown(db.get(models.TripBudgetRollup, copy.id)) == budget.rollup_breakdown(db.get(models.TripBudgetRollup, source.id))
+    assert daily_rollup(db, copy) == daily_rollup(db, source)
+    # Source untouched
+    assert len(stop_graph(db, source)) == 2 and len(expense_graph(db, source)) == 4
+
+def test_copy_without_expenses(db):
+    user, source = seed(db)
+    copy = itinerary.copy_trip_graph(db, source, user.id, COPY_START)
+    db.commit()
+    assert stop_graph(db, copy) == stop_graph(db, source)
+    assert expense_graph(db, copy) == []
+    # Planned stop and activity costs still count toward the copy's budget
+    expected = budget.get_trip_category_totals(db, copy.id)
+    assert budget.rollup_breakdown(db.get(models.TripBudgetRollup, copy.id)) == expected
+    assert expected["stay"] == 390.0
+
+def test_copy_route(db):
+    user, source = seed(db)
+    copied = main.copy_trip("share-me", True, current_user=user, db=db)
+    assert copied.owner_id == user.id
+    assert [stop.city_name for stop in copied.stops] == ["Rome", "Naples"]
+    assert [activity.description for activity in copied.stops[0].activities] == ["Pasta class", "Colosseum tour"]
+    assert db.query(models.Expense).filter(models.Expense.trip_id == copied.id).count() == 4
+    try:
+        main.copy_trip("not-shared", False, current_user=user, db=db)
+    except HTTPException as e:
+        assert e.status_code == 404
+    else:
+        raise AssertionError("copied a trip that is not shared")
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
@@ -0,0 +1,69 @@
+"""
+Checks GET /trips/ keyset pagination and the summary projection.
+Runs the route in-process against an in-memory SQLite database.
+Run with: python -m pytest test_trip_listing.py
+"""
+
+import os
+import sys
+import datetime
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "backend"))
+
+import pytest
+from fastapi import Response
+from sqlalchemy import update
+
+import main, models, schemas
+
+def seed(db):
+    """Adds one user owning 7 trips, 3 of them without created_at"""
+    user = models.User(email="pager@example.com", hashed_password="x", full_name="Pager")
+    db.add(user)
+    db.flush()
+    start = datetime.datetime(2026, 6, 1)
+    for t in range(7):
+        trip = models.Trip(
+            destination="Europe", title=f"Trip {t}", start_date=start, end_date=start, status="upcoming",
+            owner_id=user.id, created_at=start + datetime.timedelta(days=t)
+        )
+        trip.stops = [models.Stop(city_name="Rome", arrival_date=start, departure_date=start, sort_order=1)]
+        db.add(trip)
+    db.flush()
+    # Rows created before created_at was recorded
+    db.execute(update(models.Trip).where(models.Trip.title.in_(["Trip 1", "Trip 4", "Trip 5"])).values(created_at=None))
+    db.commit()
+    db.expire_all()
+    return user
+
+def list_all_pages(db, user, limit, fields="full"):
+    titles, cursor, pages = [], None, 0
+    while True:
+        response = Response()
+        trips = main.get_user_trips(response, limit=limit, cursor=cursor, status=None, fields=fields, current_user=user, db=db)
+        titles += [trip.title for trip in trips]
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return titles, pages
+
+def test_pagination_includes_null_created_at(db):
+    user = seed(db)
+    expected = ["Trip 6", "Trip 3", "Trip 2", "Trip 0", "Trip 5", "Trip 4", "Trip 1"]
+    unpaged = main.get_user_trips(Response(), limit=None, cursor=None, status=None, fields="full", current_user=user, db=db)
+    assert [trip.title for trip in unpaged] == expected
+    for limit in (1, 2, 3, 7):
+        titles, pages = list_all_pages(db, user, limit)
+        assert titles == expected, f"limit={limit}: {titles}"
+        assert pages == -(-len(expected) // limit)
+
+def test_summary_has_no_stops(db):
+    user = seed(db)
+    titles, _ = list_all_pages(db, user, 3, fields="summary")
+    assert len(titles) == 7
+    trips = main.get_user_trips(Response(), limit=2, cursor=None, status=None, fields="summary", current_user=user, db=db)
+    assert all(isinstance(trip, schemas.TripSummary) for trip in trips)
+    assert "stops" not in trips[0].model_dump()
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))